@@ -1,9 +1,19 @@
 from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
 
+from sayan_service import async_logging
+
 
 def when_ready(server):
     GunicornPrometheusMetrics.start_http_server_when_ready(9100)
 
 
+def post_worker_init(worker):
+    async_logging.restart_after_fork()
+
+
 def child_exit(server, worker):
     GunicornPrometheusMetrics.mark_process_dead_on_child_exit(worker.pid)
+
+
+def worker_exit(server, worker):
+    async_logging.stop()
@@ -7,11 +7,11 @@
 # add them when you create a new module) may cause your models to go
 # undiscovered.
 
-from pkg_resources import get_distribution, DistributionNotFound
+from importlib.metadata import PackageNotFoundError, version
 
 from . import *  # noqa
 
 try:
-    __version__ = get_distribution(__name__).version
-except DistributionNotFound:
+    __version__ = version(__name__)
+except PackageNotFoundError:
     __version__ = "0.1.0.dev0+missinggit"
@@ -3,11 +3,18 @@
 
 import traceback
 
+import click
 import connexion
-import flask
 
-from sayan_service import commands, errors
-from sayan_service.extensions import bcrypt, cache, cors, db, marshmallow, migrate, structlog
+from sayan_service import errors, prepared_statements, profiling
+from sayan_service.passwords import passwords
+from sayan_service.response_cache import response_cache
+from sayan_service.extensions import bcrypt, cache, cors, db, json, marshmallow, structlog
+from sayan_service.instrumentation import compiled_cache as compiled_cache_instrumentation
+from sayan_service.instrumentation.lazy_loads import lazy_load_detector
+from sayan_service.instrumentation import pool as pool_instrumentation
+from sayan_service.instrumentation.slow_queries import slow_query_log
+from sayan_service.instrumentation import timing as timing_instrumentation
 from sayan_service.settings import Config
 from prometheus_flask_exporter.multiprocess import GunicornPrometheusMetrics
 
@@ -36,12 +43,16 @@ def create_app(config_object=None):
     logger.debug('Registering Flask shell context')
     register_shell_context(app)
 
-    logger.debug('Registering CLI commands')
-    register_commands(app)
+    if in_cli():
+        logger.debug('Registering CLI commands')
+        register_commands(app)
 
     logger.debug('Registering Metrics handler')
     register_metrics(app)
 
+    logger.debug('Registering the profiler')
+    register_profiler(app)
+
     return app
 
 
@@ -53,10 +64,13 @@ def register_logger(app):
 def register_extensions(app):
     """ Registers Flask extensions. """
     bcrypt.init_app(app)
+    passwords.init_app(app)
     cache.init_app(app)
+    response_cache.init_app(app)
     cors.init_app(app)
     db.init_app(app)
-    migrate.init_app(app, db)
+    prepared_statements.init_app(app)
+    json.init_app(app)
     marshmallow.init_app(app)
 
 
@@ -67,7 +81,11 @@ def register_specs(cxn):
         'swagger_ui': cxn.app.config.get('SWAGGER_UI_ENABLED')
     }
 
-    cxn.add_api('v1/spec.yaml', strict_validation=True, options=api_options)
+    # Serialize handler responses with the configured JSON provider.
+    cxn.api_cls = json.connexion_api_cls()
+
+    api = cxn.add_api('v1/spec.yaml', strict_validation=True, options=api_options)
+    timing_instrumentation.register_api(cxn.app, api)
 
 
 def register_error_handlers(cxn):
@@ -75,7 +93,7 @@ def register_error_handlers(cxn):
     def render_error(error):
         cxn.app.logger.error(traceback.format_exc())
         content, code = errors.resolve_error(error)
-        return flask.jsonify(content), code
+        return json.response(content, code)
     cxn.add_error_handler(Exception, render_error)
 
 
@@ -86,11 +104,32 @@ def register_shell_context(app):
     app.shell_context_processor(shell_context)
 
 
+def in_cli():
+    """ Returns True if the app is being created by the `flask` command line interface, rather than a worker. """
+    return click.get_current_context(silent=True) is not None
+
+
 def register_commands(app):
-    """ Registers click commands for the app. """
+    """ Registers click commands and the migrations extension, which only the `flask` command line interface uses. """
+    # Imported here so that workers do not import Flask-Migrate and Alembic.
+    from sayan_service import commands
+    from sayan_service.extensions import migrate
+
+    migrate.init_app(app, db)
     app.cli.add_command(commands.seed)
+    app.cli.add_command(commands.profile_imports)
+
+
+def register_profiler(app):
+    """ Registers the admin-only profiling endpoint and request hooks, if enabled. """
+    profiling.init_app(app)
 
 
 def register_metrics(app):
-    """ Registers prometheus metrics handler. """
+    """ Registers prometheus metrics handler, database and request instrumentation, and N+1 and slow query logs. """
     metrics = GunicornPrometheusMetrics(app)
+    pool_instrumentation.init_app(app)
+    compiled_cache_instrumentation.init_app(app)
+    timing_instrumentation.init_app(app)
+    slow_query_log.init_app(app)
+    lazy_load_detector.init_app(app)
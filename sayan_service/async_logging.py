@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+""" Queue-backed logging, which renders and writes log messages off the request thread.
+
+In asynchronous mode, the structlog processor chain ends with
+`structlog.stdlib.ProcessorFormatter.wrap_for_formatter` instead of a renderer, and the root
+logger's only handler is a `QueueLogHandler`, which puts log records on a bounded queue. A
+`BatchingQueueListener` thread takes the records off the queue, renders them with a
+`ProcessorFormatter` and writes them to the stream in batches.
+
+Threads do not survive a fork. In a forked process, the queue inherited from the parent, whose
+locks may be held, is replaced at once, and records are kept on the new queue until
+`restart_after_fork` starts the listener again. The gunicorn configuration calls it from the
+`post_worker_init` hook, which runs after the gevent worker has monkeypatched the process, so that
+the listener runs in a greenlet and its queue uses gevent's locks: rendering and writing are still
+moved out of the request, but share the worker's CPU time, and with the `block` policy a caller
+waiting for room on a full queue yields to the other greenlets rather than blocking the worker.
+Any other process forked after the listener was started must call `restart_after_fork` itself.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+
+from datetime import datetime
+from logging.handlers import QueueHandler
+from typing import Any, List, Optional, TextIO
+
+import structlog
+
+from .metrics import LOG_MESSAGES_DROPPED, LOG_WRITE_ERRORS
+
+##
+#: The `_STOP` sentinel is put on the queue to stop the listener.
+#:
+_STOP = object()
+
+##
+#: The `_listener` is the listener started by `start`, if any, and the
+#: `_handler` puts records on its queue.
+#:
+_listener: Optional['BatchingQueueListener'] = None
+_handler: Optional['QueueLogHandler'] = None
+
+
+class QueueLogHandler(QueueHandler):
+    """QueueLogHandler
+
+    A `QueueHandler` that puts records on a bounded queue without formatting them. When the queue
+    is full, records are either dropped (and counted) or the caller blocks until there is room,
+    depending on the policy.
+    """
+
+    ##
+    #: The `POLICIES` are the supported policies for a full queue.
+    #:
+    POLICIES = ('drop', 'block')
+
+    def __init__(self, log_queue: queue.Queue, policy: str='drop') -> None:
+        """__init__
+
+        :param log_queue:
+            The queue to put records on.
+        :param policy:
+            Either `drop` (discard records when the queue is full) or `block` (wait for room).
+        :raises:
+            ValueError
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f'Unknown log queue policy: {policy}')
+
+        super().__init__(log_queue)
+        self.policy = policy
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """prepare
+
+        Merges the arguments of a record from a stdlib logger into its message, so that they are
+        not mutated before the record is rendered. Records from structlog are left as they are.
+
+        :param record:
+            The record to enqueue.
+        """
+        if record.args and not isinstance(record.msg, dict):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        """enqueue
+
+        Puts the record on the queue, applying the policy if the queue is full.
+
+        :param record:
+            The record to enqueue.
+        """
+        if self.policy == 'block':
+            self.queue.put(record)
+            return
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_MESSAGES_DROPPED.labels(record.levelname.lower()).inc()
+
+
+class BatchingQueueListener:
+    """BatchingQueueListener
+
+    Takes records off a queue in a background thread, renders them and writes them to a stream,
+    with a single write and flush for each batch of records that are waiting.
+    """
+
+    def __init__(self, log_queue: queue.Queue, formatter: logging.Formatter, stream: TextIO,
+                 batch_size: int=256) -> None:
+        """__init__
+
+        :param log_queue:
+            The queue to take records from.
+        :param formatter:
+            The formatter used to render each record.
+        :param stream:
+            The stream to write rendered records to.
+        :param batch_size:
+            The maximum number of records written at once.
+        """
+        self.queue = log_queue
+        self.formatter = formatter
+        self.stream = stream
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """start
+
+        Starts the background thread.
+        """
+        self._thread = threading.Thread(target=self._run, name='log-listener', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float]=5) -> None:
+        """stop
+
+        Writes every record on the queue, then stops the background thread.
+
+        :param timeout:
+            The maximum number of seconds to wait for the queue to be written.
+        """
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+            self._thread.join(timeout)
+        except queue.Full:
+            pass
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        """ Whether the background thread has been started, and not stopped. """
+        return self._thread is not None
+
+    def reset_after_fork(self) -> None:
+        """reset_after_fork
+
+        Replaces the queue inherited from the parent process, whose locks may be held, and forgets
+        the parent's background thread, which does not exist in a forked process.
+        """
+        self.queue = queue.Queue(maxsize=self.queue.maxsize)
+        self._thread = None
+
+    def restart(self) -> None:
+        """restart
+
+        Moves the waiting records to a new queue, created with the current implementation of
+        threading (gevent's, once it has monkeypatched the process), and starts the background
+        thread. Waiting records that do not fit on the new queue are dropped.
+        """
+        waiting = self.queue
+        self.queue = queue.Queue(maxsize=waiting.maxsize)
+        try:
+            while True:
+                self.queue.put_nowait(waiting.get_nowait())
+        except (queue.Empty, queue.Full):
+            pass
+        self.start()
+
+    def _run(self) -> None:
+        """_run
+
+        Writes batches of records until the stop sentinel is taken off the queue.
+        """
+        while True:
+            batch = self._take_batch()
+            records = [record for record in batch if record is not _STOP]
+            if records:
+                self._write(records)
+            if len(records) < len(batch):
+                return
+
+    def _take_batch(self) -> List[Any]:
+        """_take_batch
+
+        Waits for a record, then takes up to `batch_size` records from the queue without waiting.
+        """
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, records: List[logging.LogRecord]) -> None:
+        """_write
+
+        Renders the records and writes them to the stream. A record that cannot be rendered is
+        written as its message instead, and records that cannot be written are counted.
+
+        :param records:
+            The records to write.
+        """
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.formatter.format(record))
+            except Exception:
+                lines.append(str(record.msg))
+
+        try:
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+        except Exception:
+            LOG_WRITE_ERRORS.inc(len(lines))
+
+
+def _add_record_timestamp(logger: Any, method_name: str, event_dict: dict) -> dict:
+    """_add_record_timestamp
+
+    A processor for records from stdlib loggers, which adds the time that the record was created
+    (rather than rendered) in the same format as `TimeStamper(fmt='iso')`.
+    """
+    record = event_dict.get('_record')
+    if record is not None:
+        event_dict['timestamp'] = datetime.utcfromtimestamp(record.created).isoformat() + 'Z'
+    return event_dict
+
+
+def start(renderer: Any, queue_size: int=10000, policy: str='drop', batch_size: int=256,
+          stream: Optional[TextIO]=None) -> QueueLogHandler:
+    """start
+
+    Starts the listener that renders and writes log records, and returns the handler that the root
+    logger should use. Stops the listener that was previously started, if any.
+
+    :param renderer:
+        The structlog renderer (e.g. `JSONRenderer`) used to render each record.
+    :param queue_size:
+        The maximum number of records waiting to be written.
+    :param policy:
+        Either `drop` or `block`, for when the queue is full.
+    :param batch_size:
+        The maximum number of records written at once.
+    :param stream:
+        The stream to write to. Defaults to stdout.
+    """
+    global _handler, _listener
+
+    stop()
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = QueueLogHandler(log_queue, policy=policy)
+    formatter = structlog.stdlib.ProcessorFormatter(
+        processor=renderer,
+        foreign_pre_chain=[
+            structlog.stdlib.add_logger_name,
+            structlog.stdlib.add_log_level,
+            _add_record_timestamp,
+        ])
+
+    _listener = BatchingQueueListener(log_queue, formatter, stream or sys.stdout, batch_size=batch_size)
+    _listener.start()
+    _handler = handler
+    return handler
+
+
+def stop() -> None:
+    """stop
+
+    Writes the waiting log records and stops the listener. Called on gunicorn worker shutdown and
+    at interpreter exit.
+    """
+    global _listener
+
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def restart_after_fork() -> None:
+    """restart_after_fork
+
+    Starts the listener again in a forked process, if it was started in the parent, and writes the
+    records logged since the fork. Called from gunicorn's `post_worker_init` hook, after the worker
+    has been monkeypatched.
+    """
+    if _listener is not None and not _listener.running:
+        _listener.restart()
+        _handler.queue = _listener.queue
+
+
+def _reset_after_fork() -> None:
+    """ Replaces the queue of the listener inherited by a forked process, if one was started. """
+    if _listener is not None:
+        _listener.reset_after_fork()
+        _handler.queue = _listener.queue
+
+
+atexit.register(stop)
+os.register_at_fork(after_in_child=_reset_after_fork)
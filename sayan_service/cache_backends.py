@@ -0,0 +1,371 @@
+# -*- coding: utf-8 -*-
+""" Cache backends for `Flask-Caching`.
+
+The `simple` backend is a per-process dictionary bounded by its number of entries rather than
+their size, and a shared backend such as Redis alone costs a network round trip for every hit.
+The `TieredCache` backend layers a bounded, size-aware in-process LRU cache (the local tier) in
+front of a shared backend (the shared tier), and is selected with:
+
+.. code-block:: sh
+
+    CACHE_TYPE=sayan_service.cache_backends.TieredCache
+    CACHE_SHARED_TYPE=flask_caching.backends.RedisCache
+    CACHE_REDIS_URL=redis://redis:6379/0?socket_timeout=1&socket_connect_timeout=1
+
+Reads are served from the local tier when they can, and otherwise from the shared tier, whose hits
+are copied into the local tier. Writes go to both tiers, but cannot reach the local tiers of the
+other workers, so a value written or deleted by one worker may still be read from the local tier
+of another for up to `CACHE_LOCAL_TTL` seconds. That bounds the staleness of the local tier.
+
+`TieredCache.get_or_set` loads a missing value once per worker however many requests ask for it
+concurrently: the first request loads it, and the others wait for its result (single flight).
+"""
+
+import pickle
+import threading
+import time
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from flask import Flask
+from flask_caching.backends.base import BaseCache
+from werkzeug.utils import import_string
+
+from .metrics import CACHE_LOADS_COALESCED, CACHE_LOCAL_EVICTIONS, CACHE_LOOKUPS
+
+##
+#: The `DEFAULT_LOCAL_MAX_BYTES` is the default size of the local tier of a
+#: `TieredCache`, in bytes.
+#:
+DEFAULT_LOCAL_MAX_BYTES = 64 * 1024 * 1024
+
+##
+#: The `DEFAULT_LOCAL_TTL` is the default number of seconds for which values
+#: are kept in the local tier of a `TieredCache`.
+#:
+DEFAULT_LOCAL_TTL = 5
+
+##
+#: The `DEFAULT_SHARED_TYPE` is the default backend of the shared tier of a
+#: `TieredCache`.
+#:
+DEFAULT_SHARED_TYPE = 'flask_caching.backends.RedisCache'
+
+
+class LRUCache(BaseCache):
+    """LRUCache
+
+    An in-process cache bounded by the size of its entries, which evicts the least recently used
+    entries to stay within `max_bytes`. Values are stored pickled, both to measure their size and
+    so that callers cannot mutate cached values. It is safe to use from multiple threads (and from
+    greenlets).
+
+    :param max_bytes:
+        The maximum size of the entries (keys and pickled values), in bytes.
+    :param default_timeout:
+        The default number of seconds for which values are cached, or 0 for no expiry.
+    """
+
+    def __init__(self, max_bytes: int=DEFAULT_LOCAL_MAX_BYTES, default_timeout: int=300) -> None:
+        super().__init__(default_timeout)
+        self.max_bytes = max_bytes
+        self.size = 0
+        # The expiry (a monotonic time, or 0) and the pickled value of each key, least recently used first.
+        self._entries: 'OrderedDict[str, Tuple[float, bytes]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app: Flask, config: dict, args: list, kwargs: dict) -> 'LRUCache':
+        """ Returns the cache configured by `CACHE_LOCAL_MAX_BYTES`. """
+        kwargs.update(max_bytes=config.get('CACHE_LOCAL_MAX_BYTES', DEFAULT_LOCAL_MAX_BYTES))
+        return cls(*args, **kwargs)
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            data = self._get(key)
+        return None if data is None else pickle.loads(data)
+
+    def set(self, key: str, value: Any, timeout: Optional[int]=None) -> bool:
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            return self._set(key, data, timeout)
+
+    def add(self, key: str, value: Any, timeout: Optional[int]=None) -> bool:
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            return self._get(key) is None and self._set(key, data, timeout)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            return self._remove(key)
+
+    def delete_many(self, *keys: str) -> bool:
+        with self._lock:
+            return all([self._remove(key) for key in keys])
+
+    def has(self, key: str) -> bool:
+        with self._lock:
+            return self._get(key) is not None
+
+    def clear(self) -> bool:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+        return True
+
+    def _get(self, key: str) -> Optional[bytes]:
+        """ Returns the pickled value of a key and marks it as recently used, or None if it is missing or expired. """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, data = entry
+        if expires and expires <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return data
+
+    def _set(self, key: str, data: bytes, timeout: Optional[int]) -> bool:
+        """ Stores the pickled value of a key, and evicts the least recently used entries beyond `max_bytes`. """
+        self._remove(key)
+        size = len(key) + len(data)
+        if size > self.max_bytes:
+            return False
+
+        timeout = self._normalize_timeout(timeout)
+        self._entries[key] = (time.monotonic() + timeout if timeout > 0 else 0, data)
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            CACHE_LOCAL_EVICTIONS.inc()
+        return True
+
+    def _remove(self, key: str) -> bool:
+        """ Removes the entry of a key, and returns whether there was one. """
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size -= len(key) + len(entry[1])
+        return True
+
+
+def _accepted_keys(keys: Iterable[str], result: Any) -> Set[str]:
+    """_accepted_keys
+
+    Returns the keys that the `set_many` of a backend accepted, from its result. Depending on the
+    backend and its version, the result is whether every key was set, whether each key was set, or
+    the keys that were set. A result that cannot be matched to the keys accepts none of them.
+
+    :param keys:
+        The keys passed to `set_many`, in order.
+    :param result:
+        The result of `set_many`.
+    """
+    keys = list(keys)
+    if isinstance(result, (list, tuple)):
+        if all(isinstance(item, str) for item in result):
+            return set(result)
+        if len(result) == len(keys):
+            return {key for key, accepted in zip(keys, result) if accepted}
+        return set()
+    return set(keys) if result else set()
+
+
+class _Flight:
+    """ A load of a missing value, whose result is shared with the concurrent loads of the same key. """
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        """ Waits for the load to finish, and returns its value or raises its error. """
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class TieredCache(BaseCache):
+    """TieredCache
+
+    A cache that layers a bounded in-process LRU cache (the local tier) in front of a shared cache
+    (the shared tier).
+
+    :param shared:
+        The shared tier.
+    :param max_bytes:
+        The maximum size of the local tier, in bytes.
+    :param local_timeout:
+        The maximum number of seconds for which values are kept in the local tier.
+    :param default_timeout:
+        The default number of seconds for which values are cached, or 0 for no expiry.
+    """
+
+    def __init__(self, shared: BaseCache, max_bytes: int=DEFAULT_LOCAL_MAX_BYTES,
+                 local_timeout: int=DEFAULT_LOCAL_TTL, default_timeout: int=300) -> None:
+        super().__init__(default_timeout)
+        self.local = LRUCache(max_bytes, local_timeout)
+        self.shared = shared
+        self.local_timeout = local_timeout
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+
+    @classmethod
+    def factory(cls, app: Flask, config: dict, args: list, kwargs: dict) -> 'TieredCache':
+        """factory
+
+        Returns the cache configured by `CACHE_LOCAL_MAX_BYTES` and `CACHE_LOCAL_TTL`, in front of the
+        backend named by `CACHE_SHARED_TYPE`, which is configured by the rest of the `CACHE_` settings
+        as if it were the `CACHE_TYPE`.
+
+        :param app:
+            The Flask app.
+        :param config:
+            The cache configuration.
+        :param args:
+            The positional arguments of the backend (`CACHE_ARGS`).
+        :param kwargs:
+            The keyword arguments of the backend (`CACHE_DEFAULT_TIMEOUT` and `CACHE_OPTIONS`).
+        """
+        shared_factory = import_string(config.get('CACHE_SHARED_TYPE') or DEFAULT_SHARED_TYPE)
+        if isinstance(shared_factory, type) and issubclass(shared_factory, BaseCache):
+            shared_factory = shared_factory.factory
+        shared = shared_factory(app, config, list(args), dict(kwargs))
+
+        return cls(
+            shared,
+            max_bytes=config.get('CACHE_LOCAL_MAX_BYTES', DEFAULT_LOCAL_MAX_BYTES),
+            local_timeout=config.get('CACHE_LOCAL_TTL', DEFAULT_LOCAL_TTL),
+            default_timeout=kwargs.get('default_timeout', 300))
+
+    def get(self, key: str) -> Any:
+        value = self.local.get(key)
+        CACHE_LOOKUPS.labels('local', 'miss' if value is None else 'hit').inc()
+        if value is not None:
+            return value
+
+        value = self.shared.get(key)
+        CACHE_LOOKUPS.labels('shared', 'miss' if value is None else 'hit').inc()
+        if value is not None:
+            self.local.set(key, value)
+        return value
+
+    def get_many(self, *keys: str) -> list:
+        values = [self.local.get(key) for key in keys]
+        missing = [index for index, value in enumerate(values) if value is None]
+        CACHE_LOOKUPS.labels('local', 'hit').inc(len(keys) - len(missing))
+        CACHE_LOOKUPS.labels('local', 'miss').inc(len(missing))
+        if not missing:
+            return values
+
+        shared_values = self.shared.get_many(*[keys[index] for index in missing])
+        for index, value in zip(missing, shared_values):
+            values[index] = value
+            if value is not None:
+                self.local.set(keys[index], value)
+        hits = sum(value is not None for value in shared_values)
+        CACHE_LOOKUPS.labels('shared', 'hit').inc(hits)
+        CACHE_LOOKUPS.labels('shared', 'miss').inc(len(missing) - hits)
+        return values
+
+    def set(self, key: str, value: Any, timeout: Optional[int]=None) -> bool:
+        result = self.shared.set(key, value, timeout)
+        if result:
+            self.local.set(key, value, self._local_timeout(timeout))
+        else:
+            self.local.delete(key)
+        return result
+
+    def add(self, key: str, value: Any, timeout: Optional[int]=None) -> bool:
+        result = self.shared.add(key, value, timeout)
+        if result:
+            self.local.set(key, value, self._local_timeout(timeout))
+        return result
+
+    def set_many(self, mapping: dict, timeout: Optional[int]=None) -> Any:
+        mapping = dict(mapping)
+        result = self.shared.set_many(mapping, timeout)
+        accepted = _accepted_keys(mapping, result)
+        local_timeout = self._local_timeout(timeout)
+        for key, value in mapping.items():
+            if key in accepted:
+                self.local.set(key, value, local_timeout)
+            else:
+                self.local.delete(key)
+        return result
+
+    def delete(self, key: str) -> bool:
+        self.local.delete(key)
+        return self.shared.delete(key)
+
+    def delete_many(self, *keys: str) -> Any:
+        self.local.delete_many(*keys)
+        return self.shared.delete_many(*keys)
+
+    def has(self, key: str) -> bool:
+        return self.local.has(key) or self.shared.has(key)
+
+    def clear(self) -> bool:
+        self.local.clear()
+        return self.shared.clear()
+
+    def inc(self, key: str, delta: int=1) -> Optional[int]:
+        self.local.delete(key)
+        return self.shared.inc(key, delta)
+
+    def dec(self, key: str, delta: int=1) -> Optional[int]:
+        self.local.delete(key)
+        return self.shared.dec(key, delta)
+
+    def get_or_set(self, key: str, load: Callable[[], Any], timeout: Optional[int]=None) -> Any:
+        """get_or_set
+
+        Returns the cached value of a key, or loads, caches and returns it if it is missing. A
+        missing value is loaded once per worker: concurrent calls for the same key wait for the
+        first one's load, and return its value (or raise its error) instead of loading it again.
+        A None value is returned but not cached.
+
+        :param key:
+            The cache key.
+        :param load:
+            A function that takes no arguments and returns the value.
+        :param timeout:
+            The number of seconds for which the value is cached. Defaults to the default timeout.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            CACHE_LOADS_COALESCED.inc()
+            return flight.wait()
+
+        try:
+            # A concurrent load may have finished between the miss and the start of this one.
+            value = self.local.get(key)
+            if value is None:
+                value = load()
+                if value is not None:
+                    self.set(key, value, timeout)
+            flight.value = value
+            return value
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _local_timeout(self, timeout: Optional[int]) -> int:
+        """ Returns the number of seconds for which a value cached for `timeout` seconds is kept in the local tier. """
+        timeout = self._normalize_timeout(timeout)
+        return min(timeout, self.local_timeout) if timeout > 0 else self.local_timeout
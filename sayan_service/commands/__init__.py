@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
 """ Administrative commands for the application. """
 
+from .imports import profile_imports
 from .seed import seed
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+""" Import time profiling. """
+
+import re
+import subprocess
+import sys
+
+from collections import Counter
+from typing import List, NamedTuple, Tuple
+
+import click
+
+##
+#: The `STARTUP_SCRIPT` creates the app as a gunicorn worker does, and prints
+#: the number of seconds it took, including imports.
+#:
+STARTUP_SCRIPT = (
+    'import time; start = time.perf_counter(); '
+    'from sayan_service.app import create_app; create_app(); '
+    'print(time.perf_counter() - start)'
+)
+
+##
+#: The `_IMPORT_TIME_PATTERN` matches a line of the `-X importtime` output of
+#: the interpreter, whose times are in microseconds.
+#:
+_IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class ImportTime(NamedTuple):
+    """ The time it took to import a module, in microseconds, excluding and including its own imports. """
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_import_times(output: str) -> List[ImportTime]:
+    """parse_import_times
+
+    Returns the import times reported by the interpreter's `-X importtime` option.
+
+    :param output:
+        The standard error of the interpreter.
+    """
+    times = []
+    for line in output.splitlines():
+        match = _IMPORT_TIME_PATTERN.match(line)
+        if match:
+            times.append(ImportTime(match.group(4), int(match.group(1)), int(match.group(2))))
+    return times
+
+
+def profile_startup() -> Tuple[float, List[ImportTime]]:
+    """profile_startup
+
+    Creates the app in a new interpreter, and returns the number of seconds it took, including
+    imports, and the import time of each module it imported.
+
+    :raises:
+        subprocess.CalledProcessError
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT], capture_output=True, text=True, check=True)
+    return float(result.stdout.split()[-1]), parse_import_times(result.stderr)
+
+
+@click.command('profile-imports')
+@click.option('--limit', default=25, show_default=True, help='The number of modules (or packages) listed.')
+@click.option('--sort', type=click.Choice(['cumulative', 'self']), default='cumulative', show_default=True,
+              help='Whether modules are sorted by their time including or excluding their own imports.')
+@click.option('--packages', is_flag=True, help='List top-level packages, with the time of all of their modules.')
+def profile_imports(limit, sort, packages):
+    """profile_imports
+
+    Reports the modules that take the longest to import when a worker creates the app, in a new
+    interpreter.
+    """
+    seconds, times = profile_startup()
+    click.echo(f'Created the app in {seconds:.3f}s. The interpreter imported {len(times)} modules in '
+               f'{sum(t.self_us for t in times) / 1e6:.3f}s, including its own startup.')
+
+    if packages:
+        totals = Counter()
+        for import_time in times:
+            totals[import_time.module.split('.')[0]] += import_time.self_us
+        click.echo(f'{"ms":>10}  package')
+        for package, self_us in totals.most_common(limit):
+            click.echo(f'{self_us / 1000:10.1f}  {package}')
+        return
+
+    key = (lambda t: t.cumulative_us) if sort == 'cumulative' else (lambda t: t.self_us)
+    click.echo(f'{"cumul. ms":>10} {"self ms":>10}  module')
+    for import_time in sorted(times, key=key, reverse=True)[:limit]:
+        click.echo(f'{import_time.cumulative_us / 1000:10.1f} {import_time.self_us / 1000:10.1f}  {import_time.module}')
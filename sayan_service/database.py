@@ -1,20 +1,90 @@
 # -*- coding: utf-8 -*-
 """ Database module, including the SQLAlchemy database object and DB-related utilities. """
 
-from typing import Any, Union
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Union
 
-from datetime import datetime
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+from itertools import islice
 from uuid import UUID
 
+from flask import current_app
+from itsdangerous import BadData, URLSafeSerializer
+from sqlalchemy import any_, bindparam, cast, event, inspect, select, tuple_, update, values
+from sqlalchemy.engine import Row
 from sqlalchemy.dialects import postgresql as pg
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm import Query, RelationshipProperty, Session, load_only, make_transient_to_detached, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy.sql import Select
 
-from .extensions import db
+from .extensions import cache, db
+from .metrics import ENTITY_CACHE_EVICTIONS, ENTITY_CACHE_HITS, ENTITY_CACHE_MISSES
+from .prepared_statements import PREPARE_OPTION
+from .response_cache import response_cache
+from .serializer import ModelDumper
 
 # Alias common SQLAlchemy names
 Table = db.Table
 Column = db.Column
-relationship = db.relationship
+
+
+##
+#: The `_CACHED_NOT_FOUND` marker is stored in the entity cache in place of a
+#: record that does not exist.
+#:
+_CACHED_NOT_FOUND = 'NOT_FOUND'
+
+##
+#: The `_PENDING_EVICTIONS_KEY` is the key of the session `info` dictionary
+#: that holds the entity cache keys to evict, by model name, when the
+#: session's transaction commits.
+#:
+_PENDING_EVICTIONS_KEY = 'entity_cache_pending_keys'
+
+##
+#: The `_PENDING_RECORDS_KEY` is the key of the session `info` dictionary that
+#: holds the records saved or deleted in the session's transaction, whose
+#: entity cache keys are computed again after each flush.
+#:
+_PENDING_RECORDS_KEY = 'entity_cache_pending_records'
+
+##
+#: The `_CARDINALITY_VIOLATION` is the PostgreSQL error code raised when a
+#: statement would affect the same row twice, e.g. an upsert of a batch with
+#: duplicate conflict keys.
+#:
+_CARDINALITY_VIOLATION = '21000'
+
+##
+#: The `_LOADER_STRATEGIES` are the loader strategies that may be declared for
+#: a relationship in `Model.__loader_strategies__`.
+#:
+_LOADER_STRATEGIES = ('select', 'selectin', 'joined', 'raise', 'raise_on_sql')
+
+##
+#: The `_RAISING_STRATEGIES` are the loader strategies of relationships that
+#: are never loaded implicitly.
+#:
+_RAISING_STRATEGIES = ('raise', 'raise_on_sql')
+
+
+def relationship(*args, **kwargs) -> RelationshipProperty:
+    """relationship
+
+    Creates a relationship with `db.relationship`, and records its arguments so that a model can
+    create it again with the loader strategy declared in its `__loader_strategies__`.
+
+    :param args:
+        The positional arguments of `db.relationship`.
+    :param kwargs:
+        The keyword arguments of `db.relationship`.
+    """
+    prop = db.relationship(*args, **kwargs)
+    prop._relationship_args = (args, kwargs)
+    return prop
 
 
 class RecordNotFoundError(LookupError):
@@ -31,6 +101,39 @@ class RecordInvalidError(RuntimeError):
     """
 
 
+class InvalidCursorError(ValueError):
+    """InvalidCursorError
+
+    An error thrown when a pagination cursor is malformed, has been tampered with, or was issued
+    for a different model or ordering.
+    """
+
+
+class InvalidFieldsError(ValueError):
+    """InvalidFieldsError
+
+    An error thrown when a sparse fieldset names fields that the model does not expose.
+    """
+
+
+class KeysetPage(NamedTuple):
+    """KeysetPage
+
+    A page of records returned by `Model.paginate_keyset`.
+    """
+
+    ##
+    #: The records in the page, in order.
+    #:
+    items: List['Model']
+
+    ##
+    #: An opaque cursor for fetching the next page, or None if this is the
+    #: last page.
+    #:
+    cursor: Optional[str]
+
+
 class Model(db.Model):
     """Model
 
@@ -67,6 +170,57 @@ class Model(db.Model):
     #:
     InvalidError = RecordInvalidError
 
+    ##
+    #: The `__bulk_batch_size__` is the default number of rows sent to the
+    #: database in a single statement by the bulk helpers (`bulk_create`,
+    #: `bulk_update` and `upsert`). It may be overridden per model, or per call
+    #: with the `batch_size` argument.
+    #:
+    __bulk_batch_size__ = 1000
+
+    ##
+    #: The `__cache_ttl__` opts a model into the read-through entity cache.
+    #: When set to a number of seconds, `get_by_id` and `get_by_uuid` check
+    #: the application cache before querying the database, and `save`,
+    #: `update` and `delete` invalidate the cached record when their
+    #: transaction commits.
+    #:
+    #: Only column attributes are cached; relationships are loaded as usual.
+    #:
+    #: Default: `None` (caching disabled)
+    #:
+    __cache_ttl__: Optional[int] = None
+
+    ##
+    #: The `__cache_negative_ttl__` is the number of seconds for which a lookup
+    #: of a record that does not exist is cached, when `__cache_ttl__` is set.
+    #:
+    __cache_negative_ttl__: int = 5
+
+    ##
+    #: The `__loader_strategies__` declares the default loader strategy of
+    #: relationships of the model, by name, e.g.
+    #: `{'pets': 'selectin', 'owner': 'joined', 'history': 'raise'}`:
+    #:
+    #:   - `select`: Loaded with a query when first accessed on each record
+    #:     (the SQLAlchemy default).
+    #:   - `selectin`: Loaded for every record of a query with one additional
+    #:     `SELECT ... WHERE ... IN (...)` query.
+    #:   - `joined`: Loaded with the records, with a `LEFT OUTER JOIN`.
+    #:   - `raise` (or `raise_on_sql`): Never loaded implicitly. Accessing the
+    #:     relationship raises unless a loader option of the query loaded it
+    #:     (or, for `raise_on_sql`, unless it can be loaded without a query).
+    #:     Omitted by `to_dict` unless loaded.
+    #:
+    #: The relationships must be declared with `relationship` from this module,
+    #: as they are created again with the declared `lazy` argument. Loader
+    #: options of a query take precedence. Relationships created by a `backref`
+    #: declare their strategy with `backref(name, lazy=...)` instead.
+    #:
+    #: Default: `{}` (every relationship is loaded with `select`)
+    #:
+    __loader_strategies__: Dict[str, str] = {}
+
     ##
     #: The `id` field is a `BIGINT` surrogate primary key for unique
     #: identification of a record in a given table. It is meant to only be used
@@ -104,11 +258,40 @@ class Model(db.Model):
     #:
     updated_at = db.Column('updated_at', db.DateTime, server_default=db.text(str(db.func.now())), onupdate=datetime.now)
 
+    def __init_subclass__(cls, **kwargs) -> None:
+        """__init_subclass__
+
+        Applies the `__loader_strategies__` of a model to its relationships, before the model is
+        mapped: each of them is created again with the declared `lazy` argument, and mapped in
+        place of the declared one through the `properties` of the model's `__mapper_args__`.
+
+        :raises:
+            ValueError
+        """
+        super().__init_subclass__(**kwargs)
+        properties = {}
+        for key, strategy in cls.__dict__.get('__loader_strategies__', {}).items():
+            prop = cls.__dict__.get(key)
+            if not isinstance(prop, RelationshipProperty):
+                raise ValueError(f'{cls.__name__}.{key} is not a relationship declared by the model.')
+            if strategy not in _LOADER_STRATEGIES:
+                raise ValueError(f'The loader strategy of {cls.__name__}.{key} must be one of '
+                                 f'{", ".join(_LOADER_STRATEGIES)}.')
+            if not hasattr(prop, '_relationship_args'):
+                raise ValueError(f'{cls.__name__}.{key} must be declared with `relationship` from '
+                                 f'sayan_service.database to declare its loader strategy.')
+            args, kwargs = prop._relationship_args
+            properties[key] = relationship(*args, **{**kwargs, 'lazy': strategy})
+        if properties:
+            mapper_args = dict(cls.__dict__.get('__mapper_args__', {}))
+            cls.__mapper_args__ = {**mapper_args, 'properties': {**mapper_args.get('properties', {}), **properties}}
+
     @classmethod
     def get_by_id(cls, record_id: Union[int, str]):
         """get_by_id
 
-        Fetches a record by its `id` field.
+        Fetches a record by its `id` field. A record already loaded into the session is returned
+        without a query.
 
         :param id:
             The `id` of the record to retrieve.
@@ -117,7 +300,8 @@ class Model(db.Model):
         """
         result = None
         if cls._id_is_valid(record_id):
-            result = cls.query.get(int(record_id))
+            record_id = int(record_id)
+            result = cls._cached_get('id', record_id, lambda: cls._get_by_id(record_id))
         if not result:
             raise cls.NotFoundError(f'{cls.__name__} with ID {record_id} does not exist.')
         return result
@@ -135,11 +319,194 @@ class Model(db.Model):
         """
         result = None
         if cls._uuid_is_valid(record_uuid):
-            result = cls.query.filter(cls.uuid == record_uuid).one_or_none()
+            result = cls._cached_get('uuid', str(UUID(record_uuid)), lambda: cls._lookup('uuid', record_uuid))
         if not result:
             raise cls.NotFoundError(f'{cls.__name__} with UUID {record_uuid} does not exist.')
         return result
 
+    @classmethod
+    def get_many_by_id(cls, record_ids: Iterable[Union[int, str]]) -> List['Model']:
+        """get_many_by_id
+
+        Fetches the records for each of the given `id` values, in the order given.
+
+        Records already loaded into the session are returned without a query; the rest are fetched
+        with a single `SELECT ... WHERE id = ANY(...)` query.
+
+        :param record_ids:
+            The `id` values of the records to retrieve.
+        :raises:
+            RecordNotFoundError
+        """
+        record_ids = list(record_ids)
+        keys = {record_id: int(record_id) for record_id in record_ids if cls._id_is_valid(record_id)}
+
+        found = {}
+        for key in set(keys.values()):
+            instance = db.session.identity_map.get(identity_key(cls, key))
+            if instance is not None and cls._is_loaded(instance):
+                found[key] = instance
+
+        missing = set(keys.values()) - found.keys()
+        if missing:
+            found.update((record.id, record) for record in cls._lookup_many('id', list(missing)))
+
+        return cls._ordered_or_raise(record_ids, keys, found, 'IDs')
+
+    @classmethod
+    def get_many_by_uuid(cls, record_uuids: Iterable[str]) -> List['Model']:
+        """get_many_by_uuid
+
+        Fetches the records for each of the given `uuid` values, in the order given, with a single
+        `SELECT ... WHERE uuid = ANY(...)` query. Unlike `get_many_by_id`, records already loaded
+        into the session are not looked up first, as the session is only keyed by `id`; the query
+        returns those instances as they are.
+
+        :param record_uuids:
+            The `uuid` values of the records to retrieve.
+        :raises:
+            RecordNotFoundError
+        """
+        record_uuids = list(record_uuids)
+        keys = {
+            record_uuid: str(UUID(str(record_uuid)))
+            for record_uuid in record_uuids if cls._uuid_is_valid(str(record_uuid))
+        }
+
+        found = {}
+        if keys:
+            found = {str(record.uuid): record for record in cls._lookup_many('uuid', list(set(keys.values())))}
+
+        return cls._ordered_or_raise(record_uuids, keys, found, 'UUIDs')
+
+    @classmethod
+    def response_tag(cls, record_uuid: Optional[Any]=None) -> str:
+        """response_tag
+
+        Returns the response cache tag of the model, or of one of its records, which is invalidated
+        when the model (or the record) is written through `save`, `delete` or the bulk helpers.
+        See :mod:`sayan_service.response_cache`.
+
+        :param record_uuid:
+            The `uuid` of a record, or None for the tag of the model.
+        """
+        if record_uuid is None:
+            return cls.__tablename__
+        return f'{cls.__tablename__}.{UUID(str(record_uuid))}'
+
+    @classmethod
+    def field_options(cls, fields: Optional[Iterable[str]], include: Sequence[Column]=()) -> list:
+        """field_options
+
+        Returns the loader options that load only the requested `fields` of the model (a sparse
+        fieldset): the requested columns with `load_only`, and the requested relationships with a
+        `selectinload` each. Relationships that are not requested are left to load lazily, and
+        are therefore not loaded at all unless accessed. Returns no options if `fields` is None.
+
+        :param fields:
+            The names of the columns and relationships to load, as accepted by `dump` and
+            `to_dict`, or None for every column.
+        :param include:
+            Columns to load even if not requested, e.g. those needed to encode a cursor.
+        :raises:
+            InvalidFieldsError
+        """
+        if fields is None:
+            return []
+
+        fields = set(fields)
+        unknown = fields - set(cls.field_names())
+        if unknown:
+            raise InvalidFieldsError(f'{cls.__name__} has no fields {", ".join(sorted(unknown))}.')
+
+        mapper = cls.__mapper__
+        relationships = [mapper.relationships[key] for key in mapper.relationships.keys() if key in fields]
+        columns = {key for key in mapper.column_attrs.keys() if key in fields}
+        columns.update(column.key for column in include)
+        for relationship in relationships:
+            # Loading related records requires the columns that join to them.
+            columns.update(mapper.get_property_by_column(column).key for column in relationship.local_columns)
+
+        return [
+            load_only(*(getattr(cls, key) for key in sorted(columns or {'id'}))),
+            *(selectinload(getattr(cls, relationship.key)) for relationship in relationships),
+        ]
+
+    @classmethod
+    def field_names(cls) -> List[str]:
+        """field_names
+
+        Returns the names of the fields that may be requested in a sparse fieldset: every column
+        except the internal `id`, and every relationship.
+        """
+        return [key for key in cls._attribute_keys() if key != 'id']
+
+    @classmethod
+    def query_fields(cls, fields: Optional[Iterable[str]], query: Optional[Query]=None) -> Query:
+        """query_fields
+
+        Returns a query that loads only the requested `fields` of the model. See `field_options`.
+
+        :param fields:
+            The names of the columns and relationships to load, or None for every column.
+        :param query:
+            The query to restrict. Defaults to `cls.query`.
+        :raises:
+            InvalidFieldsError
+        """
+        query = cls.query if query is None else query
+        return query.options(*cls.field_options(fields))
+
+    @classmethod
+    def paginate_keyset(cls, after: Optional[str]=None, limit: int=25, order_by: Optional[Sequence[Column]]=None,
+                        descending: bool=False, query: Optional[Query]=None,
+                        fields: Optional[Iterable[str]]=None) -> KeysetPage:
+        """paginate_keyset
+
+        Fetches a page of records ordered by the `order_by` columns, starting after the position
+        encoded in the `after` cursor. Rather than an `OFFSET`, the cursor is turned into a
+        `WHERE (created_at, id) > (...)` row comparison, so fetching a deep page costs the same as
+        fetching the first one, provided there is an index on the `order_by` columns.
+
+        The returned cursor is signed with the `SECRET_KEY`, so it cannot be forged or reused with
+        a different model, ordering or direction.
+
+        :param after:
+            A cursor returned with a previous page, or None for the first page.
+        :param limit:
+            The maximum number of records in the page.
+        :param order_by:
+            The columns to order by. The last column must be unique. Defaults to
+            `(created_at, id)`.
+        :param descending:
+            If True, orders the records in descending order.
+        :param query:
+            The query to paginate. Defaults to `cls.query`.
+        :param fields:
+            The names of the columns and relationships to load, or None for every column. The
+            `order_by` columns are always loaded. See `field_options`.
+        :raises:
+            InvalidCursorError
+            InvalidFieldsError
+        """
+        order_by = tuple(order_by or (cls.created_at, cls.id))
+        query = cls.query if query is None else query
+        query = query.options(*cls.field_options(fields, include=order_by))
+
+        if after is not None:
+            position = tuple_(*order_by)
+            after_position = tuple_(*cls._decode_cursor(after, order_by, descending))
+            query = query.filter(position < after_position if descending else position > after_position)
+
+        query = query.order_by(*(column.desc() if descending else column for column in order_by))
+        items = query.limit(limit + 1).all()
+
+        cursor = None
+        if len(items) > limit:
+            items = items[:limit]
+            cursor = cls._encode_cursor(items[-1], order_by, descending)
+        return KeysetPage(items, cursor)
+
     @classmethod
     def create(cls, **kwargs):
         """create
@@ -151,6 +518,118 @@ class Model(db.Model):
         """
         return cls(**kwargs).save()
 
+    @classmethod
+    def bulk_create(cls, rows: Iterable[dict], batch_size: Optional[int]=None, commit: bool=True) -> List[Row]:
+        """bulk_create
+
+        Creates a record for each dict in `rows`, sending one multi-row `INSERT ... RETURNING`
+        statement per batch rather than one statement per record.
+
+        Returns the inserted rows, including server-generated values (`id`, `uuid`, `created_at`
+        and `updated_at`). The rows are plain result rows rather than model instances, so no
+        objects are added to the session.
+
+        All rows must have the same keys: a column omitted from some rows would otherwise be set
+        to NULL rather than to its default.
+
+        :param rows:
+            An iterable of dicts, each of which is used as the attributes for a record.
+        :param batch_size:
+            The number of rows to insert per statement. Defaults to `__bulk_batch_size__`.
+        :param commit:
+            If True, commits the current transaction once all batches have been sent.
+        :raises:
+            RecordInvalidError, SQLAlchemyError
+        """
+        def statement(batch):
+            return pg.insert(cls.__table__).values(batch)
+
+        return cls._bulk_execute(statement, rows, batch_size, commit)
+
+    @classmethod
+    def upsert(cls, rows: Iterable[dict], conflict_on: Sequence[str]=('uuid',),
+               batch_size: Optional[int]=None, commit: bool=True) -> List[Row]:
+        """upsert
+
+        Creates or updates a record for each dict in `rows` with multi-row
+        `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` statements, one per batch. When a row
+        conflicts with an existing record on the `conflict_on` columns, the existing record is
+        updated with the other attributes given in the row and its `updated_at` is refreshed.
+
+        Returns the inserted or updated rows, as with `bulk_create`. Rows of a batch with the same
+        values for the `conflict_on` columns would update the same record twice, which PostgreSQL
+        rejects, so only the last of them is sent and returned.
+
+        All rows must have the same keys.
+
+        :param rows:
+            An iterable of dicts, each of which is used as the attributes for a record.
+        :param conflict_on:
+            The names of the columns of a unique constraint or index used to detect conflicts.
+        :param batch_size:
+            The number of rows to upsert per statement. Defaults to `__bulk_batch_size__`.
+        :param commit:
+            If True, commits the current transaction once all batches have been sent.
+        :raises:
+            RecordInvalidError, SQLAlchemyError
+        """
+        immutable_keys = set(conflict_on) | {'id', 'uuid', 'created_at'}
+
+        def statement(batch):
+            # Rows without a value for every conflict column cannot conflict with each other.
+            unique = {}
+            for index, row in enumerate(batch):
+                key = tuple(row.get(k) for k in conflict_on)
+                unique[index if None in key else key] = row
+            batch = list(unique.values())
+
+            insert = pg.insert(cls.__table__).values(batch)
+            assignments = {k: insert.excluded[k] for k in batch[0] if k not in immutable_keys}
+            assignments['updated_at'] = db.func.now()
+            return insert.on_conflict_do_update(index_elements=list(conflict_on), set_=assignments)
+
+        return cls._bulk_execute(statement, rows, batch_size, commit)
+
+    @classmethod
+    def bulk_update(cls, rows: Iterable[dict], key: str='uuid', batch_size: Optional[int]=None,
+                    commit: bool=True) -> List[Row]:
+        """bulk_update
+
+        Updates existing records from the dicts in `rows`, matching each row to a record by its
+        `key` attribute. Each batch is sent as a single `UPDATE ... FROM (VALUES ...) RETURNING`
+        statement. Rows that do not match an existing record are ignored.
+
+        Returns the updated rows, as with `bulk_create`.
+
+        All rows must have the same keys.
+
+        :param rows:
+            An iterable of dicts, each containing `key` and the attributes to update.
+        :param key:
+            The name of the column used to match rows to records.
+        :param batch_size:
+            The number of rows to update per statement. Defaults to `__bulk_batch_size__`.
+        :param commit:
+            If True, commits the current transaction once all batches have been sent.
+        :raises:
+            RecordInvalidError, SQLAlchemyError
+        """
+        table = cls.__table__
+
+        def statement(batch):
+            keys = list(batch[0])
+            rows = values(*(db.column(k, table.c[k].type) for k in keys), name='bulk_rows')
+            rows = rows.data([tuple(row[k] for k in keys) for row in batch])
+            assignments = {k: cast(rows.c[k], table.c[k].type) for k in keys if k != key}
+            assignments['updated_at'] = db.func.now()
+            return (
+                update(table)
+                .where(table.c[key] == cast(rows.c[key], table.c[key].type))
+                .values(assignments)
+            )
+
+        return cls._bulk_execute(statement, rows, batch_size, commit)
+
     def update(self, commit: bool=True, **kwargs):
         """update
 
@@ -163,7 +642,7 @@ class Model(db.Model):
         """
         for attr, value in kwargs.items():
             setattr(self, attr, value)
-        return commit and self.save() or self
+        return self.save(commit=commit)
 
     def save(self, commit: bool=True):
         """save
@@ -181,6 +660,8 @@ class Model(db.Model):
             RecordInvalidError, SQLAlchemyError
         """
         db.session.add(self)
+        self._evict_on_commit()
+        response_cache.invalidate_on_commit(db.session, *self._response_tags())
         if commit:
             try:
                 db.session.commit()
@@ -205,19 +686,408 @@ class Model(db.Model):
         :rtype:
             bool
         """
+        self._evict_on_commit()
+        response_cache.invalidate_on_commit(db.session, *self._response_tags())
         db.session.delete(self)
         return commit and db.session.commit()
 
-    def to_dict(self) -> dict:
+    def to_dict(self, fields: Optional[Iterable[str]]=None) -> dict:
         """to_dict
 
         Returns a dictionary representation of the shallow attributes on the
-        model.
+        model. Relationships with a `raise` loader strategy are only included
+        if they have been loaded.
+
+        :param fields:
+            The names of the attributes to include. Defaults to every column and
+            relationship.
+        :raises:
+            InvalidFieldsError
+        """
+        keys = self._attribute_keys()
+        if fields is not None:
+            fields = set(fields)
+            unknown = fields - set(keys)
+            if unknown:
+                raise InvalidFieldsError(f'{type(self).__name__} has no fields {", ".join(sorted(unknown))}.')
+            keys = [k for k in keys if k in fields]
+        raising_keys = self._raising_keys()
+        if raising_keys:
+            unloaded = inspect(self).unloaded
+            keys = [k for k in keys if k not in raising_keys or k not in unloaded]
+        return {k: getattr(self, k, None) for k in keys}
+
+    def dump(self, fields: Optional[Iterable[str]]=None) -> dict:
+        """dump
+
+        Returns a JSON-ready dict of the record's columns (excluding the internal `id`), using the
+        model's compiled `ModelDumper`.
+
+        :param fields:
+            The names of the columns and relationships to include. Defaults to every column.
+        """
+        return self.dumper(fields).dump(self)
+
+    @classmethod
+    def dump_many(cls, records: Iterable[Any], fields: Optional[Iterable[str]]=None) -> List[dict]:
+        """dump_many
+
+        Returns a list of JSON-ready dicts for the given records, or for `Row` tuples from a
+        column-only query, using the model's compiled `ModelDumper`.
+
+        :param records:
+            The records or rows to dump.
+        :param fields:
+            The names of the columns and relationships to include. Defaults to every column.
         """
-        mapper = self.__mapper__
-        attribute_keys = mapper.columns.keys() + mapper.relationships.keys()
+        return cls.dumper(fields).dump_many(records)
 
-        return {k: getattr(self, k, None) for k in attribute_keys}
+    @classmethod
+    def dumper(cls, fields: Optional[Iterable[str]]=None) -> ModelDumper:
+        """dumper
+
+        Returns the compiled `ModelDumper` for this model and the given `fields`. Dumpers are
+        compiled on first use and cached.
+
+        :param fields:
+            The names of the columns and relationships to include. Defaults to every column.
+        """
+        return _model_dumper(cls, None if fields is None else frozenset(fields))
+
+    @classmethod
+    def _attribute_keys(cls) -> List[str]:
+        """_attribute_keys
+
+        Returns the names of the column and relationship attributes of the model, as used by
+        `to_dict`. The names are computed from the mapper once per model.
+        """
+        keys = cls.__dict__.get('_to_dict_keys')
+        if keys is None:
+            mapper = cls.__mapper__
+            keys = cls._to_dict_keys = mapper.columns.keys() + mapper.relationships.keys()
+        return keys
+
+    @classmethod
+    def _raising_keys(cls) -> FrozenSet[str]:
+        """_raising_keys
+
+        Returns the names of the relationships of the model with a `raise` loader strategy, which
+        `to_dict` omits unless loaded. The names are computed from the mapper once per model.
+        """
+        keys = cls.__dict__.get('_to_dict_raising_keys')
+        if keys is None:
+            keys = cls._to_dict_raising_keys = frozenset(
+                key for key, prop in cls.__mapper__.relationships.items() if prop.lazy in _RAISING_STRATEGIES)
+        return keys
+
+    @classmethod
+    def _cursor_serializer(cls, order_by: Sequence[Column], descending: bool) -> URLSafeSerializer:
+        """_cursor_serializer
+
+        Returns the serializer used to sign pagination cursors for the given ordering and direction.
+
+        :param order_by:
+            The columns that the cursor position refers to.
+        :param descending:
+            If True, the cursor position refers to the descending order.
+        """
+        direction = 'desc' if descending else 'asc'
+        salt = f'keyset.{cls.__tablename__}.{direction}.' + '.'.join(column.key for column in order_by)
+        return URLSafeSerializer(current_app.config['SECRET_KEY'], salt=salt)
+
+    @classmethod
+    def _encode_cursor(cls, record: Any, order_by: Sequence[Column], descending: bool=False) -> str:
+        """_encode_cursor
+
+        Returns a signed cursor encoding the position of `record` in the given ordering.
+
+        :param record:
+            The last record of a page.
+        :param order_by:
+            The columns that define the position of the record.
+        :param descending:
+            If True, the position refers to the descending order.
+        """
+        position = [_encode_cursor_value(getattr(record, column.key)) for column in order_by]
+        return cls._cursor_serializer(order_by, descending).dumps(position)
+
+    @classmethod
+    def _decode_cursor(cls, cursor: str, order_by: Sequence[Column], descending: bool=False) -> List[Any]:
+        """_decode_cursor
+
+        Returns the position encoded in a cursor created by `_encode_cursor` for the same ordering
+        and direction.
+
+        :param cursor:
+            The cursor to decode.
+        :param order_by:
+            The columns that define the position.
+        :param descending:
+            If True, the position refers to the descending order.
+        :raises:
+            InvalidCursorError
+        """
+        try:
+            position = cls._cursor_serializer(order_by, descending).loads(cursor)
+            if not isinstance(position, list) or len(position) != len(order_by):
+                raise ValueError('The cursor does not match the ordering.')
+            return [_decode_cursor_value(column, value) for column, value in zip(order_by, position)]
+        except (ArithmeticError, BadData, TypeError, ValueError) as ex:
+            raise InvalidCursorError(f'The cursor is invalid: {str(ex)}')
+
+    @classmethod
+    def _get_by_id(cls, record_id: int) -> Optional['Model']:
+        """_get_by_id
+
+        Returns the record with the given `id`, or None. A record already loaded into the session
+        is returned without a query.
+
+        :param record_id:
+            The `id` of the record.
+        """
+        instance = db.session.identity_map.get(identity_key(cls, record_id))
+        if instance is not None and cls._is_loaded(instance):
+            return instance
+        return cls._lookup('id', record_id)
+
+    @classmethod
+    def _lookup(cls, key_name: str, key: Union[int, str]) -> Optional['Model']:
+        """_lookup
+
+        Queries the record whose `key_name` column is `key`, or None, with the model's cached
+        lookup statement.
+
+        :param key_name:
+            The name of the column identifying the record (`id` or `uuid`).
+        :param key:
+            The value of the identifying column.
+        """
+        return db.session.execute(_lookup_statement(cls, key_name, False), {key_name: key}).scalars().one_or_none()
+
+    @classmethod
+    def _lookup_many(cls, key_name: str, keys: List[Union[int, str]]) -> List['Model']:
+        """_lookup_many
+
+        Queries the records whose `key_name` column is any of `keys`, with the model's cached
+        lookup statement.
+
+        :param key_name:
+            The name of the column identifying the records (`id` or `uuid`).
+        :param keys:
+            The values of the identifying column.
+        """
+        return db.session.execute(_lookup_statement(cls, key_name, True), {key_name: keys}).scalars().all()
+
+    @classmethod
+    def _cached_get(cls, key_name: str, key: Union[int, str], load) -> Optional['Model']:
+        """_cached_get
+
+        Returns the record identified by `key_name` and `key`, reading through the entity cache
+        when `__cache_ttl__` is set. Records already loaded into the session are returned without
+        consulting the cache.
+
+        :param key_name:
+            The name of the column identifying the record (`id` or `uuid`).
+        :param key:
+            The normalized value of the identifying column.
+        :param load:
+            A callable that loads the record (or None) from the database.
+        """
+        if not cls.__cache_ttl__:
+            return load()
+
+        cache_key = cls._cache_key(key_name, key)
+        data = cache.get(cache_key)
+        if data is not None:
+            ENTITY_CACHE_HITS.labels(cls.__name__).inc()
+            return None if data == _CACHED_NOT_FOUND else cls._from_cache(data)
+
+        ENTITY_CACHE_MISSES.labels(cls.__name__).inc()
+        result = load()
+        if result is None:
+            cache.set(cache_key, _CACHED_NOT_FOUND, timeout=cls.__cache_negative_ttl__)
+        else:
+            data = {attr.key: getattr(result, attr.key) for attr in cls.__mapper__.column_attrs}
+            cache.set_many({
+                cls._cache_key('id', data['id']): data,
+                cls._cache_key('uuid', str(data['uuid'])): data,
+            }, timeout=cls.__cache_ttl__)
+        return result
+
+    @classmethod
+    def _from_cache(cls, data: dict) -> 'Model':
+        """_from_cache
+
+        Returns a session-bound record built from cached column values, without querying the
+        database. If the record is already loaded into the session, that instance is returned.
+
+        :param data:
+            A mapping of column attribute names to values.
+        """
+        instance = db.session.identity_map.get(identity_key(cls, data['id']))
+        if instance is not None and cls._is_loaded(instance):
+            return instance
+
+        instance = cls.__mapper__.class_manager.new_instance()
+        for attr, value in data.items():
+            set_committed_value(instance, attr, value)
+        make_transient_to_detached(instance)
+        return db.session.merge(instance, load=False)
+
+    @classmethod
+    def _cache_key(cls, key_name: str, key: Union[int, str]) -> str:
+        """_cache_key
+
+        Returns the entity cache key for the record identified by `key_name` and `key`.
+
+        :param key_name:
+            The name of the column identifying the record (`id` or `uuid`).
+        :param key:
+            The normalized value of the identifying column.
+        """
+        return f'model.{cls.__tablename__}.{key_name}.{key}'
+
+    def _cache_keys(self) -> List[str]:
+        """_cache_keys
+
+        Returns the entity cache keys under which this record may be cached, including those for
+        its previous `uuid` if it has been changed. Returns an empty list if caching is disabled.
+        """
+        if not self.__cache_ttl__:
+            return []
+
+        state = inspect(self)
+        if state.persistent and 'uuid' not in state.dict:
+            self.uuid  # Loads expired attributes so that the cached `uuid` entry can be evicted.
+
+        return [
+            self._cache_key(key_name, str(key))
+            for key_name in ('id', 'uuid')
+            for key in set(state.attrs[key_name].history.sum())
+            if key is not None
+        ]
+
+    def _response_tags(self) -> List[str]:
+        """_response_tags
+
+        Returns the response cache tags invalidated by writing this record: those of its model and
+        of its `uuid`, if it has one. Returns an empty list if response caching is disabled.
+        """
+        if not response_cache.enabled:
+            return []
+
+        state = inspect(self)
+        if state.persistent and 'uuid' not in state.dict:
+            self.uuid  # Loads expired attributes so that the record's tag can be invalidated.
+        record_uuid = state.dict.get('uuid')
+        return [self.response_tag()] + ([self.response_tag(record_uuid)] if record_uuid else [])
+
+    def _evict_on_commit(self) -> None:
+        """_evict_on_commit
+
+        Evicts this record from the entity cache when the session's transaction commits, rather
+        than before, so that a concurrent read cannot cache its previous state again. The keys are
+        computed now, to include those of a previous `uuid`, and again after each flush, to include
+        the `id` of a new record. Nothing is evicted if the transaction is rolled back.
+        """
+        if self.__cache_ttl__:
+            db.session.info.setdefault(_PENDING_RECORDS_KEY, set()).add(self)
+            _evict_keys_on_commit(db.session, type(self), self._cache_keys())
+
+    @classmethod
+    def _is_loaded(cls, instance: 'Model') -> bool:
+        """_is_loaded
+
+        Returns True if the given session-bound `instance` can be used without a refresh query,
+        False if it has expired attributes or has been deleted.
+
+        :param instance:
+            A record from the session identity map.
+        """
+        state = inspect(instance)
+        return not (state.expired_attributes or state.was_deleted)
+
+    @classmethod
+    def _ordered_or_raise(cls, record_keys: List[Any], keys: dict, found: dict, label: str) -> List['Model']:
+        """_ordered_or_raise
+
+        Returns the records in `found` in the order of `record_keys`, raising a single
+        `RecordNotFoundError` naming every key that is invalid or has no record.
+
+        :param record_keys:
+            The keys as given by the caller.
+        :param keys:
+            A mapping of each valid key as given to its normalized form.
+        :param found:
+            A mapping of normalized keys to records.
+        :param label:
+            The name of the key type, used in the error message.
+        :raises:
+            RecordNotFoundError
+        """
+        missing = [record_key for record_key in record_keys if keys.get(record_key) not in found]
+        if missing:
+            raise cls.NotFoundError(
+                f'{cls.__name__} with {label} {", ".join(map(str, missing))} does not exist.')
+        return [found[keys[record_key]] for record_key in record_keys]
+
+    @classmethod
+    def _bulk_execute(cls, statement, rows: Iterable[dict], batch_size: Optional[int],
+                      commit: bool) -> List[Row]:
+        """_bulk_execute
+
+        Executes the statement built by `statement` for each batch of `rows`, returning the affected
+        rows. If a row does not have the same keys as the first, or a batch violates the schema,
+        the transaction is rolled back and an appropriate exception is raised.
+
+        :param statement:
+            A callable that is given a list of row dicts and returns a DML statement.
+        :param rows:
+            An iterable of row dicts.
+        :param batch_size:
+            The number of rows per batch. Defaults to `__bulk_batch_size__`.
+        :param commit:
+            If True, commits the current transaction once all batches have been sent.
+        :raises:
+            RecordInvalidError, SQLAlchemyError
+        """
+        batch_size = batch_size or cls.__bulk_batch_size__
+        keys = None
+        records = []
+        for index, batch in enumerate(_batched(rows, batch_size)):
+            keys = keys or batch[0].keys()
+            for position, row in enumerate(batch):
+                if row.keys() != keys:
+                    db.session.rollback()
+                    raise cls.InvalidError(
+                        f'Row {index * batch_size + position} of {cls.__name__} records has the keys '
+                        f'{", ".join(sorted(row))} rather than {", ".join(sorted(keys))}; all rows must '
+                        f'have the same keys.')
+            try:
+                records.extend(db.session.execute(statement(batch).returning(*cls.__table__.columns)))
+            except IntegrityError as ex:
+                db.session.rollback()
+                raise cls.InvalidError(f'Batch {index} of {cls.__name__} records was unable to be saved: {str(ex)}')
+            except SQLAlchemyError as ex:
+                db.session.rollback()
+                if getattr(getattr(ex, 'orig', None), 'pgcode', None) == _CARDINALITY_VIOLATION:
+                    raise cls.InvalidError(
+                        f'Batch {index} of {cls.__name__} records affects the same record more than once: {str(ex)}')
+                raise
+        if cls.__cache_ttl__:
+            _evict_keys_on_commit(db.session, cls, [
+                cls._cache_key(key_name, str(getattr(record, key_name)))
+                for record in records for key_name in ('id', 'uuid')])
+        if records:
+            response_cache.invalidate_on_commit(
+                db.session, cls.response_tag(), *(cls.response_tag(record.uuid) for record in records))
+        if commit:
+            try:
+                db.session.commit()
+            except SQLAlchemyError:
+                db.session.rollback()
+                raise
+        return records
 
     @classmethod
     def _id_is_valid(cls, record_id: Any) -> bool:
@@ -247,6 +1117,149 @@ class Model(db.Model):
         return True
 
 
+def _evict_keys_on_commit(session: Session, model: type, cache_keys: Iterable[str]) -> None:
+    """_evict_keys_on_commit
+
+    Evicts the given keys from the entity cache when the session's transaction commits.
+
+    :param session:
+        The session whose transaction writes the cached records.
+    :param model:
+        The model of the cached records.
+    :param cache_keys:
+        The keys to evict, as returned by `Model._cache_keys`.
+    """
+    if cache_keys:
+        session.info.setdefault(_PENDING_EVICTIONS_KEY, {}).setdefault(model.__name__, set()).update(cache_keys)
+
+
+def _after_flush(session: Session, flush_context: Any) -> None:
+    """ Queues the entity cache keys of the written records again, now that new records have an `id`. """
+    for record in session.info.get(_PENDING_RECORDS_KEY, ()):
+        _evict_keys_on_commit(session, type(record), record._cache_keys())
+
+
+def _after_commit(session: Session) -> None:
+    """ Evicts the entity cache keys of the records written in a committed transaction. """
+    session.info.pop(_PENDING_RECORDS_KEY, None)
+    for model_name, cache_keys in session.info.pop(_PENDING_EVICTIONS_KEY, {}).items():
+        cache.delete_many(*cache_keys)
+        ENTITY_CACHE_EVICTIONS.labels(model_name).inc(len(cache_keys))
+
+
+def _after_rollback(session: Session) -> None:
+    """ Forgets the entity cache keys of the records written in a rolled back transaction. """
+    session.info.pop(_PENDING_RECORDS_KEY, None)
+    session.info.pop(_PENDING_EVICTIONS_KEY, None)
+
+
+event.listen(Session, 'after_flush', _after_flush)
+event.listen(Session, 'after_commit', _after_commit)
+event.listen(Session, 'after_rollback', _after_rollback)
+
+
+@lru_cache(maxsize=None)
+def _lookup_statement(model: type, key_name: str, many: bool) -> Select:
+    """_lookup_statement
+
+    Returns the statement that selects the records of `model` by their `key_name` column, built once
+    per model. The value (or, if `many`, the array of values) of the column is bound to the
+    `key_name` parameter at execution, so every lookup executes the same statement, whose compiled
+    form is always found in SQLAlchemy's compiled cache. The statement is marked to be prepared on
+    the server, if `SQLALCHEMY_PREPARED_STATEMENTS` is set.
+
+    :param model:
+        The mapped model class.
+    :param key_name:
+        The name of the column identifying the records (`id` or `uuid`).
+    :param many:
+        If True, selects the records matching any of an array of values.
+    """
+    column = getattr(model, key_name)
+    if many:
+        # psycopg2 sends an array of UUIDs as an array of strings, which PostgreSQL does not compare
+        # with UUIDs, so the parameter is typed as such (`%(uuid)s::VARCHAR[]`, which is also its
+        # declared type once prepared), and cast to an array of UUIDs by the statement.
+        parameter = bindparam(key_name, type_=pg.ARRAY(db.String if key_name == 'uuid' else column.type))
+        criterion = column == any_(cast(parameter, pg.ARRAY(column.type)))
+    else:
+        criterion = column == bindparam(key_name)
+    return select(model).where(criterion).execution_options(**{PREPARE_OPTION: True})
+
+
+@lru_cache(maxsize=256)
+def _model_dumper(model: type, fields: Optional[frozenset]) -> ModelDumper:
+    """_model_dumper
+
+    Returns a `ModelDumper` for the given model and fields, compiling it on first use.
+
+    :param model:
+        The mapped model class.
+    :param fields:
+        The names of the columns to include, or None for every column.
+    """
+    return ModelDumper(model, fields=fields)
+
+
+def _batched(rows: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """_batched
+
+    Splits `rows` into lists of at most `batch_size` items.
+
+    :param rows:
+        An iterable to split into batches.
+    :param batch_size:
+        The maximum number of items per batch.
+    """
+    rows = iter(rows)
+    batch = list(islice(rows, batch_size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, batch_size))
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    """_encode_cursor_value
+
+    Returns a column value of a cursor position as JSON: datetimes, dates and times as ISO 8601
+    strings, and decimals and UUIDs as strings.
+
+    :param value:
+        The value of an ordering column.
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (Decimal, UUID)):
+        return str(value)
+    return value
+
+
+def _decode_cursor_value(column: Column, value: Any) -> Any:
+    """_decode_cursor_value
+
+    Returns a column value of a cursor position encoded by `_encode_cursor_value`, converted back
+    to the type of the column.
+
+    :param column:
+        The ordering column.
+    :param value:
+        The encoded value.
+    :raises:
+        TypeError, ValueError, ArithmeticError
+    """
+    if value is None:
+        return None
+    if isinstance(column.type, db.DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, db.Date):
+        return date.fromisoformat(value)
+    if isinstance(column.type, db.Time):
+        return time.fromisoformat(value)
+    if isinstance(column.type, db.Numeric) and column.type.asdecimal:
+        return Decimal(value)
+    return value
+
+
 def reference_col(tablename, nullable=False, pk_name='id', schema=None, **kwargs):
     """reference_col
 
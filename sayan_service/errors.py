@@ -3,7 +3,7 @@
 
 from typing import Tuple
 
-from .database import RecordInvalidError, RecordNotFoundError
+from .database import InvalidCursorError, InvalidFieldsError, RecordInvalidError, RecordNotFoundError
 from .http import http_response
 
 
@@ -34,6 +34,20 @@ def resolve_error(error: Exception) -> Tuple[dict, int]:
     if isinstance(error, RecordInvalidError):
         response = http_response(400)
 
+    ##
+    # If a pagination cursor cannot be decoded or has been tampered with,
+    # respond with a 400 Bad Request.
+    #
+    if isinstance(error, InvalidCursorError):
+        response = http_response(400)
+
+    ##
+    # If a sparse fieldset names fields that the model does not expose,
+    # respond with a 400 Bad Request.
+    #
+    if isinstance(error, InvalidFieldsError):
+        response = http_response(400)
+
     return response
 
 
@@ -5,14 +5,33 @@ from flask_bcrypt import Bcrypt
 from flask_caching import Cache
 from flask_cors import CORS
 from flask_marshmallow import Marshmallow
-from flask_migrate import Migrate
-from flask_sqlalchemy import SQLAlchemy
+from .flask_json import FlaskJSON
+from .flask_replicas import RoutingSQLAlchemy
 from .flask_structlog import FlaskStructlog
 
 bcrypt = Bcrypt()
 cache = Cache()
 cors = CORS()
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
+json = FlaskJSON()
 marshmallow = Marshmallow()
-migrate = Migrate()
 structlog = FlaskStructlog()
+
+
+def __getattr__(name):
+    """__getattr__
+
+    Returns the `migrate` extension, importing Flask-Migrate (and Alembic) on first access. Only the
+    `flask` command line interface uses it, so application workers never import it, which shortens
+    their startup.
+
+    :param name:
+        The name of the attribute.
+    :raises:
+        AttributeError
+    """
+    if name == 'migrate':
+        from flask_migrate import Migrate
+        globals()['migrate'] = Migrate()
+        return globals()['migrate']
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
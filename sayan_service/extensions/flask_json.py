@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+""" A Flask plugin for pluggable JSON encoding of Flask and Connexion responses. """
+
+import json
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Optional, Union
+from uuid import UUID
+
+from connexion.apis.flask_api import FlaskApi
+from connexion.jsonifier import Jsonifier
+from flask import Flask, Response, current_app, has_app_context
+from flask import json as flask_json
+
+from sayan_service.instrumentation.timing import timed_serialization
+
+
+##
+#: We attempt to import the orjson package (a C-accelerated JSON library) and
+#: set a flag if it is not available.
+#:
+try:
+    import orjson
+    _HAS_ORJSON = True
+except ImportError:
+    _HAS_ORJSON = False
+
+
+def _default(o: Any) -> Any:
+    """_default
+
+    Converts a value that is not natively representable in JSON into one that is. Datetimes, dates
+    and times are rendered as ISO 8601 strings, UUIDs and decimals as strings and enums by value.
+    Decimals are not rendered as numbers, as converting them to floats would lose their precision.
+
+    :param o:
+        The value to convert.
+    :raises:
+        TypeError
+    """
+    if isinstance(o, (datetime, date, time)):
+        return o.isoformat()
+    if isinstance(o, UUID):
+        return str(o)
+    if isinstance(o, Decimal):
+        return str(o)
+    if isinstance(o, Enum):
+        return o.value
+    raise TypeError(f'Object of type {type(o).__name__} is not JSON serializable')
+
+
+class JSONEncoder(flask_json.JSONEncoder):
+    """JSONEncoder
+
+    A JSON encoder for the standard library `json` module (and `flask.json`) that handles the same
+    types as the orjson provider.
+    """
+
+    def default(self, o: Any) -> Any:
+        try:
+            return _default(o)
+        except TypeError:
+            return super().default(o)
+
+
+class StdlibJSONProvider:
+    """StdlibJSONProvider
+
+    Encodes and decodes JSON with the standard library `json` module.
+    """
+
+    name = 'stdlib'
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        """dumps
+
+        Serializes `obj` to a compact JSON string.
+
+        :param obj:
+            The object to serialize.
+        :param kwargs:
+            Additional arguments for `json.dumps` (e.g. `indent`).
+        """
+        kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, cls=JSONEncoder, **kwargs)
+
+    def loads(self, s: Union[str, bytes]) -> Any:
+        """loads
+
+        Deserializes a JSON document.
+
+        :param s:
+            The JSON document.
+        """
+        return json.loads(s)
+
+
+class OrjsonJSONProvider:
+    """OrjsonJSONProvider
+
+    Encodes and decodes JSON with the C-accelerated `orjson` package, which natively handles
+    datetimes, UUIDs and enums.
+    """
+
+    name = 'orjson'
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        """dumps
+
+        Serializes `obj` to a compact JSON string.
+
+        :param obj:
+            The object to serialize.
+        :param kwargs:
+            Accepted for compatibility with `json.dumps`. Only `indent` is honoured (as a two-space
+            indent); other arguments are ignored.
+        """
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option).decode('utf-8')
+
+    def loads(self, s: Union[str, bytes]) -> Any:
+        """loads
+
+        Deserializes a JSON document.
+
+        :param s:
+            The JSON document.
+        """
+        return orjson.loads(s)
+
+
+class FlaskJSON:
+    """FlaskJSON
+
+    A flask extension that selects the JSON provider used for responses, based on the `JSON_PROVIDER`
+    setting, and plugs it into Flask and Connexion.
+    """
+
+    def __init__(self, app: Optional[Flask]=None) -> None:
+        self._default_provider = StdlibJSONProvider()
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        """init_app
+
+        Registers the configured provider for the app and sets the Flask JSON encoder used by
+        `flask.json` and `flask.jsonify`.
+
+        :param app:
+            The Flask app to configure.
+        """
+        app.extensions['json'] = self._create_provider(app.config.get('JSON_PROVIDER', 'auto'))
+        app.json_encoder = JSONEncoder
+
+    @property
+    def provider(self) -> Union[StdlibJSONProvider, OrjsonJSONProvider]:
+        """provider
+
+        The provider registered for the current app, or the standard library provider when there is
+        no app context.
+        """
+        if has_app_context():
+            return current_app.extensions.get('json', self._default_provider)
+        return self._default_provider
+
+    @timed_serialization
+    def dumps(self, obj: Any, **kwargs) -> str:
+        """dumps
+
+        Serializes `obj` with the current provider.
+
+        :param obj:
+            The object to serialize.
+        :param kwargs:
+            Additional arguments for the provider.
+        """
+        return self.provider.dumps(obj, **kwargs)
+
+    def loads(self, s: Union[str, bytes]) -> Any:
+        """loads
+
+        Deserializes a JSON document with the current provider.
+
+        :param s:
+            The JSON document.
+        """
+        return self.provider.loads(s)
+
+    def response(self, data: Any, status_code: int=200) -> Response:
+        """response
+
+        Returns a JSON response, serialized with the current provider. A faster alternative to
+        `flask.jsonify`.
+
+        :param data:
+            The object to serialize.
+        :param status_code:
+            The status code to respond with.
+        """
+        return current_app.response_class(self.dumps(data) + '\n', status=status_code, mimetype='application/json')
+
+    def connexion_api_cls(self) -> type:
+        """connexion_api_cls
+
+        Returns a Connexion API class that serializes handler return values (and deserializes
+        request bodies) with this extension.
+        """
+        extension = self
+
+        class JSONProviderFlaskApi(FlaskApi):
+            @classmethod
+            def _set_jsonifier(cls):
+                cls.jsonifier = Jsonifier(extension)
+
+        return JSONProviderFlaskApi
+
+    @staticmethod
+    def _create_provider(name: str) -> Union[StdlibJSONProvider, OrjsonJSONProvider]:
+        """_create_provider
+
+        Returns the provider for the given `JSON_PROVIDER` setting.
+
+        :param name:
+            One of `auto` (orjson when installed, otherwise stdlib), `orjson` or `stdlib`.
+        :raises:
+            ImportError, ValueError
+        """
+        name = name.lower()
+        if name == 'orjson' and not _HAS_ORJSON:
+            raise ImportError('The orjson module is required when JSON_PROVIDER=orjson.')
+        if name == 'orjson' or (name == 'auto' and _HAS_ORJSON):
+            return OrjsonJSONProvider()
+        if name in ('auto', 'stdlib'):
+            return StdlibJSONProvider()
+        raise ValueError(f'Unknown JSON_PROVIDER: {name}')
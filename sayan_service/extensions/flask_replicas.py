@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+""" A Flask-SQLAlchemy extension that routes reads to read replicas. """
+
+import itertools
+import os
+import threading
+import time
+
+from typing import Any, Dict, List, Optional
+
+from flask import Flask
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.url import make_url
+
+from sayan_service.metrics import DB_REPLICA_FALLBACKS, DB_REPLICA_HEALTHY, DB_REPLICA_LAG_SECONDS
+
+
+##
+#: The `REPLICA_LAG_QUERY` returns the replication lag of a server, in seconds.
+#: A server that is not in recovery (i.e. is not a standby) has no lag.
+#:
+#: Note that the lag is measured from the last replayed transaction, so a
+#: standby of a primary that has not written for a while reports a growing
+#: lag even though it is up to date.
+#:
+REPLICA_LAG_QUERY = text(
+    'SELECT CASE WHEN pg_is_in_recovery() '
+    'THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) '
+    'ELSE 0 END')
+
+
+class Replica:
+    """Replica
+
+    A read replica and its last known health.
+    """
+
+    def __init__(self, name: str, engine: Engine) -> None:
+        """__init__
+
+        :param name:
+            The name of the replica, used to label its pool and metrics.
+        :param engine:
+            The engine connected to the replica.
+        """
+        self.name = name
+        self.engine = engine
+        self.healthy = False
+        self.lag: Optional[float] = None
+
+    def checkedout(self) -> int:
+        """checkedout
+
+        Returns the number of connections currently checked out of the replica's pool.
+        """
+        checkedout = getattr(self.engine.pool, 'checkedout', None)
+        return checkedout() if checkedout else 0
+
+    def mark_unhealthy(self) -> None:
+        """mark_unhealthy
+
+        Stops routing reads to the replica until it next passes a health check.
+        """
+        self.healthy = False
+        DB_REPLICA_HEALTHY.labels(self.name).set(0)
+
+
+class ReplicaSet:
+    """ReplicaSet
+
+    The read replicas of an app. Selects a healthy replica for each session using the configured
+    strategy, and periodically checks that each replica is reachable and is not lagging behind the
+    primary by more than the configured maximum.
+
+    The checks run in the background, in a daemon thread of each worker (a greenlet under gevent's
+    monkeypatching), so that a slow or unreachable replica never delays a request. Until the first
+    check has completed, reads are routed to the primary.
+    """
+
+    ##
+    #: The `STRATEGIES` are the supported replica selection strategies.
+    #:
+    STRATEGIES = ('round_robin', 'least_connections')
+
+    def __init__(self, replicas: List[Replica], strategy: str='round_robin', max_lag: float=10,
+                 check_interval: float=5) -> None:
+        """__init__
+
+        :param replicas:
+            The replicas to route reads to.
+        :param strategy:
+            Either `round_robin` or `least_connections`.
+        :param max_lag:
+            The maximum replication lag, in seconds, of a replica that reads are routed to.
+        :param check_interval:
+            The number of seconds between replica health checks.
+        :raises:
+            ValueError
+        """
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f'Unknown replica strategy: {strategy}')
+
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self._counter = itertools.count()
+        self._checked_at: Optional[float] = None
+        self._checker_pid: Optional[int] = None
+        self._checker_lock = threading.Lock()
+        self._disposed = threading.Event()
+
+        for replica in replicas:
+            event.listen(replica.engine, 'handle_error', self._on_error(replica))
+
+    def choose(self) -> Optional[Replica]:
+        """choose
+
+        Returns a healthy replica to route reads to, or None if no replica is healthy or the
+        replicas have not been checked yet. Starts checking the replicas in the background on
+        first use.
+        """
+        self._start_checks()
+        if self._checked_at is None:
+            return None
+
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.strategy == 'least_connections':
+            return min(healthy, key=Replica.checkedout)
+        return healthy[next(self._counter) % len(healthy)]
+
+    def check(self) -> Dict[str, bool]:
+        """check
+
+        Checks the health and replication lag of each replica, and returns a dict where keys are
+        replica names and values are True if reads can be routed to the replica.
+        """
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    replica.lag = float(connection.execute(REPLICA_LAG_QUERY).scalar())
+                replica.healthy = replica.lag <= self.max_lag
+                DB_REPLICA_LAG_SECONDS.labels(replica.name).set(replica.lag)
+            except Exception:
+                replica.lag = None
+                replica.healthy = False
+            DB_REPLICA_HEALTHY.labels(replica.name).set(int(replica.healthy))
+
+        self._checked_at = time.monotonic()
+        return {replica.name: replica.healthy for replica in self.replicas}
+
+    def dispose(self) -> None:
+        """dispose
+
+        Stops checking the replicas, and closes the connections of every replica.
+        """
+        self._disposed.set()
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    def _start_checks(self) -> None:
+        """_start_checks
+
+        Starts the thread that checks the replicas, unless it is already running in the current
+        process. A worker forked from a process that started the thread starts its own.
+        """
+        if self._checker_pid == os.getpid():
+            return
+
+        with self._checker_lock:
+            if self._checker_pid != os.getpid() and not self._disposed.is_set():
+                threading.Thread(target=self._check_periodically, name='replica-checks', daemon=True).start()
+                self._checker_pid = os.getpid()
+
+    def _check_periodically(self) -> None:
+        """ Checks the replicas every check interval, until the replica set is disposed. """
+        while not self._disposed.is_set():
+            self.check()
+            self._disposed.wait(self.check_interval)
+
+    @staticmethod
+    def _on_error(replica: Replica):
+        """_on_error
+
+        Returns an engine `handle_error` listener that takes the replica out of rotation when its
+        connection is lost, rather than waiting for the next health check.
+
+        :param replica:
+            The replica to listen for errors from.
+        """
+        def handle_error(context: Any) -> None:
+            if context.is_disconnect or context.connection is None:
+                replica.mark_unhealthy()
+        return handle_error
+
+
+class RoutingSession(SignallingSession):
+    """RoutingSession
+
+    A session that routes reads to a read replica, and everything else to the primary.
+
+    A statement is routed to a replica when it is a `SELECT` (without `FOR UPDATE`) of a model
+    that uses the default bind, and the session has not yet written. Once a session flushes or
+    executes any other statement, it sticks to the primary, so that a request reads its own writes.
+    Each session uses a single replica, chosen when it first reads.
+    """
+
+    def __init__(self, db: 'RoutingSQLAlchemy', **options) -> None:
+        super().__init__(db, **options)
+        self._db = db
+        self._use_primary = False
+        self._replica: Optional[Replica] = None
+
+    def use_primary(self) -> None:
+        """use_primary
+
+        Routes every subsequent statement of the session to the primary, e.g. before a read that
+        must see writes made by a previous request.
+        """
+        self._use_primary = True
+
+    def get_bind(self, mapper=None, clause=None, *args, **kwargs):
+        """get_bind
+
+        Returns the engine to execute `clause` with: a replica for reads, and otherwise the engine
+        selected by `SignallingSession` for the mapper's bind key.
+        """
+        if self._routes_to_replica(mapper, clause):
+            if self._replica is None:
+                self._replica = self._db.get_replicas(self.app).choose()
+                if self._replica is None:
+                    DB_REPLICA_FALLBACKS.inc()
+                    self._use_primary = True
+            if self._replica is not None:
+                return self._replica.engine
+        return super().get_bind(mapper, clause)
+
+    def _routes_to_replica(self, mapper: Any, clause: Any) -> bool:
+        """_routes_to_replica
+
+        Returns True if `clause` may be executed on a replica, and otherwise sticks the session to
+        the primary if `clause` may write.
+        """
+        if self._use_primary:
+            return False
+        if self._flushing:
+            self._use_primary = True
+            return False
+        if clause is None:
+            # A bare connection (e.g. from `Session.connection()`) may be used for anything.
+            return False
+        if mapper is not None and mapper.persist_selectable.info.get('bind_key') is not None:
+            return False
+        if not getattr(clause, 'is_select', False) or getattr(clause, '_for_update_arg', None) is not None:
+            self._use_primary = True
+            return False
+        return self._db.has_replicas(self.app)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    """RoutingSQLAlchemy
+
+    A Flask-SQLAlchemy extension whose sessions route reads to the read replicas configured by the
+    `SQLALCHEMY_REPLICA_URIS` setting. With no replicas configured, every statement is executed on
+    the primary as usual.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        self._replica_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def create_session(self, options: dict) -> orm.sessionmaker:
+        """create_session
+
+        Creates the session factory, using a `RoutingSession`.
+
+        :param options:
+            The keyword arguments passed to the session class.
+        """
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def use_primary(self) -> None:
+        """use_primary
+
+        Routes every subsequent statement of the current session to the primary. See
+        `RoutingSession.use_primary`.
+        """
+        self.session().use_primary()
+
+    def has_replicas(self, app: Flask) -> bool:
+        """has_replicas
+
+        Returns True if any read replicas are configured for the app.
+
+        :param app:
+            The Flask app.
+        """
+        return bool(app.config.get('SQLALCHEMY_REPLICA_URIS'))
+
+    def get_replicas(self, app: Optional[Flask]=None) -> ReplicaSet:
+        """get_replicas
+
+        Returns the app's replica set, creating the replica engines on first use.
+
+        :param app:
+            The Flask app. Defaults to the current app.
+        """
+        app = self.get_app(app)
+        replicas = app.extensions.get('sqlalchemy_replicas')
+        if replicas is None:
+            with self._replica_lock:
+                replicas = app.extensions.get('sqlalchemy_replicas')
+                if replicas is None:
+                    replicas = app.extensions['sqlalchemy_replicas'] = self._create_replicas(app)
+        return replicas
+
+    def _create_replicas(self, app: Flask) -> ReplicaSet:
+        """_create_replicas
+
+        Creates the replica set for the app from its configuration. Replica engines use the same
+        options as the primary, and their pools are named `replica0`, `replica1`, etc. Connections
+        to PostgreSQL replicas give up after `SQLALCHEMY_REPLICA_CONNECT_TIMEOUT` seconds.
+
+        :param app:
+            The Flask app.
+        """
+        replicas = []
+        for index, uri in enumerate(app.config.get('SQLALCHEMY_REPLICA_URIS') or []):
+            name = f'replica{index}'
+            options = self.apply_pool_defaults(app, {})
+            sa_url, options = self.apply_driver_hacks(app, make_url(uri), options)
+            options.update(app.config['SQLALCHEMY_ENGINE_OPTIONS'])
+            options['pool_logging_name'] = name
+            if sa_url.get_backend_name() == 'postgresql':
+                options['connect_args'] = dict(
+                    options.get('connect_args') or {},
+                    connect_timeout=app.config.get('SQLALCHEMY_REPLICA_CONNECT_TIMEOUT', 2))
+            replicas.append(Replica(name, self.create_engine(sa_url, options)))
+
+        return ReplicaSet(
+            replicas,
+            strategy=app.config.get('SQLALCHEMY_REPLICA_STRATEGY', 'round_robin'),
+            max_lag=app.config.get('SQLALCHEMY_REPLICA_MAX_LAG', 10),
+            check_interval=app.config.get('SQLALCHEMY_REPLICA_CHECK_INTERVAL', 5))
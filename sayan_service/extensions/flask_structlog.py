@@ -1,14 +1,49 @@
 # -*- coding: utf-8 -*-
-""" A Flask plugin for structured logging. """
+""" A Flask plugin for structured logging.
 
+The fields of a request (its id, route and client, and any bound with `bind_request_context`) are
+held in a context variable, and added to every message logged while handling it. Threads and gevent
+greenlets start with an empty context, so work that a request hands off only logs with its fields
+if it is scheduled with one of the helpers below, which propagate the context explicitly:
+
+  - `ContextThreadPoolExecutor`: a thread pool that runs each submitted function in a copy of the
+    context of the caller of `submit`.
+  - `spawn`: spawns a gevent greenlet in a copy of the current context.
+  - `copy_request_context`: wraps any other function, e.g. the target of a `threading.Thread`.
+"""
+
+import contextvars
+import functools
 import logging
+import os
 import structlog
 import sys
+import time
+import uuid
 
-from flask import Flask, helpers
-from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from flask import Flask, Response, helpers, request
+from typing import Any, Callable, Mapping, Optional, Tuple
 from decouple import config
 
+from sayan_service import async_logging
+from .flask_json import _HAS_ORJSON, _default
+
+if _HAS_ORJSON:
+    import orjson
+
+
+##
+#: We attempt to import gevent, for spawning greenlets with the request context,
+#: and set a flag if it is not available.
+#:
+try:
+    import gevent
+    _HAS_GEVENT = True
+except ImportError:
+    _HAS_GEVENT = False
+
 
 ##
 #: We attempt to import the structlog[dev] and colorama packages (for pretty logging)
@@ -36,22 +71,366 @@ _LOG_PRETTY = config('LOG_PRETTY', False, cast=bool)
 
 
 ##
-#: The `_STRUCTLOG_PROCESSORS` specify the logging middleware used to structure
-#: and format log messages before they're emitted.
+#: When `_LOG_ASYNC` is set to True, log messages are rendered and written by a
+#: background thread, as configured by `_LOG_QUEUE_SIZE`, `_LOG_QUEUE_POLICY`
+#: and `_LOG_BATCH_SIZE`. See :mod:`sayan_service.async_logging`.
+#:
+_LOG_ASYNC = config('LOG_ASYNC', False, cast=bool)
+_LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', 10000, cast=int)
+_LOG_QUEUE_POLICY = config('LOG_QUEUE_POLICY', 'drop')
+_LOG_BATCH_SIZE = config('LOG_BATCH_SIZE', 256, cast=int)
+
+
+##
+#: When `_LOG_SKIP_RECORD_METADATA` is set to True, the logging module does not
+#: collect the caller, thread and process of log records. See
+#: `skip_record_metadata`.
+#:
+_LOG_SKIP_RECORD_METADATA = config('LOG_SKIP_RECORD_METADATA', False, cast=bool)
+
+
+##
+#: The `_LEVELS` map the methods of a bound logger to stdlib log levels.
+#:
+_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'warn': logging.WARNING,
+    'error': logging.ERROR,
+    'exception': logging.ERROR,
+    'critical': logging.CRITICAL,
+    'fatal': logging.CRITICAL,
+}
+
+
+class LevelFilteringBoundLogger(structlog.stdlib.BoundLogger):
+    """LevelFilteringBoundLogger
+
+    A stdlib bound logger that discards events below the level of the wrapped logger before the
+    event dict is built or any processor runs, so that disabled log calls (e.g. `debug` in
+    production) cost little more than a method call.
+    """
+
+    def _proxy_to_logger(self, method_name: str, event: Optional[str]=None, *event_args: Any, **event_kw: Any) -> Any:
+        level = _LEVELS.get(method_name)
+        if level is not None and not self._logger.isEnabledFor(level):
+            return None
+        return super()._proxy_to_logger(method_name, event, *event_args, **event_kw)
+
+
+class CachedTimeStamper:
+    """CachedTimeStamper
+
+    A processor that adds the current UTC time to the event dict under the `timestamp` key, in the
+    same ISO 8601 format as `TimeStamper(fmt='iso')`. The date and time are formatted once per
+    second, and only the microseconds are formatted for each event.
+    """
+
+    def __init__(self) -> None:
+        self._cached: Tuple[int, str] = (-1, '')
+
+    def __call__(self, logger: Any, method_name: str, event_dict: dict) -> dict:
+        event_dict['timestamp'] = self.now()
+        return event_dict
+
+    def now(self) -> str:
+        """now
+
+        Returns the current UTC time as an ISO 8601 string.
+        """
+        second, usec = divmod(round(time.time() * 1000000), 1000000)
+        cached_second, prefix = self._cached
+        if second != cached_second:
+            prefix = datetime.utcfromtimestamp(second).strftime('%Y-%m-%dT%H:%M:%S')
+            self._cached = (second, prefix)
+        return f'{prefix}.{usec:06d}Z'
+
+
+def add_standard_fields(timestamper: CachedTimeStamper) -> Callable[[Any, str, dict], dict]:
+    """add_standard_fields
+
+    Returns a processor that adds the logger name, log level and timestamp to the event dict in a
+    single step, equivalent to `add_logger_name`, `add_log_level` and `TimeStamper(fmt='iso')`.
+
+    :param timestamper:
+        The timestamper used to format the timestamp.
+    """
+    now = timestamper.now
+
+    def processor(logger: Any, method_name: str, event_dict: dict) -> dict:
+        record = event_dict.get('_record')
+        event_dict['logger'] = logger.name if record is None else record.name
+        event_dict['level'] = 'warning' if method_name == 'warn' else method_name
+        event_dict['timestamp'] = now()
+        return event_dict
+    return processor
+
+
+def _json_default(o: Any) -> Any:
+    """_json_default
+
+    Converts a value in an event dict that is not natively representable in JSON. Falls back to
+    the `repr` of the value, so that rendering a log message never fails.
+
+    :param o:
+        The value to convert.
+    """
+    if isinstance(o, bytes):
+        return o.decode('utf-8', 'replace')
+    try:
+        return _default(o)
+    except TypeError:
+        return repr(o)
+
+
+def _orjson_dumps(event_dict: dict, **kwargs) -> str:
+    """_orjson_dumps
+
+    Serializes an event dict with orjson.
+
+    :param event_dict:
+        The event dict to serialize.
+    :param kwargs:
+        Ignored. Accepted for compatibility with `json.dumps`.
+    """
+    return orjson.dumps(event_dict, default=_json_default, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
+##
+#: The `_request_context` holds the fields bound to every log message for the
+#: current request. Unlike `structlog.threadlocal`, a context variable is local
+#: to each thread and greenlet without gevent's monkeypatched locals, and is not
+#: shared with greenlets spawned by the request unless explicitly copied (see
+#: `copy_request_context`). The mapping is replaced rather than mutated.
+#:
+_request_context: contextvars.ContextVar[Mapping[str, Any]] = contextvars.ContextVar(
+    'sayan_service.request_context', default={})
+
+
+def bind_request_context(**fields: Any) -> None:
+    """bind_request_context
+
+    Adds fields to every log message emitted in the current context.
+
+    :param fields:
+        The fields to add.
+    """
+    _request_context.set({**_request_context.get(), **fields})
+
+
+def clear_request_context() -> None:
+    """clear_request_context
+
+    Removes every field bound to log messages in the current context.
+    """
+    _request_context.set({})
+
+
+def get_request_context() -> Mapping[str, Any]:
+    """get_request_context
+
+    Returns the fields bound to log messages in the current context.
+    """
+    return _request_context.get()
+
+
+def copy_request_context(func: Callable) -> Callable:
+    """copy_request_context
+
+    Returns a function that calls `func` in a copy of the current context, so that messages logged
+    by a thread pool or greenlet carry the fields of the request that scheduled the work.
+
+    `ContextThreadPoolExecutor` and `spawn` apply it to the functions they run.
+
+    .. code-block:: python
+
+        threading.Thread(target=copy_request_context(fetch), args=(widget_id,)).start()
+
+    :param func:
+        The function to wrap.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        # A context can only be entered by one thread at a time, so each call runs in its own copy.
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """ContextThreadPoolExecutor
+
+    A thread pool that runs each submitted function in a copy of the context of the caller of
+    `submit` (and `map`), so that messages it logs carry the fields of the request that submitted it.
+    """
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        return super().submit(copy_request_context(fn), *args, **kwargs)
+
+
+def spawn(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """spawn
+
+    Spawns a gevent greenlet that calls `func` in a copy of the current context, so that messages it
+    logs carry the fields of the request that spawned it, and returns the greenlet.
+
+    :param func:
+        The function to call.
+    :param args:
+        The positional arguments of the function.
+    :param kwargs:
+        The keyword arguments of the function.
+    :raises:
+        ImportError
+    """
+    if not _HAS_GEVENT:
+        raise ImportError('The gevent module is required to spawn greenlets.')
+    return gevent.spawn(copy_request_context(func), *args, **kwargs)
+
+
+def merge_request_context(logger: Any, method_name: str, event_dict: dict) -> dict:
+    """merge_request_context
+
+    A processor that adds the fields bound with `bind_request_context` to the event dict. Fields
+    passed to the log call take precedence.
+
+    :param logger:
+        The wrapped logger.
+    :param method_name:
+        The name of the method called on the bound logger.
+    :param event_dict:
+        The event dict.
+    """
+    context = _request_context.get()
+    if context:
+        return {**context, **event_dict}
+    return event_dict
+
+
+##
+#: The `STRUCTLOG_PROCESSORS` specify the logging middleware used to structure
+#: log messages before they're rendered. Events below the configured level are
+#: discarded by `LevelFilteringBoundLogger` before these run.
 #:
 #: More information on structlog processors can be found at:
 #:   http://www.structlog.org/en/latest/processors.html
 #:
-_STRUCTLOG_PROCESSORS = [
-    structlog.stdlib.filter_by_level,
-    structlog.stdlib.add_logger_name,
-    structlog.stdlib.add_log_level,
+STRUCTLOG_PROCESSORS: Tuple[Callable[[Any, str, dict], dict], ...] = (
+    merge_request_context,
+    add_standard_fields(CachedTimeStamper()),
     structlog.stdlib.PositionalArgumentsFormatter(),
-    structlog.processors.TimeStamper(fmt='iso'),
     structlog.processors.StackInfoRenderer(),
     structlog.processors.format_exc_info,
-    structlog.processors.UnicodeDecoder(),
-]
+)
+
+
+def create_renderer(pretty: bool=False) -> Callable[[Any, str, dict], str]:
+    """create_renderer
+
+    Returns the processor used to render log messages: a console renderer if `pretty` is set,
+    otherwise a JSON renderer that uses orjson if it is installed.
+
+    :param pretty:
+        A flag to control emission of messages as human-readable or machine-parseable.
+    :raises:
+        ImportError
+    """
+    if pretty:
+        if not _HAS_STRUCTLOG_DEV:
+            raise ImportError('The structlog[dev] module is required when LOG_PRETTY=True.')
+        return structlog.dev.ConsoleRenderer()
+    if _HAS_ORJSON:
+        return structlog.processors.JSONRenderer(serializer=_orjson_dumps)
+    return structlog.processors.JSONRenderer(default=_json_default)
+
+
+def skip_record_metadata(skip: bool=True) -> None:
+    """skip_record_metadata
+
+    Stops the logging module from collecting the caller, thread and process of each log record,
+    which messages rendered from the event dict never include. Finding the caller walks the stack,
+    and is the most expensive part of an enabled log call. This changes the logging module for the
+    whole process, so that the records of other handlers and formatters lack these fields too.
+
+    More information can be found at:
+      https://docs.python.org/3/howto/logging.html#optimization
+
+    :param skip:
+        If False, restores the defaults of the logging module.
+    """
+    logging._srcfile = None if skip else os.path.normcase(logging.addLevelName.__code__.co_filename)
+    logging.logThreads = not skip
+    logging.logProcesses = not skip
+    logging.logMultiprocessing = not skip
+
+
+def configure_structlog(level: str, pretty: bool=False, queued: bool=False, queue_size: int=10000,
+                        queue_policy: str='drop', batch_size: int=256, skip_metadata: bool=False) -> None:
+    """configure_structlog
+
+    Configures structlog and the root logger, unless structlog has already been configured. This is
+    the single logging configuration used by both the app and the gunicorn logger.
+
+    :param level:
+        The log level of the root logger.
+    :param pretty:
+        A flag to control emission of messages as human-readable or machine-parseable.
+    :param queued:
+        If True, messages are rendered and written by a background thread. See
+        :mod:`sayan_service.async_logging`.
+    :param queue_size:
+        The maximum number of messages waiting to be written, if `queued` is set.
+    :param queue_policy:
+        Either `drop` or `block`, for when the queue is full.
+    :param batch_size:
+        The maximum number of messages written at once, if `queued` is set.
+    :param skip_metadata:
+        If True, the logging module stops collecting the caller, thread and process of log records
+        for the whole process. See `skip_record_metadata`.
+    """
+    if structlog.is_configured():
+        return
+
+    renderer = create_renderer(pretty)
+    if skip_metadata:
+        skip_record_metadata()
+
+    if queued:
+        # Render in the background thread, rather than at the end of the processor chain.
+        processors = [*STRUCTLOG_PROCESSORS, structlog.stdlib.ProcessorFormatter.wrap_for_formatter]
+        handler = async_logging.start(renderer, queue_size=queue_size, policy=queue_policy, batch_size=batch_size)
+        logging.basicConfig(level=level, handlers=[handler])
+    else:
+        processors = [*STRUCTLOG_PROCESSORS, renderer]
+
+        # Configure the logging module to the most basic implementation possible.
+        logging.basicConfig(level=level, stream=sys.stdout, format='%(message)s')
+
+    structlog.configure_once(
+        processors=processors,
+        context_class=dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=LevelFilteringBoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+
+##
+#: The `ROUTE_ENVIRON_KEY` is the WSGI environ key that the route template of
+#: each request (e.g. `/v1/widgets/<uuid>`) is stored under, for access logs.
+#:
+ROUTE_ENVIRON_KEY = 'sayan_service.route'
+
+
+##
+#: The `REQUEST_ID_HEADER` carries the id of each request. An id received from a
+#: client or proxy is reused, otherwise one is generated, and the id is returned
+#: in the response under the same header.
+#:
+REQUEST_ID_HEADER = 'X-Request-ID'
 
 
 class FlaskStructlog:
@@ -76,6 +455,55 @@ class FlaskStructlog:
             self._initialize_structlog(app)
 
         self._patch_flask_logger(app)
+        app.before_request(self._bind_request_context)
+        app.after_request(self._add_request_id)
+        app.teardown_request(self._clear_request_context)
+
+    @staticmethod
+    def _bind_request_context() -> None:
+        """_bind_request_context
+
+        Binds the request id, route and client to every message logged while handling the request.
+        Also stores the route template of the request in the WSGI environ, so that the access log
+        (which only sees the environ) can record the route rather than the raw path.
+        """
+        route = None
+        if request.url_rule is not None:
+            route = request.environ[ROUTE_ENVIRON_KEY] = request.url_rule.rule
+
+        _request_context.set({
+            'request_id': request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex,
+            'method': request.method,
+            'route': route,
+            'remote_addr': request.remote_addr,
+            'user_agent': request.headers.get('User-Agent'),
+        })
+
+    @staticmethod
+    def _add_request_id(response: Response) -> Response:
+        """_add_request_id
+
+        Returns the id of the request in the response headers.
+
+        :param response:
+            The response to the request.
+        """
+        request_id = _request_context.get().get('request_id')
+        if request_id is not None:
+            response.headers.setdefault(REQUEST_ID_HEADER, request_id)
+        return response
+
+    @staticmethod
+    def _clear_request_context(exc: Optional[BaseException]=None) -> None:
+        """_clear_request_context
+
+        Removes the request's fields once it has been handled, so that they are not carried over to
+        the next request handled by the same thread.
+
+        :param exc:
+            The exception raised while handling the request, if any.
+        """
+        clear_request_context()
 
     def _patch_flask_logger(self, app):
         """_patch_flask_logger
@@ -106,28 +534,11 @@ class FlaskStructlog:
         :param app:
             The Flask app from which to pull configuration.
         """
-        processors = _STRUCTLOG_PROCESSORS
-        renderer = structlog.processors.JSONRenderer()
-
-        if _LOG_PRETTY:
-            if not _HAS_STRUCTLOG_DEV:
-                raise ImportError('The structlog[dev] module is required when LOG_PRETTY=True.')
-            renderer = structlog.dev.ConsoleRenderer()
-
-        processors.append(renderer)
-
-        # Configure the logging module to the most basic implementation possible.
-        logging.basicConfig(
-            level=_LOG_LEVEL,
-            stream=sys.stdout,
-            format='%(message)s'
-        )
-
-        if not structlog.is_configured():
-            structlog.configure_once(
-                processors=processors,
-                context_class=structlog.threadlocal.wrap_dict(dict),
-                logger_factory=structlog.stdlib.LoggerFactory(),
-                wrapper_class=structlog.stdlib.BoundLogger,
-                cache_logger_on_first_use=True,
-            )
+        configure_structlog(
+            _LOG_LEVEL,
+            pretty=_LOG_PRETTY,
+            queued=_LOG_ASYNC,
+            queue_size=_LOG_QUEUE_SIZE,
+            queue_policy=_LOG_QUEUE_POLICY,
+            batch_size=_LOG_BATCH_SIZE,
+            skip_metadata=_LOG_SKIP_RECORD_METADATA)
@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
 """ HTTP-related helpers. """
 
-from typing import Tuple
+from itertools import islice
+from typing import Any, Iterable, Iterator, Tuple
 
+from flask import Response, stream_with_context
 from werkzeug.http import HTTP_STATUS_CODES
 
+from .extensions import json
+
 
 def http_response(status_code: int) -> Tuple[dict, int]:
     """http_response
@@ -16,3 +20,72 @@ def http_response(status_code: int) -> Tuple[dict, int]:
         The status code to respond with.
     """
     return ({'message': HTTP_STATUS_CODES.get(status_code, '')}, status_code)
+
+
+def streaming_response(items: Iterable[Any], serializer: Any, status_code: int=200, ndjson: bool=False,
+                       chunk_size: int=1000) -> Response:
+    """streaming_response
+
+    Returns a response that serializes `items` and streams them to the client as a JSON array (or
+    as newline-delimited JSON) one chunk at a time, so that the full result set is never held in
+    memory.
+
+    If `items` is a SQLAlchemy query, it is iterated with `yield_per`, which uses a server-side
+    cursor on PostgreSQL.
+
+    Usage:
+
+    .. code-block:: python
+
+        def get_widgets():
+            return streaming_response(Widget.query.order_by(Widget.id), WidgetSerializer())
+
+    :param items:
+        A query or iterable of objects to serialize.
+    :param serializer:
+        A serializer (e.g. a `ModelSerializer`) used to dump each chunk of items.
+    :param status_code:
+        The status code to respond with.
+    :param ndjson:
+        If True, emits one JSON document per line (`application/x-ndjson`) instead of an array.
+    :param chunk_size:
+        The number of items fetched and serialized at a time.
+    """
+    if hasattr(items, 'yield_per'):
+        items = items.yield_per(chunk_size)
+
+    mimetype = 'application/x-ndjson' if ndjson else 'application/json'
+    body = _stream_json(iter(items), serializer, ndjson, chunk_size)
+
+    return Response(stream_with_context(body), status=status_code, mimetype=mimetype)
+
+
+def _stream_json(items: Iterator[Any], serializer: Any, ndjson: bool, chunk_size: int) -> Iterator[str]:
+    """_stream_json
+
+    Yields the serialized `items` as chunks of a JSON array, or of newline-delimited JSON.
+
+    :param items:
+        An iterator of objects to serialize.
+    :param serializer:
+        A serializer used to dump each chunk of items.
+    :param ndjson:
+        If True, emits one JSON document per line instead of an array.
+    :param chunk_size:
+        The number of items serialized at a time.
+    """
+    dumps = json.provider.dumps
+    separator = '\n' if ndjson else ','
+    prefix = '' if ndjson else '['
+
+    chunk = list(islice(items, chunk_size))
+    while chunk:
+        records = serializer.dump(chunk, many=True)
+        yield prefix + separator.join(dumps(record) for record in records)
+        prefix = separator
+        chunk = list(islice(items, chunk_size))
+
+    if not ndjson:
+        yield ']' if prefix == separator else '[]'
+    elif prefix:
+        yield '\n'
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+""" Instrumentation for exporting runtime behaviour of the application as Prometheus metrics. """
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+""" Compiled statement cache instrumentation.
+
+SQLAlchemy caches the compiled form of each statement by its structure, so that executing a
+statement that was already compiled skips compilation. Each statement execution is counted by
+whether its compiled form was found in the cache, so that statements that are built in a way that
+defeats the cache show up as misses.
+"""
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import (
+    CACHE_HIT,
+    CACHE_MISS,
+    CACHING_DISABLED,
+    NO_CACHE_KEY,
+    NO_DIALECT_SUPPORT,
+)
+
+from sayan_service.metrics import DB_COMPILED_CACHE_LOOKUPS
+
+##
+#: The `_RESULTS` map the cache status of an execution context to the value of
+#: the `result` label.
+#:
+_RESULTS = {
+    CACHE_HIT: 'hit',
+    CACHE_MISS: 'miss',
+    CACHING_DISABLED: 'disabled',
+    NO_CACHE_KEY: 'uncacheable',
+    NO_DIALECT_SUPPORT: 'unsupported',
+}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """ Counts the compiled cache lookup of a statement execution. """
+    if context is not None:
+        DB_COMPILED_CACHE_LOOKUPS.labels(_RESULTS.get(context.cache_hit, 'uncacheable')).inc()
+
+
+def init_app(app: Flask) -> None:
+    """init_app
+
+    Starts counting the compiled cache lookups of every engine.
+
+    :param app:
+        The Flask app to instrument.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
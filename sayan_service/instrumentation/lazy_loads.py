@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+""" Lazy load (N+1 query) detection.
+
+A relationship that is loaded lazily emits a query the first time it is accessed on each record,
+so accessing it across a list of records emits one query per record: the N+1 query problem. When
+`SQLALCHEMY_LAZY_LOAD_THRESHOLD` is set, the lazy loads of each request are counted by
+relationship, and a request that exceeds the threshold is reported according to
+`SQLALCHEMY_LAZY_LOAD_ACTION`:
+
+  - `warn` logs a warning when the request finishes, with the number of lazy loads of each
+    relationship and the operation of the request.
+  - `raise` raises a `LazyLoadError` from the lazy load that exceeds the threshold, failing the
+    request, which is meant for development and tests.
+
+The fix is usually an eager loader option on the query (e.g. `selectinload`), a sparse fieldset
+that leaves the relationship out, or a default loader strategy declared with the model's
+`__loader_strategies__`.
+"""
+
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+import structlog
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .timing import current_operation
+
+logger = structlog.get_logger(__name__)
+
+##
+#: The `_ACTIONS` are the accepted values of `SQLALCHEMY_LAZY_LOAD_ACTION`.
+#:
+_ACTIONS = ('warn', 'raise')
+
+
+class LazyLoadError(RuntimeError):
+    """LazyLoadError
+
+    An error thrown when a request lazily loads relationships more times than the threshold.
+    """
+
+
+class LazyLoadDetector:
+    """LazyLoadDetector
+
+    Counts the lazy loads of every session during each request, and reports requests that exceed
+    the threshold.
+    """
+
+    def __init__(self) -> None:
+        self.threshold = 0
+        self.action = 'warn'
+        # The number of lazy loads of each relationship during the current request, or None outside of a request.
+        self._lazy_loads: ContextVar[Optional[Counter]] = ContextVar('lazy_loads', default=None)
+
+    def init_app(self, app: Flask) -> None:
+        """init_app
+
+        Configures the detector from the app, and starts counting the lazy loads of its requests
+        unless `SQLALCHEMY_LAZY_LOAD_THRESHOLD` is 0.
+
+        :param app:
+            The Flask app from which to pull configuration.
+        :raises:
+            ValueError
+        """
+        self.threshold = app.config.get('SQLALCHEMY_LAZY_LOAD_THRESHOLD', 0)
+        self.action = app.config.get('SQLALCHEMY_LAZY_LOAD_ACTION', 'warn')
+        if self.action not in _ACTIONS:
+            raise ValueError(f'SQLALCHEMY_LAZY_LOAD_ACTION must be one of {", ".join(_ACTIONS)}.')
+        if self.threshold <= 0:
+            return
+
+        if not event.contains(Session, 'do_orm_execute', self._do_orm_execute):
+            event.listen(Session, 'do_orm_execute', self._do_orm_execute)
+        app.before_request(self._start_request)
+        app.teardown_request(self._finish_request)
+
+    def _start_request(self) -> None:
+        """ Starts counting the lazy loads of a request. """
+        self._lazy_loads.set(Counter())
+
+    def _finish_request(self, exc: Optional[BaseException]=None) -> None:
+        """ Stops counting the lazy loads of a request, and warns if it exceeded the threshold. """
+        lazy_loads = self._lazy_loads.get()
+        self._lazy_loads.set(None)
+        if lazy_loads and self.action == 'warn' and sum(lazy_loads.values()) > self.threshold:
+            logger.warning(
+                'lazy loads exceeded threshold',
+                lazy_loads=sum(lazy_loads.values()),
+                threshold=self.threshold,
+                relationships=dict(lazy_loads.most_common()),
+                operation=current_operation())
+
+    def _do_orm_execute(self, orm_execute_state) -> None:
+        """ Counts a lazy load, and raises if it exceeds the threshold and the action is `raise`. """
+        lazy_loads = self._lazy_loads.get()
+        if lazy_loads is None or orm_execute_state.lazy_loaded_from is None:
+            return
+
+        path = orm_execute_state.loader_strategy_path
+        lazy_loads[str(path[-1]) if path else 'unknown'] += 1
+        if self.action == 'raise' and sum(lazy_loads.values()) > self.threshold:
+            raise LazyLoadError(
+                f'The request lazily loaded relationships more than {self.threshold} times: '
+                + ', '.join(f'{key} ({count})' for key, count in lazy_loads.most_common()))
+
+
+lazy_load_detector = LazyLoadDetector()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+""" Connection pool instrumentation. """
+
+import time
+
+from flask import Flask
+from sqlalchemy.pool import QueuePool
+
+from sayan_service.metrics import (
+    DB_POOL_CHECKED_OUT,
+    DB_POOL_CHECKED_OUT_AT_CHECKOUT,
+    DB_POOL_CHECKOUT_SECONDS,
+    DB_POOL_CONNECTION_AGE,
+    DB_POOL_OVERFLOW,
+    DB_POOL_WAIT_SECONDS,
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """InstrumentedQueuePool
+
+    A `QueuePool` that exports its usage as Prometheus metrics, labelled with the pool's
+    `pool_logging_name` (or `default`).
+    """
+
+    @property
+    def metrics_label(self) -> str:
+        """ The value of the `pool` label for this pool's metrics. """
+        return getattr(self, 'logging_name', None) or 'default'
+
+    def _do_get(self):
+        """ Checks out a connection record, recording the time spent waiting for it and its age. """
+        start = time.perf_counter()
+        record = super()._do_get()
+        checked_out_at = time.perf_counter()
+
+        label = self.metrics_label
+        DB_POOL_WAIT_SECONDS.labels(label).observe(checked_out_at - start)
+        DB_POOL_CHECKED_OUT_AT_CHECKOUT.labels(label).observe(self.checkedout())
+        if record.starttime:
+            DB_POOL_CONNECTION_AGE.labels(label).set(time.time() - record.starttime)
+        self._record_usage()
+
+        record.info['checked_out_at'] = checked_out_at
+        return record
+
+    def _do_return_conn(self, conn):
+        """ Returns a connection record to the pool, recording how long it was held. """
+        checked_out_at = conn.info.pop('checked_out_at', None)
+        super()._do_return_conn(conn)
+
+        if checked_out_at is not None:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.metrics_label).observe(time.perf_counter() - checked_out_at)
+        self._record_usage()
+
+    def _record_usage(self) -> None:
+        """ Updates the checked-out and overflow gauges. """
+        label = self.metrics_label
+        DB_POOL_CHECKED_OUT.labels(label).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(label).set(max(self.overflow(), 0))
+
+
+def init_app(app: Flask) -> None:
+    """init_app
+
+    Configures the app's SQLAlchemy engine to use an `InstrumentedQueuePool`, unless another pool
+    class is configured. Must be called before the engine is first used.
+
+    :param app:
+        The Flask app to instrument.
+    """
+    engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    engine_options.setdefault('poolclass', InstrumentedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+""" Slow query logging.
+
+Logs every statement that takes longer than `SLOW_QUERY_THRESHOLD` seconds, with its normalized SQL
+(literals and parameters replaced by `?`), a fingerprint of the normalized SQL, the types (but not
+the values) of its parameters, its duration and the operation of the request that executed it.
+
+Repeated slow executions of the same statement are aggregated by fingerprint: the first is logged
+immediately, and later ones at most once per `SLOW_QUERY_LOG_INTERVAL`, with the number of slow
+executions since the last message.
+
+A `SLOW_QUERY_EXPLAIN_SAMPLE_RATE` fraction of slow `SELECT` statements on PostgreSQL are explained
+with `EXPLAIN (ANALYZE, BUFFERS)` by a background worker, on a separate connection, and their plans
+logged. As `ANALYZE` executes the statement again, other statements are never explained.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import structlog
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from sayan_service.extensions.flask_structlog import ContextThreadPoolExecutor
+from sayan_service.metrics import DB_SLOW_QUERIES
+
+from .timing import current_operation
+
+logger = structlog.get_logger(__name__)
+
+##
+#: The `_QUERY_START_ATTR` is the attribute of a statement's execution context
+#: that holds the time at which its cursor execution started.
+#:
+_QUERY_START_ATTR = '_sayan_service_slow_query_start'
+
+##
+#: The `SKIP_OPTION` is an execution option that excludes the statements of a
+#: connection from the slow query log, such as the log's own `EXPLAIN`s.
+#:
+SKIP_OPTION = 'skip_slow_query_log'
+
+##
+#: The `_NORMALIZE_PATTERNS` replace the parameters and literals of a
+#: statement, and collapse lists of them, so that executions of the same
+#: statement with different values share a fingerprint.
+#:
+_NORMALIZE_PATTERNS = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|%s|\$\d+|\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)'), '(?)'),
+    (re.compile(r'(\(\?\))(?:\s*,\s*\(\?\))+'), r'\1'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def normalize(statement: str) -> str:
+    """normalize
+
+    Returns a statement with its parameters and literals replaced by `?`, lists of them collapsed to
+    a single `(?)`, and whitespace collapsed.
+
+    :param statement:
+        The SQL statement.
+    """
+    for pattern, replacement in _NORMALIZE_PATTERNS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def fingerprint(normalized: str) -> str:
+    """fingerprint
+
+    Returns a short, stable identifier of a normalized statement.
+
+    :param normalized:
+        The normalized SQL statement.
+    """
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def parameter_shape(parameters: Any, executemany: bool=False) -> Any:
+    """parameter_shape
+
+    Returns the type names of a statement's parameters, without their values.
+
+    :param parameters:
+        The DBAPI parameters of the statement.
+    :param executemany:
+        If True, `parameters` is a sequence of parameter sets.
+    """
+    if executemany:
+        parameters = list(parameters)
+        return {'rows': len(parameters), 'row': parameter_shape(parameters[0]) if parameters else None}
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    """SlowQueryLog
+
+    Listens to the cursor executions of every engine, and logs those that exceed the threshold.
+    """
+
+    def __init__(self) -> None:
+        self.threshold = 0.0
+        self.interval = 60.0
+        self.explain_sample_rate = 0.0
+        self.explain_timeout = 10.0
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # One slot for the `EXPLAIN` that runs, and one for the `EXPLAIN` that waits for it.
+        self._explain_slots = threading.BoundedSemaphore(2)
+
+    def init_app(self, app: Flask) -> None:
+        """init_app
+
+        Configures the log from the app, and starts listening to engine events unless
+        `SLOW_QUERY_THRESHOLD` is 0.
+
+        :param app:
+            The Flask app from which to pull configuration.
+        """
+        self.threshold = app.config.get('SLOW_QUERY_THRESHOLD', 0.5)
+        self.interval = app.config.get('SLOW_QUERY_LOG_INTERVAL', 60)
+        self.explain_sample_rate = app.config.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0)
+        self.explain_timeout = app.config.get('SLOW_QUERY_EXPLAIN_TIMEOUT', 10)
+
+        if self.explain_sample_rate > 0 and self._executor is None:
+            # The plans are logged with the fields of the request that executed the statement.
+            self._executor = ContextThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+
+        if self.threshold > 0 and not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        """ Records the start of a cursor execution. """
+        if context is not None:
+            setattr(context, _QUERY_START_ATTR, time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        """ Records the cursor execution if it exceeded the threshold. """
+        start = getattr(context, _QUERY_START_ATTR, None)
+        if start is None:
+            return
+        duration = time.perf_counter() - start
+        if duration >= self.threshold and not context.execution_options.get(SKIP_OPTION):
+            self.record(conn.engine, statement, parameters, executemany, duration)
+
+    def record(self, engine: Engine, statement: str, parameters: Any, executemany: bool, duration: float) -> None:
+        """record
+
+        Counts a slow execution of a statement, logs it unless the statement has been logged within
+        the interval, and samples it for an `EXPLAIN`.
+
+        :param engine:
+            The engine the statement was executed on.
+        :param statement:
+            The SQL statement, as sent to the DBAPI.
+        :param parameters:
+            The DBAPI parameters of the statement.
+        :param executemany:
+            If True, `parameters` is a sequence of parameter sets.
+        :param duration:
+            The duration of the execution, in seconds.
+        """
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        DB_SLOW_QUERIES.labels(key).inc()
+
+        now = time.monotonic()
+        with self._lock:
+            stats = self._stats.setdefault(key, {'occurrences': 0, 'max_duration': 0.0, 'logged_at': None})
+            stats['occurrences'] += 1
+            stats['max_duration'] = max(stats['max_duration'], duration)
+            if stats['logged_at'] is not None and now - stats['logged_at'] < self.interval:
+                return
+            occurrences, max_duration = stats['occurrences'], stats['max_duration']
+            stats.update(occurrences=0, max_duration=0.0, logged_at=now)
+
+        logger.warning(
+            'slow query',
+            fingerprint=key,
+            statement=normalized,
+            parameters=parameter_shape(parameters, executemany),
+            duration=round(duration, 6),
+            occurrences=occurrences,
+            max_duration=round(max_duration, 6),
+            operation=current_operation())
+
+        if self._should_explain(engine, statement, executemany) and self._explain_slots.acquire(blocking=False):
+            try:
+                self._executor.submit(self._explain, engine, key, statement, parameters)
+            except RuntimeError:
+                self._explain_slots.release()
+                raise
+
+    def _should_explain(self, engine: Engine, statement: str, executemany: bool) -> bool:
+        """_should_explain
+
+        Returns True if a slow statement is sampled for an `EXPLAIN`. Only single `SELECT`
+        statements on PostgreSQL are explained. A sampled statement is still skipped by `record`
+        when two `EXPLAIN`s are in flight, as at most one runs and one waits for it at a time.
+
+        :param engine:
+            The engine the statement was executed on.
+        :param statement:
+            The SQL statement.
+        :param executemany:
+            If True, the statement was executed with many parameter sets.
+        """
+        return (
+            self._executor is not None
+            and not executemany
+            and engine.dialect.name == 'postgresql'
+            and statement.lstrip()[:6].upper() == 'SELECT'
+            and random.random() < self.explain_sample_rate
+        )
+
+    def _explain(self, engine: Engine, key: str, statement: str, parameters: Any) -> None:
+        """_explain
+
+        Logs the `EXPLAIN (ANALYZE, BUFFERS)` plan of a statement, within a read-only transaction
+        that is rolled back, and with a statement timeout.
+
+        :param engine:
+            The engine to explain the statement on.
+        :param key:
+            The fingerprint of the statement.
+        :param statement:
+            The SQL statement.
+        :param parameters:
+            The DBAPI parameters of the statement.
+        """
+        try:
+            with engine.connect() as connection:
+                connection = connection.execution_options(**{SKIP_OPTION: True})
+                with connection.begin() as transaction:
+                    connection.exec_driver_sql('SET TRANSACTION READ ONLY')
+                    connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(self.explain_timeout * 1000)}')
+                    plan = connection.exec_driver_sql(
+                        f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}', parameters).scalar()
+                    transaction.rollback()
+            logger.info('slow query plan', fingerprint=key, plan=plan)
+        except Exception as ex:
+            logger.warning('slow query plan failed', fingerprint=key, error=str(ex))
+        finally:
+            self._explain_slots.release()
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+""" Per-operation request timing instrumentation.
+
+Attributes the wall time of each request to database queries, serialization and the handler itself,
+and counts the queries it executes, as Prometheus histograms labelled with the Connexion
+`operationId` of the request:
+
+  - Database time is measured around each DBAPI cursor execution, on every engine (including read
+    replicas).
+  - Serialization time is measured by functions decorated with `timed_serialization` (serializer
+    and dumper `dump` methods, and JSON encoding), excluding queries they issue. Streamed response
+    bodies are serialized after the request has been torn down, and are not included.
+  - Handler time is the remainder.
+"""
+
+import contextvars
+import functools
+import time
+
+from typing import Any, Callable, Dict, Optional
+
+from connexion.apis.flask_utils import flaskify_endpoint
+from flask import Flask, current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from sayan_service.metrics import (
+    REQUEST_DB_SECONDS,
+    REQUEST_HANDLER_SECONDS,
+    REQUEST_QUERIES,
+    REQUEST_SECONDS,
+    REQUEST_SERIALIZATION_SECONDS,
+)
+
+##
+#: The `_QUERY_START_ATTR` is the attribute of a statement's execution context
+#: that holds the time at which its cursor execution started.
+#:
+_QUERY_START_ATTR = '_sayan_service_query_start'
+
+
+class RequestTiming:
+    """RequestTiming
+
+    The time spent by the current request in each part of its handling.
+    """
+
+    __slots__ = ('start', 'db_seconds', 'queries', 'serialization_seconds', 'serializing')
+
+    def __init__(self, start: float) -> None:
+        self.start = start
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.serialization_seconds = 0.0
+        self.serializing = False
+
+
+##
+#: The `_request_timing` holds the timing of the current request, or None
+#: outside of a request (e.g. in CLI commands), in which case nothing is
+#: measured. It is copied along with the request context into thread pools
+#: and greenlets (see :func:`sayan_service.extensions.flask_structlog.copy_request_context`).
+#:
+_request_timing: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar(
+    'sayan_service.request_timing', default=None)
+
+
+def timed_serialization(func: Callable) -> Callable:
+    """timed_serialization
+
+    Decorates a function so that the time spent in it counts as serialization time of the current
+    request. Queries executed by the function are counted as database time instead, and calls nested
+    in another serialization (e.g. a nested schema, or a dumper called by a serializer) are only
+    counted once.
+
+    :param func:
+        The function to decorate.
+    """
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        timing = _request_timing.get()
+        if timing is None or timing.serializing:
+            return func(*args, **kwargs)
+
+        timing.serializing = True
+        db_seconds = timing.db_seconds
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            timing.serialization_seconds += elapsed - (timing.db_seconds - db_seconds)
+            timing.serializing = False
+
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """ Records the start of a cursor execution during a request. """
+    if context is not None and _request_timing.get() is not None:
+        setattr(context, _QUERY_START_ATTR, time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    """ Adds the duration of a cursor execution to the timing of the current request. """
+    start = getattr(context, _QUERY_START_ATTR, None)
+    timing = _request_timing.get()
+    if start is not None and timing is not None:
+        timing.db_seconds += time.perf_counter() - start
+        timing.queries += 1
+
+
+def _start_request() -> None:
+    """ Starts timing the current request. """
+    _request_timing.set(RequestTiming(time.perf_counter()))
+
+
+def _finish_request(exc: Optional[BaseException]=None) -> None:
+    """_finish_request
+
+    Records the timing of the current request, labelled with its `operationId`. Requests that did
+    not match a route are not recorded.
+
+    :param exc:
+        The exception raised while handling the request, if any.
+    """
+    timing = _request_timing.get()
+    if timing is None:
+        return
+    _request_timing.set(None)
+
+    operation = current_operation()
+    if operation is None:
+        return
+
+    elapsed = time.perf_counter() - timing.start
+    handler_seconds = elapsed - timing.db_seconds - timing.serialization_seconds
+
+    REQUEST_SECONDS.labels(operation).observe(elapsed)
+    REQUEST_DB_SECONDS.labels(operation).observe(timing.db_seconds)
+    REQUEST_SERIALIZATION_SECONDS.labels(operation).observe(timing.serialization_seconds)
+    REQUEST_HANDLER_SECONDS.labels(operation).observe(max(handler_seconds, 0.0))
+    REQUEST_QUERIES.labels(operation).observe(timing.queries)
+
+
+def current_operation() -> Optional[str]:
+    """current_operation
+
+    Returns the `operationId` of the current request (or its Flask endpoint name, for endpoints that
+    are not part of a Connexion API), or None outside of a request or if it did not match a route.
+    """
+    if not has_request_context() or request.endpoint is None:
+        return None
+    return current_app.extensions.get('request_timing', {}).get(request.endpoint, request.endpoint)
+
+
+def register_api(app: Flask, api: Any) -> None:
+    """register_api
+
+    Registers the `operationId` of each operation of a Connexion API, so that its requests are
+    labelled with it rather than with the Flask endpoint name.
+
+    :param app:
+        The Flask app that the API was added to.
+    :param api:
+        The API returned by `connexion.FlaskApp.add_api`.
+    """
+    operations: Dict[str, str] = app.extensions.setdefault('request_timing', {})
+    for path_item in api.specification['paths'].values():
+        for operation in path_item.values():
+            if isinstance(operation, dict) and 'operationId' in operation:
+                endpoint = f'{api.blueprint.name}.{flaskify_endpoint(operation["operationId"])}'
+                operations[endpoint] = operation['operationId']
+
+
+def init_app(app: Flask) -> None:
+    """init_app
+
+    Times each request of the app, and each query executed by any engine.
+
+    :param app:
+        The Flask app to instrument.
+    """
+    app.extensions.setdefault('request_timing', {})
+    app.before_request(_start_request)
+    app.teardown_request(_finish_request)
+
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
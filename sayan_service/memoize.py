@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+""" Memoization of expensive computations with stampede protection.
+
+`cache.memoize` caches a value until it expires, and then every request that needs it recomputes
+it at once until one of them has stored it again (a cache stampede). The `memoize` decorator gives
+each value two TTLs instead:
+
+  - The soft TTL, after which the value is stale, and is recomputed by a single caller. While it
+    is recomputed, the other callers are served the stale value. With `stale_while_revalidate`,
+    the recomputation itself runs in the background (in a greenlet under gevent), and its caller is
+    served the stale value too.
+  - The hard TTL, after which the value is gone from the cache. Callers that find no value wait for
+    a single caller to compute it, rather than each computing it.
+
+A single caller is chosen across workers by a lock in the cache (`cache.add` of a lock key), so
+that the shared cache backends (e.g. Redis, or the `TieredCache` backend) make it a distributed
+lock. Values are also recomputed early, before their soft TTL, with a probability that increases as
+it approaches and with the time they took to compute (probabilistic early expiration, or "XFetch"),
+which spreads the recomputation of values that were cached at the same time.
+
+Usage:
+
+.. code-block:: python
+
+    @memoize(soft_ttl=60, hard_ttl=600)
+    def get_widget_counts(status):
+        ...
+
+    get_widget_counts.invalidate('active')
+
+Memoized values are pickled, so functions should return plain data rather than records attached to
+a session. Their arguments are part of the cache key by their `repr`, which must be stable.
+"""
+
+import hashlib
+import math
+import random
+import threading
+import time
+
+from contextlib import nullcontext
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+from uuid import uuid4
+
+import structlog
+
+from flask import Flask, current_app, has_app_context
+
+from .extensions import cache
+from .extensions.flask_structlog import copy_request_context
+from .metrics import MEMOIZED_CALLS
+
+logger = structlog.get_logger(__name__)
+
+##
+#: The `DEFAULT_LOCK_TIMEOUT` is the default number of seconds after which the
+#: lock of a recomputation expires, should its worker die while holding it.
+#: Callers waiting for a value recompute it themselves after that long.
+#:
+DEFAULT_LOCK_TIMEOUT = 30
+
+##
+#: The `_POLL_INTERVAL` is the number of seconds between the checks of callers
+#: waiting for a value that another caller is computing.
+#:
+_POLL_INTERVAL = 0.05
+
+
+def _should_refresh(entry: Dict[str, Any], beta: float) -> bool:
+    """ Returns whether a cached entry is stale, or is to be recomputed early. """
+    return time.time() - entry['delta'] * beta * math.log(1.0 - random.random()) >= entry['soft_expires']
+
+
+def memoize(soft_ttl: float, hard_ttl: int, beta: float=1.0, stale_while_revalidate: bool=True,
+            lock_timeout: int=DEFAULT_LOCK_TIMEOUT) -> Callable:
+    """memoize
+
+    Returns a decorator that caches the values of a function by its arguments, and recomputes them
+    without stampedes.
+
+    :param soft_ttl:
+        The number of seconds after which a value is stale, and recomputed by a single caller.
+    :param hard_ttl:
+        The number of seconds after which a value is removed from the cache, and no longer served.
+    :param beta:
+        The eagerness of the probabilistic early expiration: 0 disables it, and values above 1
+        recompute values earlier.
+    :param stale_while_revalidate:
+        Whether stale values are recomputed in the background, or by their caller.
+    :param lock_timeout:
+        The number of seconds after which the lock of a recomputation expires.
+    :raises:
+        ValueError
+    """
+    if not 0 < soft_ttl <= hard_ttl:
+        raise ValueError('memoize requires 0 < soft_ttl <= hard_ttl.')
+
+    def decorator(func: Callable) -> Callable:
+        name = f'{func.__module__}.{func.__qualname__}'
+
+        def make_key(args: Tuple, kwargs: Dict[str, Any]) -> str:
+            digest = hashlib.sha1(repr((args, sorted(kwargs.items()))).encode('utf-8')).hexdigest()
+            return f'memoize.{name}.{digest}'
+
+        def compute(key: str, token: str, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+            """ Computes and caches a value, and releases the lock of its computation. """
+            try:
+                start = time.monotonic()
+                value = func(*args, **kwargs)
+                cache.set(key, {
+                    'value': value,
+                    'delta': time.monotonic() - start,
+                    'soft_expires': time.time() + soft_ttl,
+                }, timeout=hard_ttl)
+                return value
+            finally:
+                # The lock may have expired and been taken by another caller.
+                if cache.get(f'{key}.lock') == token:
+                    cache.delete(f'{key}.lock')
+
+        def refresh(app: Optional[Flask], key: str, token: str, args: Tuple, kwargs: Dict[str, Any]) -> None:
+            """ Recomputes a stale value in the background. """
+            with app.app_context() if app is not None else nullcontext():
+                try:
+                    compute(key, token, args, kwargs)
+                except Exception:
+                    logger.exception('memoized refresh failed', function=name)
+
+        def wait(key: str, token: str, args: Tuple, kwargs: Dict[str, Any]) -> Any:
+            """ Waits for another caller to compute a value, or computes it if the caller's lock expires. """
+            deadline = time.monotonic() + lock_timeout
+            while True:
+                time.sleep(_POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry['value']
+                if cache.add(f'{key}.lock', token, timeout=lock_timeout) or time.monotonic() >= deadline:
+                    return compute(key, token, args, kwargs)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = make_key(args, kwargs)
+            entry = cache.get(key)
+            if entry is not None and not _should_refresh(entry, beta):
+                MEMOIZED_CALLS.labels(name, 'hit').inc()
+                return entry['value']
+
+            token = uuid4().hex
+            if not cache.add(f'{key}.lock', token, timeout=lock_timeout):
+                # Another caller is computing the value.
+                if entry is not None:
+                    MEMOIZED_CALLS.labels(name, 'stale').inc()
+                    return entry['value']
+                MEMOIZED_CALLS.labels(name, 'wait').inc()
+                return wait(key, token, args, kwargs)
+
+            if entry is not None and stale_while_revalidate:
+                MEMOIZED_CALLS.labels(name, 'stale').inc()
+                app = current_app._get_current_object() if has_app_context() else None
+                # The refresh logs its failures with the fields of the request that started it.
+                threading.Thread(
+                    target=copy_request_context(refresh), args=(app, key, token, args, kwargs), daemon=True).start()
+                return entry['value']
+
+            MEMOIZED_CALLS.labels(name, 'miss').inc()
+            return compute(key, token, args, kwargs)
+
+        def invalidate(*args, **kwargs) -> None:
+            """ Removes the cached value of the function for the given arguments. """
+            cache.delete(make_key(args, kwargs))
+
+        wrapper.invalidate = invalidate
+        return wrapper
+    return decorator
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+""" Prometheus metrics for the application.
+
+Metrics defined here are registered with the default `prometheus_client` registry, which is
+exported by the `GunicornPrometheusMetrics` handler configured in
+:func:`sayan_service.app.register_metrics`.
+"""
+
+from prometheus_client import Counter, Gauge, Histogram
+
+from sayan_service.settings import Config
+
+##
+#: The `ENTITY_CACHE_HITS` counter tracks `Model.get_by_id` and
+#: `Model.get_by_uuid` lookups that were served from the entity cache,
+#: including cached "not found" results.
+#:
+ENTITY_CACHE_HITS = Counter(
+    'sayan_service_entity_cache_hits_total',
+    'Entity lookups served from the cache.',
+    ['model'])
+
+##
+#: The `ENTITY_CACHE_MISSES` counter tracks entity cache lookups that fell
+#: through to the database.
+#:
+ENTITY_CACHE_MISSES = Counter(
+    'sayan_service_entity_cache_misses_total',
+    'Entity lookups that fell through to the database.',
+    ['model'])
+
+##
+#: The `ENTITY_CACHE_EVICTIONS` counter tracks entries removed from the entity
+#: cache because their records were saved, updated or deleted.
+#:
+ENTITY_CACHE_EVICTIONS = Counter(
+    'sayan_service_entity_cache_evictions_total',
+    'Entity cache entries invalidated by writes.',
+    ['model'])
+
+##
+#: The `RESPONSE_CACHE_LOOKUPS` counter tracks requests to cached read
+#: endpoints by whether their response was served from the response cache.
+#: See :mod:`sayan_service.response_cache`.
+#:
+RESPONSE_CACHE_LOOKUPS = Counter(
+    'sayan_service_response_cache_lookups_total',
+    'Requests to cached endpoints, by response cache result.',
+    ['result'])
+
+##
+#: The `RESPONSE_NOT_MODIFIED` counter tracks conditional requests to cached
+#: read endpoints that were answered with a `304 Not Modified`.
+#:
+RESPONSE_NOT_MODIFIED = Counter(
+    'sayan_service_response_not_modified_total',
+    'Conditional requests answered with 304 Not Modified.')
+
+##
+#: The `CACHE_LOOKUPS` counter tracks the lookups of each tier of the
+#: `TieredCache` backend (`local` or `shared`) by result (`hit` or `miss`).
+#: Every lookup reaches the local tier, and only its misses reach the shared
+#: tier. See :mod:`sayan_service.cache_backends`.
+#:
+CACHE_LOOKUPS = Counter(
+    'sayan_service_cache_lookups_total',
+    'Cache lookups, by tier and result.',
+    ['tier', 'result'])
+
+##
+#: The `CACHE_LOCAL_EVICTIONS` counter tracks values evicted from the local
+#: tier of the `TieredCache` backend to stay within `CACHE_LOCAL_MAX_BYTES`.
+#:
+CACHE_LOCAL_EVICTIONS = Counter(
+    'sayan_service_cache_local_evictions_total',
+    'Values evicted from the local cache tier to stay within its size.')
+
+##
+#: The `CACHE_LOADS_COALESCED` counter tracks `TieredCache.get_or_set` calls
+#: that waited for a concurrent load of the same missing value instead of
+#: loading it again.
+#:
+CACHE_LOADS_COALESCED = Counter(
+    'sayan_service_cache_loads_coalesced_total',
+    'Cache loads that waited for a concurrent load of the same key.')
+
+##
+#: The `MEMOIZED_CALLS` counter tracks the calls of functions decorated with
+#: `memoize` by result: `hit` (a fresh value), `stale` (a stale value, while
+#: it is recomputed), `miss` (the caller computed the value) or `wait` (the
+#: caller waited for another to compute it). See :mod:`sayan_service.memoize`.
+#:
+MEMOIZED_CALLS = Counter(
+    'sayan_service_memoized_calls_total',
+    'Calls to memoized functions, by result.',
+    ['function', 'result'])
+
+##
+#: The `PASSWORD_HASH_QUEUE_DEPTH` gauge tracks the number of password hashes
+#: and verifications waiting for or running in the bcrypt thread pool.
+#: See :mod:`sayan_service.passwords`.
+#:
+PASSWORD_HASH_QUEUE_DEPTH = Gauge(
+    'sayan_service_password_hash_queue_depth',
+    'Password hashes waiting for or running in the bcrypt pool.',
+    multiprocess_mode='livesum')
+
+##
+#: The `PASSWORD_HASH_WAIT_SECONDS` histogram records the time password hashes
+#: and verifications wait for a thread of the bcrypt pool.
+#:
+PASSWORD_HASH_WAIT_SECONDS = Histogram(
+    'sayan_service_password_hash_wait_seconds',
+    'Time spent waiting for a thread of the bcrypt pool.',
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+
+##
+#: The `PASSWORD_HASH_SECONDS` histogram records the time password hashes and
+#: verifications take in the bcrypt pool, by operation (`hash` or `verify`).
+#:
+PASSWORD_HASH_SECONDS = Histogram(
+    'sayan_service_password_hash_seconds',
+    'Time spent hashing or verifying a password.',
+    ['operation'],
+    buckets=(.01, .025, .05, .1, .25, .5, 1, 2.5, 5))
+
+##
+#: The `DB_POOL_CHECKED_OUT` gauge tracks the number of connections currently
+#: checked out of each connection pool, summed across live workers.
+#:
+DB_POOL_CHECKED_OUT = Gauge(
+    'sayan_service_db_pool_checked_out_connections',
+    'Connections currently checked out of the pool.',
+    ['pool'],
+    multiprocess_mode='livesum')
+
+##
+#: The `DB_POOL_OVERFLOW` gauge tracks the number of connections open beyond
+#: the configured pool size, summed across live workers.
+#:
+DB_POOL_OVERFLOW = Gauge(
+    'sayan_service_db_pool_overflow_connections',
+    'Connections open beyond the configured pool size.',
+    ['pool'],
+    multiprocess_mode='livesum')
+
+##
+#: The `DB_POOL_CHECKED_OUT_AT_CHECKOUT` histogram records how many connections
+#: were checked out of a pool (including the new one) each time a connection
+#: is checked out, showing how close the pool runs to its limit.
+#:
+DB_POOL_CHECKED_OUT_AT_CHECKOUT = Histogram(
+    'sayan_service_db_pool_checked_out_at_checkout',
+    'Connections checked out of the pool when a connection is checked out.',
+    ['pool'],
+    buckets=(1, 2, 3, 5, 8, 10, 15, 20, 30, 50, 100))
+
+##
+#: The `DB_POOL_WAIT_SECONDS` histogram records the time spent waiting for a
+#: connection from a pool, including the time to open a new connection.
+#:
+DB_POOL_WAIT_SECONDS = Histogram(
+    'sayan_service_db_pool_wait_seconds',
+    'Time spent waiting for a connection from the pool.',
+    ['pool'],
+    buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+
+##
+#: The `DB_POOL_CHECKOUT_SECONDS` histogram records how long connections are
+#: held before being returned to a pool.
+#:
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    'sayan_service_db_pool_checkout_seconds',
+    'Time a connection is held before being returned to the pool.',
+    ['pool'])
+
+##
+#: The `DB_POOL_CONNECTION_AGE` gauge tracks the age of the most recently
+#: checked out connection of each pool (the maximum across live workers), to
+#: compare against the `DATABASE_POOL_RECYCLE` setting.
+#:
+DB_POOL_CONNECTION_AGE = Gauge(
+    'sayan_service_db_pool_connection_age_seconds',
+    'Age of the most recently checked out connection.',
+    ['pool'],
+    multiprocess_mode='livemax')
+
+##
+#: The `DB_REPLICA_HEALTHY` gauge is 1 if reads are being routed to a read
+#: replica, and 0 if it failed its last health check or is lagging too far
+#: behind the primary (the minimum across live workers).
+#:
+DB_REPLICA_HEALTHY = Gauge(
+    'sayan_service_db_replica_healthy',
+    'Whether reads are routed to the replica.',
+    ['replica'],
+    multiprocess_mode='livemin')
+
+##
+#: The `DB_REPLICA_LAG_SECONDS` gauge tracks the replication lag of each read
+#: replica at its last health check (the maximum across live workers).
+#:
+DB_REPLICA_LAG_SECONDS = Gauge(
+    'sayan_service_db_replica_lag_seconds',
+    'Replication lag of the replica at its last health check.',
+    ['replica'],
+    multiprocess_mode='livemax')
+
+##
+#: The `DB_REPLICA_FALLBACKS` counter tracks sessions whose reads were routed
+#: to the primary because no replica was healthy.
+#:
+DB_REPLICA_FALLBACKS = Counter(
+    'sayan_service_db_replica_fallbacks_total',
+    'Sessions that read from the primary because no replica was healthy.')
+
+##
+#: The `DB_SLOW_QUERIES` counter tracks executions of statements that exceeded
+#: `SLOW_QUERY_THRESHOLD`, by the fingerprint logged with them. See
+#: :mod:`sayan_service.instrumentation.slow_queries`.
+#:
+DB_SLOW_QUERIES = Counter(
+    'sayan_service_db_slow_queries_total',
+    'Statements that exceeded the slow query threshold.',
+    ['fingerprint'])
+
+##
+#: The `DB_COMPILED_CACHE_LOOKUPS` counter tracks statement executions by
+#: whether their compiled form was found in SQLAlchemy's compiled cache
+#: (`hit`), compiled and added to it (`miss`), or not cacheable. See
+#: :mod:`sayan_service.instrumentation.compiled_cache`.
+#:
+DB_COMPILED_CACHE_LOOKUPS = Counter(
+    'sayan_service_db_compiled_cache_lookups_total',
+    'Statement executions by compiled cache result.',
+    ['result'])
+
+##
+#: The `DB_STATEMENTS_PREPARED` counter tracks statements prepared on the
+#: server. See :mod:`sayan_service.prepared_statements`.
+#:
+DB_STATEMENTS_PREPARED = Counter(
+    'sayan_service_db_statements_prepared_total',
+    'Statements prepared on the server.')
+
+##
+#: The `READINESS_CHECK_SECONDS` histogram records the latency of each
+#: readiness check, including checks that exceed their deadline.
+#:
+READINESS_CHECK_SECONDS = Histogram(
+    'sayan_service_readiness_check_seconds',
+    'Latency of readiness checks.',
+    ['check'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10))
+
+##
+#: The `LOG_MESSAGES_DROPPED` counter tracks log messages discarded because
+#: the asynchronous logging queue was full.
+#:
+LOG_MESSAGES_DROPPED = Counter(
+    'sayan_service_log_messages_dropped_total',
+    'Log messages discarded because the logging queue was full.',
+    ['level'])
+
+##
+#: The `LOG_WRITE_ERRORS` counter tracks log messages that the asynchronous
+#: logging listener failed to write to its stream.
+#:
+LOG_WRITE_ERRORS = Counter(
+    'sayan_service_log_write_errors_total',
+    'Log messages that could not be written to the log stream.')
+
+##
+#: The `REQUEST_SECONDS` histogram records the wall time of each request, from
+#: the first `before_request` hook to teardown, by Connexion `operationId`. It
+#: is broken down by the `REQUEST_HANDLER_SECONDS`, `REQUEST_DB_SECONDS` and
+#: `REQUEST_SERIALIZATION_SECONDS` histograms. See
+#: :mod:`sayan_service.instrumentation.timing`.
+#:
+REQUEST_SECONDS = Histogram(
+    'sayan_service_request_seconds',
+    'Wall time of requests.',
+    ['operation'],
+    buckets=Config.METRICS_LATENCY_BUCKETS)
+
+##
+#: The `REQUEST_HANDLER_SECONDS` histogram records the time of each request
+#: not spent in database queries or serialization.
+#:
+REQUEST_HANDLER_SECONDS = Histogram(
+    'sayan_service_request_handler_seconds',
+    'Time of requests spent outside of database queries and serialization.',
+    ['operation'],
+    buckets=Config.METRICS_LATENCY_BUCKETS)
+
+##
+#: The `REQUEST_DB_SECONDS` histogram records the time each request spent
+#: executing database queries, measured around the DBAPI cursor.
+#:
+REQUEST_DB_SECONDS = Histogram(
+    'sayan_service_request_db_seconds',
+    'Time of requests spent executing database queries.',
+    ['operation'],
+    buckets=Config.METRICS_LATENCY_BUCKETS)
+
+##
+#: The `REQUEST_SERIALIZATION_SECONDS` histogram records the time each request
+#: spent dumping records and encoding JSON, excluding queries issued while
+#: serializing (e.g. lazy loads).
+#:
+REQUEST_SERIALIZATION_SECONDS = Histogram(
+    'sayan_service_request_serialization_seconds',
+    'Time of requests spent serializing responses.',
+    ['operation'],
+    buckets=Config.METRICS_LATENCY_BUCKETS)
+
+##
+#: The `REQUEST_QUERIES` histogram records the number of database queries
+#: executed by each request.
+#:
+REQUEST_QUERIES = Histogram(
+    'sayan_service_request_queries',
+    'Database queries executed per request.',
+    ['operation'],
+    buckets=Config.METRICS_QUERY_COUNT_BUCKETS)
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+""" Password hashing off the event loop.
+
+A bcrypt hash with the default `BCRYPT_LOG_ROUNDS` costs hundreds of milliseconds of CPU. Under the
+gevent worker, hashing a password in a request's greenlet blocks the event loop, and with it every
+other request of the worker, for as long as it takes. The `passwords` service hashes and verifies
+passwords with the `bcrypt` extension in a bounded pool of `BCRYPT_POOL_SIZE` native threads
+instead. bcrypt releases the GIL while it hashes, so the greenlet waiting for a hash yields to the
+other greenlets of the worker, which keep running. Without gevent, the pool is a standard thread
+pool, and the calling thread waits for it.
+
+Raising `BCRYPT_LOG_ROUNDS` only applies to new hashes. `passwords.verify_and_update` tells the
+caller when a password that was just verified should be hashed again with the configured cost,
+so that stored hashes are upgraded as their users log in:
+
+.. code-block:: python
+
+    valid, new_hash = passwords.verify_and_update(user.password_hash, password)
+    if valid and new_hash:
+        user.password_hash = new_hash
+        user.save()
+"""
+
+import os
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from flask import Flask
+
+from .extensions import bcrypt
+from .metrics import PASSWORD_HASH_QUEUE_DEPTH, PASSWORD_HASH_SECONDS, PASSWORD_HASH_WAIT_SECONDS
+
+##
+#: We attempt to import gevent, whose monkeypatching replaces threads with
+#: greenlets, and set a flag if it is not available.
+#:
+try:
+    from gevent import monkey
+    from gevent.threadpool import ThreadPool
+    _HAS_GEVENT = True
+except ImportError:
+    _HAS_GEVENT = False
+
+
+def _timed(func: Callable, *args: Any) -> Tuple[Any, float, float]:
+    """ Calls `func`, and returns its value with the `perf_counter` times at which it started and returned. """
+    started = time.perf_counter()
+    value = func(*args)
+    return value, started, time.perf_counter()
+
+
+def _rounds(pw_hash: str) -> Optional[int]:
+    """ Returns the cost of a bcrypt hash (e.g. `$2b$12$...`), or None if it is not a bcrypt hash. """
+    parts = pw_hash.split('$')
+    return int(parts[2]) if len(parts) > 3 and parts[2].isdigit() else None
+
+
+class PasswordHasher:
+    """PasswordHasher
+
+    Hashes and verifies passwords with the `bcrypt` extension in a bounded pool of native threads.
+    """
+
+    def __init__(self) -> None:
+        self.rounds = 12
+        self.pool_size = 2
+        self._pool: Any = None
+        self._pool_pid: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app: Flask) -> None:
+        """init_app
+
+        Configures the cost of new hashes and the size of the pool from the app.
+
+        :param app:
+            The Flask app from which to pull configuration.
+        """
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.pool_size = app.config.get('BCRYPT_POOL_SIZE', 2)
+
+    def hash(self, password: str) -> str:
+        """hash
+
+        Returns the bcrypt hash of a password, with the configured cost.
+
+        :param password:
+            The password.
+        """
+        return self._run('hash', bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def verify(self, pw_hash: str, password: str) -> bool:
+        """verify
+
+        Returns whether a password matches a bcrypt hash.
+
+        :param pw_hash:
+            The hash.
+        :param password:
+            The password.
+        """
+        return self._run('verify', bcrypt.check_password_hash, pw_hash, password)
+
+    def needs_rehash(self, pw_hash: str) -> bool:
+        """needs_rehash
+
+        Returns whether a bcrypt hash has a cost other than the configured one.
+
+        :param pw_hash:
+            The hash.
+        """
+        return _rounds(pw_hash) != self.rounds
+
+    def verify_and_update(self, pw_hash: str, password: str) -> Tuple[bool, Optional[str]]:
+        """verify_and_update
+
+        Verifies a password against a bcrypt hash and, if it matches and the hash has a cost other
+        than the configured one, hashes it again with the configured cost.
+
+        :param pw_hash:
+            The stored hash.
+        :param password:
+            The password.
+        :returns:
+            Whether the password matches, and the hash to store in place of `pw_hash`, or None if
+            it should be kept.
+        """
+        if not self.verify(pw_hash, password):
+            return False, None
+        return True, self.hash(password) if self.needs_rehash(pw_hash) else None
+
+    def _run(self, operation: str, func: Callable, *args: Any) -> Any:
+        """_run
+
+        Calls `func` in the pool, and waits for its value, recording the depth of the queue, the
+        time the call waited for a thread and the time it took.
+
+        :param operation:
+            The name of the operation, for the metrics.
+        :param func:
+            The function to call.
+        :param args:
+            The arguments of the function.
+        """
+        PASSWORD_HASH_QUEUE_DEPTH.inc()
+        submitted = time.perf_counter()
+        try:
+            pool = self._get_pool()
+            if isinstance(pool, ThreadPoolExecutor):
+                value, started, finished = pool.submit(_timed, func, *args).result()
+            else:
+                value, started, finished = pool.apply(_timed, (func, *args))
+        finally:
+            PASSWORD_HASH_QUEUE_DEPTH.dec()
+        # The metrics are recorded by the waiting greenlet, as their locks are not safe to use from native threads.
+        PASSWORD_HASH_WAIT_SECONDS.observe(started - submitted)
+        PASSWORD_HASH_SECONDS.labels(operation).observe(finished - started)
+        return value
+
+    def _get_pool(self) -> Any:
+        """ Returns the pool of the current process, creating it on first use (after gunicorn forks the worker). """
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    if _HAS_GEVENT and monkey.is_module_patched('threading'):
+                        self._pool = ThreadPool(self.pool_size)
+                    else:
+                        self._pool = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='bcrypt')
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+
+passwords = PasswordHasher()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+""" Server-side prepared statements for psycopg2.
+
+psycopg2 sends every statement as text, to be parsed and planned by PostgreSQL on each execution,
+and has no support for server-side prepared statements (unlike e.g. asyncpg, which prepares and
+caches every statement itself). When `SQLALCHEMY_PREPARED_STATEMENTS` is set, statements executed
+with the `PREPARE_OPTION` execution option on a psycopg2 connection are instead prepared on the
+connection with `PREPARE` the first time they are executed, and executed with `EXECUTE` afterwards.
+
+Only statements that opt in are prepared, such as the standard lookups of
+:class:`sayan_service.database.Model`, so that the number of statements prepared on a connection
+stays small. Prepared statements live as long as the connection; they are forgotten when it is
+invalidated or recycled.
+
+Prepared statements are incompatible with PgBouncer's transaction and statement pooling modes, as
+consecutive transactions of a connection may be served by different server connections.
+"""
+
+import hashlib
+import re
+
+from typing import Any, Tuple
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from sayan_service.metrics import DB_STATEMENTS_PREPARED
+
+##
+#: The `PREPARE_OPTION` is an execution option that marks a statement to be
+#: prepared on the server.
+#:
+PREPARE_OPTION = 'sayan_service_prepare'
+
+##
+#: The `_PREPARED_INFO_KEY` is the key of the connection `info` dictionary that
+#: maps each statement prepared on the connection to its `EXECUTE` statement.
+#:
+_PREPARED_INFO_KEY = 'sayan_service_prepared_statements'
+
+##
+#: The `_PARAMETER_PATTERN` matches a named parameter of a psycopg2 statement.
+#:
+_PARAMETER_PATTERN = re.compile(r'%\((\w+)\)s')
+
+
+def prepare(cursor: Any, statement: str) -> str:
+    """prepare
+
+    Prepares a psycopg2 statement with named parameters on the cursor's connection, and returns the
+    `EXECUTE` statement that executes it with the same parameters.
+
+    :param cursor:
+        A psycopg2 cursor.
+    :param statement:
+        The SQL statement, as sent to psycopg2.
+    """
+    positions: dict = {}
+
+    def positional(match: Any) -> str:
+        return f'${positions.setdefault(match.group(1), len(positions) + 1)}'
+
+    # The `PREPARE` is executed without parameters, so psycopg2 does not unescape `%%`.
+    body = _PARAMETER_PATTERN.sub(positional, statement).replace('%%', '%')
+    name = f'sayan_service_{hashlib.sha1(statement.encode("utf-8")).hexdigest()[:16]}'
+    cursor.execute(f'PREPARE {name} AS {body}')
+    DB_STATEMENTS_PREPARED.inc()
+
+    if not positions:
+        return f'EXECUTE {name}'
+    return f'EXECUTE {name} ({", ".join(f"%({parameter})s" for parameter in positions)})'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> Tuple[str, Any]:
+    """ Replaces a statement marked with the `PREPARE_OPTION` with the `EXECUTE` of its prepared statement. """
+    if (
+        executemany
+        or context is None
+        or not context.execution_options.get(PREPARE_OPTION)
+        or conn.dialect.driver != 'psycopg2'
+        or not isinstance(parameters, dict)
+    ):
+        return statement, parameters
+
+    prepared = conn.info.setdefault(_PREPARED_INFO_KEY, {})
+    execute = prepared.get(statement)
+    if execute is None:
+        execute = prepared[statement] = prepare(cursor, statement)
+    return execute, parameters
+
+
+def init_app(app: Flask) -> None:
+    """init_app
+
+    Starts preparing the statements marked with the `PREPARE_OPTION` on psycopg2 connections, if
+    `SQLALCHEMY_PREPARED_STATEMENTS` is set.
+
+    :param app:
+        The Flask app from which to pull configuration.
+    """
+    if app.config.get('SQLALCHEMY_PREPARED_STATEMENTS') and not event.contains(
+            Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute, retval=True)
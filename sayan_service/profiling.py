@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+""" On-demand profiling of a live worker.
+
+When `PROFILING_ENABLED` is set, two admin-only tools are registered, both requiring the
+`PROFILING_TOKEN` as a bearer token:
+
+  - `GET /admin/profile?seconds=N` samples the stacks of every thread of the worker that serves it
+    for N seconds, and returns them in the collapsed stack format read by flame graph tools (e.g.
+    `flamegraph.pl` or speedscope), one `frame;frame;frame count` line per distinct stack.
+  - Sending the `X-Profile` header with any request profiles that request with `cProfile`, and
+    returns the profile statistics instead of its response. The header value selects the sort
+    order (`cumulative` by default, `tottime` or `calls`). The original status code is returned in
+    the `X-Profile-Status` header.
+
+Neither is part of the public API spec. When `PROFILING_ENABLED` is not set, nothing is registered
+and requests are not inspected, so profiling support has no overhead.
+
+Under gevent workers, the sampler runs in a native thread from gevent's thread pool, so that it
+samples whichever greenlet is running, and the requesting greenlet yields while it waits. `cProfile`
+profiles the native thread, so a request profile also includes the greenlets that ran while the
+request was being handled.
+"""
+
+import cProfile
+import hmac
+import io
+import pstats
+import sys
+import threading
+import time
+
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from flask import Blueprint, Flask, Response, current_app, g, request
+
+from .http import http_response
+
+##
+#: We attempt to import gevent, whose monkeypatching replaces threads with
+#: greenlets, and set a flag if it is not available.
+#:
+try:
+    import gevent
+    from gevent import monkey
+    _HAS_GEVENT = True
+except ImportError:
+    _HAS_GEVENT = False
+
+##
+#: The `PROFILE_HEADER` requests a deterministic profile of a single request.
+#:
+PROFILE_HEADER = 'X-Profile'
+
+##
+#: The `_PROFILE_SORT_KEYS` are the accepted values of the `PROFILE_HEADER`,
+#: with the `pstats` sort key that each selects.
+#:
+_PROFILE_SORT_KEYS = {
+    '': pstats.SortKey.CUMULATIVE,
+    'cumulative': pstats.SortKey.CUMULATIVE,
+    'tottime': pstats.SortKey.TIME,
+    'calls': pstats.SortKey.CALLS,
+}
+
+##
+#: The `_PROFILE_LIMIT` is the number of functions listed in a request profile.
+#:
+_PROFILE_LIMIT = 100
+
+##
+#: The `_lock` ensures that only one profile runs in a worker at a time, as
+#: concurrent profiles would distort (or, with `cProfile`, replace) each other.
+#:
+_lock = threading.Lock()
+
+blueprint = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+def _native(module: str, name: str) -> Any:
+    """_native
+
+    Returns the standard library implementation of `module.name`, even if gevent has monkeypatched
+    it.
+
+    :param module:
+        The name of the module.
+    :param name:
+        The name of the attribute.
+    """
+    if _HAS_GEVENT:
+        return monkey.get_original(module, name)
+    return getattr(sys.modules[module], name)
+
+
+##
+#: The `_MAIN_THREAD_IDENT` is the native identifier of the main thread, which
+#: runs every greenlet of a gevent worker.
+#:
+_MAIN_THREAD_IDENT = _native('_thread', 'get_ident')()
+
+
+class StackSampler:
+    """StackSampler
+
+    A statistical profiler that periodically records the stack of every thread of the process
+    (other than its own), and counts identical stacks.
+    """
+
+    def __init__(self, interval: float=0.01) -> None:
+        """__init__
+
+        :param interval:
+            The number of seconds between samples.
+        """
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self._labels: Dict[Any, str] = {}
+
+    def run(self, seconds: float) -> None:
+        """run
+
+        Samples the stacks of the other threads for the given number of seconds. Blocks the calling
+        thread.
+
+        :param seconds:
+            The duration of the profile.
+        """
+        sleep = _native('time', 'sleep')
+        own_ident = _native('_thread', 'get_ident')()
+        deadline = time.monotonic() + seconds
+
+        while time.monotonic() < deadline:
+            # Under gevent, the threads enumerated are greenlets, so only the main thread is named.
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            names.setdefault(_MAIN_THREAD_IDENT, 'MainThread')
+            for ident, frame in sys._current_frames().items():
+                if ident != own_ident:
+                    self.samples[self._collapse(names.get(ident, f'thread-{ident}'), frame)] += 1
+            self.sample_count += 1
+            sleep(self.interval)
+
+    def collapsed(self) -> str:
+        """collapsed
+
+        Returns the samples in the collapsed stack format, with the most frequent stacks first.
+        """
+        return ''.join(f'{stack} {count}\n' for stack, count in self.samples.most_common())
+
+    def _collapse(self, thread_name: str, frame: Any) -> str:
+        """_collapse
+
+        Returns a stack as a single line of `;`-separated frames, starting with the thread name and
+        the outermost frame.
+
+        :param thread_name:
+            The name of the thread.
+        :param frame:
+            The innermost frame of the stack.
+        """
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+            labels.append(label)
+            frame = frame.f_back
+        labels.append(thread_name)
+        return ';'.join(reversed(labels))
+
+
+def _run_in_native_thread(func: Callable, *args: Any) -> None:
+    """_run_in_native_thread
+
+    Calls `func` in a native thread from gevent's thread pool if gevent has monkeypatched threads,
+    yielding to other greenlets until it returns. Otherwise calls it in the current thread.
+
+    :param func:
+        The function to call.
+    :param args:
+        The arguments of the function.
+    """
+    if _HAS_GEVENT and monkey.is_module_patched('threading'):
+        gevent.get_hub().threadpool.apply(func, args)
+    else:
+        func(*args)
+
+
+def _authorized() -> bool:
+    """ Returns True if the request carries the profiling token. """
+    expected = f'Bearer {current_app.config["PROFILING_TOKEN"]}'
+    return hmac.compare_digest(request.headers.get('Authorization', ''), expected)
+
+
+@blueprint.before_request
+def _authorize() -> Optional[Tuple[dict, int]]:
+    """ Rejects requests to the admin endpoints without the profiling token. """
+    if not _authorized():
+        return http_response(403)
+    return None
+
+
+@blueprint.route('/profile')
+def get_profile() -> Any:
+    """get_profile
+
+    Samples the stacks of the worker for `seconds` (default 10) seconds, and returns them in the
+    collapsed stack format. Responds with a 409 if another profile is running in the worker.
+    """
+    seconds = request.args.get('seconds', 10, type=float)
+    if not 0 < seconds <= current_app.config['PROFILING_MAX_SECONDS']:
+        return http_response(400)
+
+    if not _lock.acquire(blocking=False):
+        return http_response(409)
+    try:
+        sampler = StackSampler(current_app.config['PROFILING_SAMPLE_INTERVAL'])
+        _run_in_native_thread(sampler.run, seconds)
+    finally:
+        _lock.release()
+
+    current_app.logger.info(f'Profiled the worker for {seconds}s ({sampler.sample_count} samples)')
+    return Response(sampler.collapsed(), mimetype='text/plain')
+
+
+def _start_request_profile() -> Optional[Tuple[dict, int]]:
+    """ Starts profiling the request if it has the `X-Profile` header. """
+    sort = request.headers.get(PROFILE_HEADER)
+    if sort is None:
+        return None
+    if not _authorized():
+        return http_response(403)
+    if sort.lower() not in _PROFILE_SORT_KEYS:
+        return http_response(400)
+    if not _lock.acquire(blocking=False):
+        return http_response(409)
+
+    g.profile = cProfile.Profile()
+    g.profile.enable()
+    return None
+
+
+def _finish_request_profile(response: Response) -> Response:
+    """_finish_request_profile
+
+    Replaces the response of a profiled request with its profile statistics.
+
+    :param response:
+        The response to the request.
+    """
+    profile = g.pop('profile', None)
+    if profile is None:
+        return response
+    profile.disable()
+    _lock.release()
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profile, stream=stream)
+    stats.sort_stats(_PROFILE_SORT_KEYS[request.headers[PROFILE_HEADER].lower()]).print_stats(_PROFILE_LIMIT)
+    headers = {'X-Profile-Status': str(response.status_code)}
+    return Response(stream.getvalue(), mimetype='text/plain', headers=headers)
+
+
+def _abandon_request_profile(exc: Optional[BaseException]=None) -> None:
+    """ Stops profiling a request whose response was never finished. """
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.disable()
+        _lock.release()
+
+
+def init_app(app: Flask) -> None:
+    """init_app
+
+    Registers the admin profiling endpoint and the `X-Profile` request hooks, if `PROFILING_ENABLED`
+    is set.
+
+    :param app:
+        The Flask app.
+    :raises:
+        ValueError
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return
+    if not app.config.get('PROFILING_TOKEN'):
+        raise ValueError('PROFILING_TOKEN is required when PROFILING_ENABLED=True.')
+
+    app.register_blueprint(blueprint)
+    app.before_request(_start_request_profile)
+    app.after_request(_finish_request_profile)
+    app.teardown_request(_abandon_request_profile)
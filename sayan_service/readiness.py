@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+""" Readiness checks for the service's dependencies. """
+
+import math
+import threading
+import time
+
+from concurrent.futures import Future, wait
+from functools import lru_cache
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from flask import Flask, current_app
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, Engine
+from sqlalchemy.pool import NullPool
+
+from .extensions import cache, db
+from .extensions.flask_structlog import ContextThreadPoolExecutor
+from .metrics import READINESS_CHECK_SECONDS
+
+##
+#: The `_CACHE_PROBE_KEY` is written to and read from the cache backend by the
+#: cache readiness check.
+#:
+_CACHE_PROBE_KEY = 'readiness.probe'
+
+
+class ReadinessCheck(NamedTuple):
+    """ReadinessCheck
+
+    A probe registered with a `ReadinessRegistry`.
+    """
+
+    ##
+    #: The name of the dependency, used as its key in readiness results.
+    #:
+    name: str
+
+    ##
+    #: A function called with the number of seconds until the deadline,
+    #: returning True if the dependency is available.
+    #:
+    probe: Callable[[float], bool]
+
+    ##
+    #: If False, the result of the check is reported but does not affect the
+    #: readiness of the service.
+    #:
+    critical: bool
+
+    ##
+    #: A function called with the app, returning True if the check applies to
+    #: it, or None if the check always applies.
+    #:
+    enabled: Optional[Callable[[Flask], bool]]
+
+
+class ReadinessRegistry:
+    """ReadinessRegistry
+
+    A registry of readiness checks for the service's dependencies. Probes run concurrently, each
+    within the `READINESS_CHECK_TIMEOUT` deadline, and their results are cached for
+    `READINESS_CACHE_TTL` seconds so that frequent readiness probes do not hammer the dependencies.
+
+    The deadline only stops the registry from waiting for a probe: the probe's thread runs until
+    the probe returns. Each probe is therefore given the number of seconds until the deadline, to
+    bound its own I/O with it, and a probe that is still running from a previous run is reported as
+    failed rather than started again, so that a hung dependency holds at most one thread.
+
+    Usage:
+
+    .. code-block:: python
+
+        @readiness.register('search')
+        def search_ready(timeout):
+            return search_client.ping(timeout=timeout)
+    """
+
+    def __init__(self, max_workers: int=8) -> None:
+        """__init__
+
+        :param max_workers:
+            The maximum number of probes run at once.
+        """
+        self.checks: Dict[str, ReadinessCheck] = {}
+        # Probes log with the fields of the request that ran them.
+        self._executor = ContextThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='readiness')
+        self._results: Dict[int, Tuple[float, Dict[str, bool], bool]] = {}
+        self._running: Dict[Tuple[int, str], Future] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, critical: bool=True, enabled: Optional[Callable[[Flask], bool]]=None) -> Callable:
+        """register
+
+        Returns a decorator that registers a probe for the named dependency. The probe is called
+        with an app context and the number of seconds until the deadline, and the dependency is
+        considered unavailable if the probe returns a falsy value, raises an exception or exceeds
+        its deadline.
+
+        :param name:
+            The name of the dependency.
+        :param critical:
+            If False, the check is reported but does not affect the readiness of the service (e.g.
+            for a dependency that the service can fall back from).
+        :param enabled:
+            A function called with the app, returning True if the check applies to it.
+        """
+        def decorator(probe: Callable[[float], bool]) -> Callable[[float], bool]:
+            self.checks[name] = ReadinessCheck(name, probe, critical, enabled)
+            return probe
+        return decorator
+
+    def run(self) -> Tuple[Dict[str, bool], bool]:
+        """run
+
+        Returns the results of the readiness checks for the current app, as a dict where keys are
+        dependency names and values are booleans, and whether every critical check passed. Results
+        are reused for `READINESS_CACHE_TTL` seconds.
+        """
+        app = current_app._get_current_object()
+        key = id(app)
+
+        cached = self._results.get(key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1], cached[2]
+
+        with self._lock:
+            cached = self._results.get(key)
+            if cached is None or cached[0] <= time.monotonic():
+                results, ready = self._run_checks(app)
+                cached = (time.monotonic() + app.config.get('READINESS_CACHE_TTL', 2), results, ready)
+                self._results[key] = cached
+        return cached[1], cached[2]
+
+    def _run_checks(self, app: Flask) -> Tuple[Dict[str, bool], bool]:
+        """_run_checks
+
+        Runs the probes that apply to the app concurrently, and waits for them until the deadline.
+        A check whose probe is still running from a previous run fails without being run again.
+
+        :param app:
+            The Flask app to check.
+        """
+        checks = [check for check in self.checks.values() if check.enabled is None or check.enabled(app)]
+        timeout = app.config.get('READINESS_CHECK_TIMEOUT', 2)
+
+        futures = {}
+        for check in checks:
+            running = self._running.get((id(app), check.name))
+            if running is not None and not running.done():
+                app.logger.error(f'The {check.name} readiness check is still running from a previous run')
+                continue
+            future = self._executor.submit(self._probe, app, check, timeout)
+            futures[check] = self._running[(id(app), check.name)] = future
+        done, _ = wait(futures.values(), timeout=timeout)
+
+        results = {}
+        for check in checks:
+            future = futures.get(check)
+            results[check.name] = future in done and future.result()
+            if future is not None and not results[check.name]:
+                app.logger.error(f'The {check.name} readiness check failed')
+
+        ready = all(results[check.name] for check in checks if check.critical)
+        return results, ready
+
+    @staticmethod
+    def _probe(app: Flask, check: ReadinessCheck, timeout: float) -> bool:
+        """_probe
+
+        Calls the check's probe within an app context, recording its latency.
+
+        :param app:
+            The Flask app to check.
+        :param check:
+            The readiness check to run.
+        :param timeout:
+            The number of seconds until the deadline.
+        """
+        start = time.perf_counter()
+        try:
+            with app.app_context():
+                return bool(check.probe(timeout))
+        except Exception as ex:
+            app.logger.error(f'The {check.name} readiness check raised an error: {str(ex)}')
+            return False
+        finally:
+            READINESS_CHECK_SECONDS.labels(check.name).observe(time.perf_counter() - start)
+
+
+readiness = ReadinessRegistry()
+
+
+@lru_cache(maxsize=None)
+def _probe_engine(url: URL, connect_timeout: int) -> Engine:
+    """ Returns an engine that opens a new connection for each probe, giving up after `connect_timeout` seconds. """
+    return create_engine(url, poolclass=NullPool, connect_args={'connect_timeout': connect_timeout})
+
+
+@readiness.register('postgres')
+def postgres_ready(timeout: float) -> bool:
+    """postgres_ready
+
+    Returns True if the primary PostgreSQL server is available. Uses a new connection of its own
+    rather than one from the pool, which may be exhausted or stale, and gives up on connecting and
+    on the query at the deadline.
+
+    :param timeout:
+        The number of seconds until the deadline.
+    """
+    # libpq does not wait less than 2 seconds for a connection.
+    with _probe_engine(db.engine.url, max(2, math.ceil(timeout))).begin() as connection:
+        connection.execute(text(f'SET LOCAL statement_timeout = {max(1, int(timeout * 1000))}'))
+        return connection.execute(text('SELECT 1')).scalar() == 1
+
+
+@readiness.register('cache')
+def cache_ready(timeout: float) -> bool:
+    """cache_ready
+
+    Returns True if the cache backend can be written to and read from. The cache client's own
+    socket timeouts bound the probe (for Redis, the `socket_timeout` and `socket_connect_timeout`
+    parameters of `CACHE_REDIS_URL`), as they do every other use of the cache.
+
+    :param timeout:
+        The number of seconds until the deadline.
+    """
+    cache.set(_CACHE_PROBE_KEY, 1, timeout=60)
+    return cache.get(_CACHE_PROBE_KEY) == 1
+
+
+@readiness.register('replicas', critical=False, enabled=db.has_replicas)
+def replicas_ready(timeout: float) -> bool:
+    """replicas_ready
+
+    Returns True if any read replica is available. Reads fall back to the primary when no replica
+    is available, so this check does not affect the readiness of the service.
+
+    :param timeout:
+        The number of seconds until the deadline.
+    """
+    return any(db.get_replicas().check().values())
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+""" HTTP response caching and conditional requests for read endpoints.
+
+The `response_cache.cached` decorator caches the serialized response of a `GET` handler in the
+application cache, keyed by the request path, its query string and an auth scope (by default, the
+`Authorization` header of the request). Every response it returns carries a strong `ETag` derived
+from the response body, a `Last-Modified` date if the handler's `last_modified` function returns
+one, and `Cache-Control: no-cache`, so that clients revalidate each time.
+
+A request whose `If-None-Match` (or `If-Modified-Since`) matches the cached response is answered
+with a `304 Not Modified` without calling the handler, so without querying or serializing anything.
+
+Usage:
+
+.. code-block:: python
+
+    @response_cache.cached(tags=[Widget])
+    def get_widgets(limit, cursor=None):
+        ...
+
+    @response_cache.cached(tags=lambda uuid: [Widget.response_tag(uuid)])
+    def get_widget(uuid):
+        ...
+
+Cached responses are invalidated by tag. `Model.save`, `Model.delete` and the bulk helpers
+invalidate the model's tag (`Widget` or `Widget.response_tag()`) and the tags of the records they
+change (`Widget.response_tag(uuid)`) once their transaction commits. Each tag has a version in the
+cache, and a cached response is only used if the versions of its tags have not changed since it
+was stored, so invalidating a tag costs a single cache write however many responses it covers.
+
+The tag versions are only visible to the other workers through a shared cache, so the response
+cache refuses to be enabled with a per-process backend (`simple`, or a `TieredCache` in front of
+one). With a `TieredCache`, the tag versions are read through its local tier, so the other workers
+may return a response from before a write for up to `CACHE_LOCAL_TTL` seconds.
+"""
+
+import hashlib
+
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Optional, Union
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from flask import Flask, Response, current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .cache_backends import DEFAULT_SHARED_TYPE
+from .extensions import cache, json
+from .metrics import RESPONSE_CACHE_LOOKUPS, RESPONSE_NOT_MODIFIED
+
+##
+#: The `_PENDING_TAGS_KEY` is the key of the session `info` dictionary that
+#: holds the tags to invalidate when the session's transaction commits.
+#:
+_PENDING_TAGS_KEY = 'response_cache_pending_tags'
+
+##
+#: The `_UNCACHED_HEADERS` are the response headers that are not stored with a
+#: cached response, as they are set again when it is returned.
+#:
+_UNCACHED_HEADERS = ('content-type', 'content-length', 'etag', 'last-modified', 'cache-control', 'vary')
+
+##
+#: The `_PER_PROCESS_BACKENDS` are the cache backends whose entries are only
+#: visible to the worker that wrote them, by the last part of their name in
+#: lowercase.
+#:
+_PER_PROCESS_BACKENDS = ('simple', 'simplecache', 'lrucache')
+
+Tags = Union[Iterable[Any], Callable[..., Iterable[Any]]]
+
+
+def _tag_name(tag: Any) -> str:
+    """ Returns the name of a tag given as a string or as a model class. """
+    return tag if isinstance(tag, str) else tag.response_tag()
+
+
+def _tag_key(tag: Any) -> str:
+    """ Returns the cache key holding the version of a tag. """
+    return f'response_tag.{_tag_name(tag)}'
+
+
+def _is_per_process(cache_type: str) -> bool:
+    """ Returns True if a `CACHE_TYPE` names a backend whose entries are only visible to one worker. """
+    return cache_type.rsplit('.', 1)[-1].lower() in _PER_PROCESS_BACKENDS
+
+
+def _default_scope() -> str:
+    """ Returns the auth scope of a request: a digest of its `Authorization` header. """
+    authorization = request.headers.get('Authorization')
+    return hashlib.sha256(authorization.encode('utf-8')).hexdigest() if authorization else ''
+
+
+class ResponseCache:
+    """ResponseCache
+
+    Caches the serialized responses of read endpoints, answers conditional requests, and invalidates
+    cached responses by tag.
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.timeout = 60
+
+    def init_app(self, app: Flask) -> None:
+        """init_app
+
+        Configures the cache from the app, and starts invalidating the tags of committed writes.
+
+        :param app:
+            The Flask app from which to pull configuration.
+        :raises:
+            ValueError
+        """
+        self.enabled = app.config.get('RESPONSE_CACHE_ENABLED', False)
+        self.timeout = app.config.get('RESPONSE_CACHE_TTL', 60)
+
+        cache_type = app.config.get('CACHE_TYPE', 'null')
+        if cache_type.rsplit('.', 1)[-1].lower() == 'tieredcache':
+            cache_type = app.config.get('CACHE_SHARED_TYPE', DEFAULT_SHARED_TYPE)
+        if self.enabled and _is_per_process(cache_type):
+            raise ValueError(f'RESPONSE_CACHE_ENABLED requires a cache shared by the workers, not {cache_type}, '
+                             f'as the invalidations of one worker would not reach the others.')
+
+        if not event.contains(Session, 'after_commit', self._after_commit):
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+
+    def cached(self, tags: Tags=(), timeout: Optional[int]=None, scope: Optional[Callable[[], str]]=None,
+               last_modified: Optional[Callable[..., Any]]=None) -> Callable:
+        """cached
+
+        Returns a decorator that caches the responses of a handler, and answers conditional
+        requests. Only `GET` (and `HEAD`) requests are cached, and only responses with a 200 status
+        are stored. Streamed responses are returned as is.
+
+        :param tags:
+            The tags (strings or model classes) to invalidate the responses by, or a function that
+            is called with the handler's keyword arguments and returns them.
+        :param timeout:
+            The number of seconds for which a response is cached. Defaults to `RESPONSE_CACHE_TTL`.
+        :param scope:
+            A function returning the auth scope of the request, which is part of the cache key.
+            Defaults to a digest of the `Authorization` header.
+        :param last_modified:
+            A function that is called with the handler's keyword arguments when a response is not
+            cached, and returns the `Last-Modified` datetime of the response (e.g. the maximum
+            `updated_at` of the records it contains), or None.
+        """
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if request.method not in ('GET', 'HEAD'):
+                    return func(*args, **kwargs)
+
+                key = self._key(scope or _default_scope)
+                tag_keys = [_tag_key(tag) for tag in (tags(**kwargs) if callable(tags) else tags)]
+                versions: Dict[str, Any] = {}
+                if self.enabled:
+                    values = cache.get_many(key, *tag_keys)
+                    entry, versions = values[0], dict(zip(tag_keys, values[1:]))
+                    if entry is not None and None not in versions.values() and entry['tags'] == versions:
+                        RESPONSE_CACHE_LOOKUPS.labels('hit').inc()
+                        return self._respond(entry)
+                    RESPONSE_CACHE_LOOKUPS.labels('miss').inc()
+                    # The versions are read before the handler runs, so that a write committed
+                    # while it runs invalidates the response it returns.
+                    versions = self._current_versions(versions)
+
+                response = self._to_response(func(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed or response.direct_passthrough:
+                    return response
+
+                entry = {
+                    'body': response.get_data(),
+                    'status': response.status_code,
+                    'mimetype': response.mimetype,
+                    'headers': [(k, v) for k, v in response.headers if k.lower() not in _UNCACHED_HEADERS],
+                    'etag': hashlib.sha256(response.get_data()).hexdigest()[:32],
+                    'last_modified': last_modified(**kwargs) if last_modified else None,
+                    'tags': versions,
+                }
+                if self.enabled:
+                    cache.set(key, entry, timeout=timeout or self.timeout)
+                return self._respond(entry)
+            return wrapper
+        return decorator
+
+    def invalidate(self, *tags: Any) -> None:
+        """invalidate
+
+        Invalidates the cached responses with any of the given tags.
+
+        :param tags:
+            The tags (strings or model classes) to invalidate.
+        """
+        if self.enabled and tags:
+            cache.set_many({_tag_key(tag): uuid4().hex for tag in tags}, timeout=0)
+
+    def invalidate_on_commit(self, session: Session, *tags: Any) -> None:
+        """invalidate_on_commit
+
+        Invalidates the cached responses with any of the given tags when the session's transaction
+        commits. Nothing is invalidated if it is rolled back.
+
+        :param session:
+            The session whose transaction changes the tagged data.
+        :param tags:
+            The tags (strings or model classes) to invalidate.
+        """
+        if self.enabled and tags:
+            session.info.setdefault(_PENDING_TAGS_KEY, set()).update(_tag_name(tag) for tag in tags)
+
+    def _after_commit(self, session: Session) -> None:
+        """ Invalidates the tags of the writes of a committed transaction. """
+        tags = session.info.pop(_PENDING_TAGS_KEY, None) if self.enabled else None
+        if tags:
+            self.invalidate(*tags)
+
+    def _after_rollback(self, session: Session) -> None:
+        """ Forgets the tags of the writes of a rolled back transaction. """
+        if self.enabled:
+            session.info.pop(_PENDING_TAGS_KEY, None)
+
+    def _key(self, scope: Callable[[], str]) -> str:
+        """ Returns the cache key of the response to the current request. """
+        query = urlencode(sorted(request.args.items(multi=True)))
+        digest = hashlib.sha1(f'{request.path}?{query}|{scope()}'.encode('utf-8')).hexdigest()
+        return f'response.{digest}'
+
+    def _current_versions(self, versions: Dict[str, Any]) -> Dict[str, Any]:
+        """_current_versions
+
+        Returns the given versions of tags, with a new version created for each tag that has none.
+
+        :param versions:
+            The versions of tags, by cache key, as read from the cache.
+        """
+        for key in [key for key, version in versions.items() if version is None]:
+            version = uuid4().hex
+            versions[key] = version if cache.add(key, version, timeout=0) else cache.get(key)
+        return versions
+
+    def _to_response(self, result: Any) -> Response:
+        """_to_response
+
+        Returns the response for the value returned by a handler: a response object, a body, or a
+        tuple of a body with a status, headers, or both, as `flask.Flask.make_response` accepts.
+
+        :param result:
+            The value returned by the handler.
+        """
+        if isinstance(result, Response):
+            return result
+        body, status, headers = result, None, None
+        if isinstance(result, tuple):
+            if len(result) == 3:
+                body, status, headers = result
+            elif len(result) == 2 and isinstance(result[1], (dict, list)):
+                body, headers = result
+            else:
+                body, status = result
+        response = json.response(body, status or 200)
+        response.headers.extend(headers or {})
+        return response
+
+    def _respond(self, entry: Dict[str, Any]) -> Response:
+        """_respond
+
+        Returns the response for a cached entry, or a `304 Not Modified` if the request's
+        conditional headers match it.
+
+        :param entry:
+            The cached response.
+        """
+        response = current_app.response_class(
+            entry['body'], status=entry['status'], mimetype=entry['mimetype'], headers=entry['headers'])
+        response.set_etag(entry['etag'])
+        if entry['last_modified'] is not None:
+            response.last_modified = entry['last_modified']
+        response.cache_control.no_cache = True
+        response.vary.add('Authorization')
+
+        response.make_conditional(request)
+        if response.status_code == 304:
+            RESPONSE_NOT_MODIFIED.inc()
+        return response
+
+
+response_cache = ResponseCache()
@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 """ Serializer module for marshalling API responses. """
 
+from datetime import date, datetime, time
+from enum import Enum
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+from uuid import UUID
+
 from marshmallow_enum import EnumField  # noqa
+from sqlalchemy.engine import Row
 
 from .extensions import marshmallow as ma
+from .instrumentation.timing import timed_serialization
 
 
 class Serializer(ma.Schema):
@@ -11,12 +19,209 @@ class Serializer(ma.Schema):
     class Meta:
         strict = True
 
+    dump = timed_serialization(ma.Schema.dump)
+
 
-class ModelSerializer(ma.ModelSchema):
+class ModelSerializer(ma.SQLAlchemyAutoSchema):
     """ A base serializer for model entities. """
     class Meta:
         strict = True
+        include_relationships = True
+        load_instance = True
 
     uuid = ma.String()
     created_at = ma.DateTime()
     updated_at = ma.DateTime()
+
+    dump = timed_serialization(ma.SQLAlchemyAutoSchema.dump)
+
+
+def _to_json_ready(value: Any) -> Any:
+    """_to_json_ready
+
+    Converts a column value that is not natively representable in JSON (e.g. a datetime or UUID)
+    into one that is.
+
+    :param value:
+        The value to convert.
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+class ModelDumper:
+    """ModelDumper
+
+    A fast-path serializer for a model, compiled once from its mapper. Converts records (or `Row`
+    tuples from column-only queries) into JSON-ready dicts, with datetimes rendered as ISO 8601
+    strings, UUIDs as strings and enums by value.
+
+    Unlike a `ModelSerializer`, a dumper emits relationships only when they are named in `fields`,
+    does not validate, and does all of its per-record work in a single generated function, which
+    makes it suitable for large lists. Use `Model.dumper()` to get the cached dumper for a model
+    rather than creating one directly.
+    """
+
+    ##
+    #: The `JSON_NATIVE_TYPES` are the column Python types whose values are
+    #: emitted without conversion.
+    #:
+    JSON_NATIVE_TYPES = (str, int, float, bool, dict, list)
+
+    def __init__(self, model: Any, fields: Optional[Sequence[str]]=None, exclude: Sequence[str]=('id',)) -> None:
+        """__init__
+
+        Compiles the dumper for the given model.
+
+        :param model:
+            The mapped model class.
+        :param fields:
+            The names of the columns and relationships to emit. Defaults to every column, without
+            relationships. Unknown names are ignored, and fields are always emitted in mapper
+            order, columns first. Related records are emitted with every column of their model.
+        :param exclude:
+            The names of the columns to omit. Defaults to the internal `id`.
+        """
+        columns = model.__mapper__.column_attrs
+        relationships = model.__mapper__.relationships
+        self.fields: Tuple[str, ...] = tuple(
+            key for key in columns.keys() if (fields is None or key in fields) and key not in exclude
+        ) + tuple(key for key in relationships.keys() if fields is not None and key in fields)
+        self._converters = {
+            key: self._relationship_converter(relationships[key]) if key in relationships
+            else self._converter(columns[key].columns[0].type)
+            for key in self.fields
+        }
+        self._dump, self._dump_many = self._compile(self.fields, attrgetter)
+        self._row_dumpers: Dict[Tuple[str, ...], Tuple[Callable, Callable]] = {}
+
+    @timed_serialization
+    def dump(self, record: Any, many: bool=False) -> Union[dict, List[dict]]:
+        """dump
+
+        Returns a JSON-ready dict for a single record or `Row`. Accepts `many` for compatibility
+        with marshmallow schemas, so that a dumper can be used wherever a serializer is expected.
+
+        :param record:
+            The record to dump, or an iterable of records if `many` is True.
+        :param many:
+            If True, dumps an iterable of records with `dump_many`.
+        """
+        if many:
+            return self.dump_many(record)
+        if isinstance(record, Row):
+            return self._for_row(record)[0](record)
+        return self._dump(record)
+
+    @timed_serialization
+    def dump_many(self, records: Iterable[Any]) -> List[dict]:
+        """dump_many
+
+        Returns a list of JSON-ready dicts for the given records or `Row` tuples. The records are
+        expected to be homogeneous: either all model instances, or all rows of the same query.
+
+        :param records:
+            The records to dump.
+        """
+        records = records if isinstance(records, (list, tuple)) else list(records)
+        if records and isinstance(records[0], Row):
+            return self._for_row(records[0])[1](records)
+        return self._dump_many(records)
+
+    def _for_row(self, row: Row) -> Tuple[Callable, Callable]:
+        """_for_row
+
+        Returns the dump functions compiled for rows with the same keys as `row`. Only the fields
+        of the dumper that are present in the row are emitted.
+
+        :param row:
+            A row from a column-only query.
+        """
+        keys = tuple(row._fields)
+        if keys not in self._row_dumpers:
+            positions = {key: index for index, key in enumerate(keys)}
+            fields = tuple(field for field in self.fields if field in positions)
+            self._row_dumpers[keys] = self._compile(
+                fields, lambda *names: itemgetter(*(positions[name] for name in names)))
+        return self._row_dumpers[keys]
+
+    def _compile(self, fields: Tuple[str, ...], getter_factory: Callable[..., Callable]) -> Tuple[Callable, Callable]:
+        """_compile
+
+        Generates the single-record and many-record dump functions for `fields`, using a getter
+        built by `getter_factory` to extract all of the field values from a record in one call.
+
+        :param fields:
+            The names of the fields to emit.
+        :param getter_factory:
+            Either `attrgetter` (for model instances) or a factory returning an `itemgetter` (for
+            rows), called with the field names.
+        """
+        if not fields:
+            return (lambda record: {}), (lambda records: [{} for _ in records])
+
+        names = [f'v{index}' for index in range(len(fields))]
+        items = []
+        namespace = {'_get': getter_factory(*fields)}
+        for name, field in zip(names, fields):
+            converter = self._converters[field]
+            if converter is None:
+                items.append(f'{field!r}: {name}')
+            else:
+                namespace[f'_{name}'] = converter
+                items.append(f'{field!r}: None if {name} is None else _{name}({name})')
+
+        values = ', '.join(names) + (',' if len(names) == 1 else '')
+        body = '{' + ', '.join(items) + '}'
+        source = (
+            f'def dump(record):\n'
+            f'    {values} = {"(_get(record),)" if len(names) == 1 else "_get(record)"}\n'
+            f'    return {body}\n'
+            f'def dump_many(records):\n'
+            f'    return [{body} for {values} in '
+            f'{"((_get(r),) for r in records)" if len(names) == 1 else "map(_get, records)"}]\n'
+        )
+        exec(compile(source, f'<ModelDumper {", ".join(fields)}>', 'exec'), namespace)
+        return namespace['dump'], namespace['dump_many']
+
+    @classmethod
+    def _relationship_converter(cls, relationship: Any) -> Callable[[Any], Any]:
+        """_relationship_converter
+
+        Returns the function used to convert the related record (or collection of records) of the
+        given relationship into a JSON-ready dict (or list of dicts).
+
+        :param relationship:
+            The relationship property of the mapper.
+        """
+        dumper = cls(relationship.mapper.class_)
+        return dumper.dump_many if relationship.uselist else dumper.dump
+
+    @classmethod
+    def _converter(cls, column_type: Any) -> Optional[Callable[[Any], Any]]:
+        """_converter
+
+        Returns the function used to convert values of the given column type into JSON-ready
+        values, or None if they need no conversion.
+
+        :param column_type:
+            The SQLAlchemy type of the column.
+        """
+        if hasattr(column_type, 'as_uuid'):
+            return str if column_type.as_uuid else None
+
+        try:
+            python_type = column_type.python_type
+        except NotImplementedError:
+            return _to_json_ready
+
+        if issubclass(python_type, (datetime, date, time)):
+            return python_type.isoformat
+        if issubclass(python_type, cls.JSON_NATIVE_TYPES):
+            return None
+        return _to_json_ready
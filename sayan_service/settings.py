@@ -85,6 +85,85 @@ class Config(object):
     #:
     LOG_PRETTY: bool = config('LOG_PRETTY', False, cast=bool)
 
+    ##
+    #: The `LOG_ASYNC` flag moves the rendering and writing of log messages
+    #: off the request thread. Log records are put on a bounded queue and
+    #: written to stdout in batches by a background thread, which is flushed
+    #: when the worker exits.
+    #:
+    #: Default: `False`
+    #:
+    LOG_ASYNC: bool = config('LOG_ASYNC', False, cast=bool)
+
+    ##
+    #: The `LOG_QUEUE_SIZE` is the maximum number of log messages waiting to
+    #: be written when `LOG_ASYNC` is set.
+    #:
+    #: Default: `10000`
+    #:
+    LOG_QUEUE_SIZE: int = config('LOG_QUEUE_SIZE', 10000, cast=int)
+
+    ##
+    #: The `LOG_QUEUE_POLICY` specifies what happens to a log message when the
+    #: queue is full.
+    #:
+    #: Possible values are:
+    #:
+    #:   - `drop`: the message is discarded, and counted by the
+    #:     `sayan_service_log_messages_dropped_total` metric
+    #:   - `block`: the caller waits until there is room on the queue. Under
+    #:     gevent, this relies on the listener having been started after the
+    #:     worker was monkeypatched, by the `post_worker_init` hook of
+    #:     `gunicorn_config.py`; otherwise a waiting caller blocks the worker.
+    #:
+    #: Default: `drop`
+    #:
+    LOG_QUEUE_POLICY: str = config('LOG_QUEUE_POLICY', 'drop')
+
+    ##
+    #: The `LOG_BATCH_SIZE` is the maximum number of log messages written to
+    #: stdout at once when `LOG_ASYNC` is set.
+    #:
+    #: Default: `256`
+    #:
+    LOG_BATCH_SIZE: int = config('LOG_BATCH_SIZE', 256, cast=int)
+
+    ##
+    #: The `LOG_SKIP_RECORD_METADATA` flag stops the logging module from
+    #: collecting the caller (file, line and function), thread and process of
+    #: every log record. Finding the caller walks the stack, and is the most
+    #: expensive part of an enabled log call, while the messages rendered by
+    #: structlog never include these fields.
+    #:
+    #: The setting applies to the whole process: handlers and formatters added
+    #: by other libraries (e.g. an error reporting integration) then see
+    #: `(unknown file)` and `None` in place of the caller, thread and process
+    #: of their records.
+    #:
+    #: Default: `False`
+    #:
+    LOG_SKIP_RECORD_METADATA: bool = config('LOG_SKIP_RECORD_METADATA', False, cast=bool)
+
+    ##
+    #: The `ACCESS_LOG_SAMPLE_RATE` is the fraction of requests recorded in the
+    #: access log, between `0` and `1`. Requests that fail with a 5xx status or
+    #: take longer than `ACCESS_LOG_SLOW_THRESHOLD` are always recorded.
+    #:
+    #: Each access log entry includes the `sample_rate` it was recorded at, so
+    #: that request counts can be estimated from sampled entries.
+    #:
+    #: Default: `0.01`
+    #:
+    ACCESS_LOG_SAMPLE_RATE: float = config('ACCESS_LOG_SAMPLE_RATE', 0.01, cast=float)
+
+    ##
+    #: The `ACCESS_LOG_SLOW_THRESHOLD` is the duration, in seconds, above which
+    #: a request is always recorded in the access log.
+    #:
+    #: Default: `1`
+    #:
+    ACCESS_LOG_SLOW_THRESHOLD: float = config('ACCESS_LOG_SLOW_THRESHOLD', 1, cast=float)
+
     ##
     #: The `SECRET_KEY` is used for signing and encryption. It should be
     #: randomly generated and appropriately secured.
@@ -94,12 +173,23 @@ class Config(object):
     ##
     #: The `BCRYPT_LOG_ROUNDS` value configures the `rounds` parameter of
     #: `bcrypt.gensalt()` which determines the complexity of the generated
-    #: salt.
+    #: salt. Changing it only applies to new hashes, but existing hashes are
+    #: upgraded as their users log in with `passwords.verify_and_update`.
     #:
     #: Default: `13`
     #:
     BCRYPT_LOG_ROUNDS: int = config('BCRYPT_LOG_ROUNDS', 13, cast=int)
 
+    ##
+    #: The `BCRYPT_POOL_SIZE` is the number of native threads of each worker
+    #: that hash and verify passwords, so that they do not block the gevent
+    #: event loop. It bounds the CPU that a burst of logins can take from the
+    #: other requests of a worker. See :mod:`sayan_service.passwords`.
+    #:
+    #: Default: `2`
+    #:
+    BCRYPT_POOL_SIZE: int = config('BCRYPT_POOL_SIZE', 2, cast=int)
+
     ##
     #: The `SQLALCHEMY_DATABASE_URI` is an RFC-1738 URI used to create an
     #: SQLAlchemy connection to a database.
@@ -139,6 +229,175 @@ class Config(object):
     #:
     SQLALCHEMY_ECHO: bool = config('SQLALCHEMY_ECHO', False, cast=bool)
 
+    ##
+    #: The `SQLALCHEMY_ENGINE_OPTIONS` are passed to `sqlalchemy.create_engine()`
+    #: and configure the connection pool of each application worker. Each
+    #: option is set by its own environment variable:
+    #:
+    #:   - `DATABASE_POOL_SIZE`: The number of connections kept open in the
+    #:     pool. Default: `10`
+    #:   - `DATABASE_MAX_OVERFLOW`: The number of connections that may be opened
+    #:     beyond the pool size under load. Default: `10`
+    #:   - `DATABASE_POOL_TIMEOUT`: The number of seconds to wait for a
+    #:     connection before giving up. Default: `10`
+    #:   - `DATABASE_POOL_RECYCLE`: The maximum age of a connection, in seconds,
+    #:     before it is replaced. Default: `1800`
+    #:   - `DATABASE_POOL_PRE_PING`: If enabled, tests each connection with a
+    #:     lightweight query when it is checked out, replacing it if it has gone
+    #:     stale. Default: `True`
+    #:
+    #: Under gevent workers, many concurrent requests share one worker's pool,
+    #: so the pool size and overflow bound the number of requests that can
+    #: use the database at once. The pool metrics exported by
+    #: :mod:`sayan_service.instrumentation.pool` can be used to size them.
+    #:
+    #: More configuration information can be found at:
+    #:   https://docs.sqlalchemy.org/en/14/core/pooling.html
+    #:
+    SQLALCHEMY_ENGINE_OPTIONS: dict = {
+        'pool_size': config('DATABASE_POOL_SIZE', 10, cast=int),
+        'max_overflow': config('DATABASE_MAX_OVERFLOW', 10, cast=int),
+        'pool_timeout': config('DATABASE_POOL_TIMEOUT', 10, cast=int),
+        'pool_recycle': config('DATABASE_POOL_RECYCLE', 1800, cast=int),
+        'pool_pre_ping': config('DATABASE_POOL_PRE_PING', True, cast=bool),
+    }
+
+    ##
+    #: The `SQLALCHEMY_PREPARED_STATEMENTS` flag enables server-side prepared
+    #: statements for the standard lookups of the base model (`get_by_id`,
+    #: `get_by_uuid`, etc.) on psycopg2 connections. Each is prepared once per
+    #: connection, and executed without being parsed or planned again.
+    #:
+    #: Must be disabled when connecting through PgBouncer in transaction or
+    #: statement pooling mode. See :mod:`sayan_service.prepared_statements`.
+    #:
+    #: Default: `False`
+    #:
+    SQLALCHEMY_PREPARED_STATEMENTS: bool = config('DATABASE_PREPARED_STATEMENTS', False, cast=bool)
+
+    ##
+    #: The `SQLALCHEMY_LAZY_LOAD_THRESHOLD` is the number of lazy relationship
+    #: loads allowed in a single request, above which the request is reported
+    #: as an N+1 query problem according to `SQLALCHEMY_LAZY_LOAD_ACTION`. Set
+    #: to `0` to disable lazy load counting. See
+    #: :mod:`sayan_service.instrumentation.lazy_loads`.
+    #:
+    #: Default: `0`
+    #:
+    SQLALCHEMY_LAZY_LOAD_THRESHOLD: int = config('SQLALCHEMY_LAZY_LOAD_THRESHOLD', 0, cast=int)
+
+    ##
+    #: The `SQLALCHEMY_LAZY_LOAD_ACTION` determines how a request that exceeds
+    #: the `SQLALCHEMY_LAZY_LOAD_THRESHOLD` is reported: `warn` logs a warning,
+    #: and `raise` fails the request with a `LazyLoadError`, which is meant for
+    #: development and tests.
+    #:
+    #: Default: `warn`
+    #:
+    SQLALCHEMY_LAZY_LOAD_ACTION: str = config('SQLALCHEMY_LAZY_LOAD_ACTION', 'warn')
+
+    ##
+    #: The `SLOW_QUERY_THRESHOLD` is the duration, in seconds, above which a
+    #: statement is logged as a slow query, with its normalized SQL, parameter
+    #: types, duration and the operation that executed it. Repeated slow
+    #: executions of a statement are logged at most once per
+    #: `SLOW_QUERY_LOG_INTERVAL` seconds, with a count of occurrences. Set to
+    #: `0` to disable the slow query log.
+    #:
+    #: See :mod:`sayan_service.instrumentation.slow_queries`.
+    #:
+    #: Default: `0.5`
+    #:
+    SLOW_QUERY_THRESHOLD: float = config('SLOW_QUERY_THRESHOLD', 0.5, cast=float)
+
+    ##
+    #: The `SLOW_QUERY_LOG_INTERVAL` is the minimum number of seconds between
+    #: log messages for the same slow statement.
+    #:
+    #: Default: `60`
+    #:
+    SLOW_QUERY_LOG_INTERVAL: float = config('SLOW_QUERY_LOG_INTERVAL', 60, cast=float)
+
+    ##
+    #: The `SLOW_QUERY_EXPLAIN_SAMPLE_RATE` is the fraction of logged slow
+    #: `SELECT` statements whose `EXPLAIN (ANALYZE, BUFFERS)` plan is captured
+    #: in the background and logged, between `0` and `1`. As `ANALYZE` runs
+    #: the statement again, this adds load to the database.
+    #:
+    #: Default: `0`
+    #:
+    SLOW_QUERY_EXPLAIN_SAMPLE_RATE: float = config('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0, cast=float)
+
+    ##
+    #: The `SLOW_QUERY_EXPLAIN_TIMEOUT` is the statement timeout, in seconds,
+    #: of each captured `EXPLAIN`.
+    #:
+    #: Default: `10`
+    #:
+    SLOW_QUERY_EXPLAIN_TIMEOUT: float = config('SLOW_QUERY_EXPLAIN_TIMEOUT', 10, cast=float)
+
+    ##
+    #: The `SQLALCHEMY_REPLICA_URIS` are the URIs of read replicas of the
+    #: primary database, as a comma-separated list. When set, reads that are
+    #: not part of a write (e.g. `Model.get_by_id` and list queries) are
+    #: routed to a replica, while writes, and every statement of a request
+    #: after it has written, are routed to the primary.
+    #:
+    #: Reads from a replica may be stale by up to `SQLALCHEMY_REPLICA_MAX_LAG`
+    #: seconds, including records loaded into the entity cache. Call
+    #: `db.use_primary()` before reads that must see writes made by a previous
+    #: request.
+    #:
+    #: Default: `[]` (every statement is routed to the primary)
+    #:
+    SQLALCHEMY_REPLICA_URIS: List[str] = config('DATABASE_REPLICA_URIS', '', cast=Csv())
+
+    ##
+    #: The `SQLALCHEMY_REPLICA_STRATEGY` selects the replica that each request
+    #: reads from.
+    #:
+    #: Possible values are:
+    #:
+    #:   - `round_robin`: each healthy replica in turn
+    #:   - `least_connections`: the healthy replica with the fewest connections
+    #:     checked out of this worker's pool
+    #:
+    #: Default: `round_robin`
+    #:
+    SQLALCHEMY_REPLICA_STRATEGY: str = config('DATABASE_REPLICA_STRATEGY', 'round_robin')
+
+    ##
+    #: The `SQLALCHEMY_REPLICA_MAX_LAG` is the maximum replication lag, in
+    #: seconds, of a replica that reads are routed to. If every replica is
+    #: lagging or unavailable, reads are routed to the primary.
+    #:
+    #: Default: `10`
+    #:
+    SQLALCHEMY_REPLICA_MAX_LAG: float = config('DATABASE_REPLICA_MAX_LAG', 10, cast=float)
+
+    ##
+    #: The `SQLALCHEMY_REPLICA_CHECK_INTERVAL` is the number of seconds between
+    #: checks of the availability and replication lag of each replica, which
+    #: run in the background of each worker. Reads are routed to the primary
+    #: until a worker's first check has completed. A replica whose connection
+    #: is lost is taken out of rotation immediately, until it passes the next
+    #: check.
+    #:
+    #: Default: `5`
+    #:
+    SQLALCHEMY_REPLICA_CHECK_INTERVAL: float = config('DATABASE_REPLICA_CHECK_INTERVAL', 5, cast=float)
+
+    ##
+    #: The `SQLALCHEMY_REPLICA_CONNECT_TIMEOUT` is the number of seconds after
+    #: which connecting to a replica gives up, so that an unreachable replica
+    #: fails its check quickly rather than holding the checking thread (or,
+    #: under gevent, the worker) for the operating system's TCP timeout.
+    #: PostgreSQL does not wait less than `2` seconds.
+    #:
+    #: Default: `2`
+    #:
+    SQLALCHEMY_REPLICA_CONNECT_TIMEOUT: int = config('DATABASE_REPLICA_CONNECT_TIMEOUT', 2, cast=int)
+
     ##
     #: The `CACHE_TYPE` specifies the driver to use for the `Flask-Cache`
     #: extension.
@@ -146,10 +405,53 @@ class Config(object):
     #: Supported drivers and more infomation available at:
     #:   https://pythonhosted.org/Flask-Cache/#configuring-flask-cache
     #:
+    #: Set it to `sayan_service.cache_backends.TieredCache` to layer a bounded
+    #: in-process cache in front of the shared `CACHE_SHARED_TYPE` backend.
+    #:
     #: Default: `simple`
     #:
     CACHE_TYPE: str = config('CACHE_TYPE', 'simple')
 
+    ##
+    #: The `CACHE_SHARED_TYPE` is the backend behind the in-process tier of the
+    #: `TieredCache` backend, configured by the other `CACHE_` settings.
+    #:
+    #: Default: `flask_caching.backends.RedisCache`
+    #:
+    CACHE_SHARED_TYPE: str = config('CACHE_SHARED_TYPE', 'flask_caching.backends.RedisCache')
+
+    ##
+    #: The `CACHE_REDIS_URL` is the URL of the Redis server of the
+    #: `RedisCache` backend, e.g. `redis://redis:6379/0`.
+    #:
+    #: The Redis client waits indefinitely for an unresponsive server unless
+    #: the URL sets its socket timeouts, in seconds, e.g.
+    #: `redis://redis:6379/0?socket_timeout=1&socket_connect_timeout=1`. They
+    #: also bound the cache readiness check.
+    #:
+    #: Default: ``
+    #:
+    CACHE_REDIS_URL: str = config('CACHE_REDIS_URL', '')
+
+    ##
+    #: The `CACHE_LOCAL_MAX_BYTES` is the maximum size of the in-process tier
+    #: of the `TieredCache` backend, in bytes, counting keys and pickled
+    #: values. The least recently used values are evicted beyond it.
+    #:
+    #: Default: `67108864` (64 MiB)
+    #:
+    CACHE_LOCAL_MAX_BYTES: int = config('CACHE_LOCAL_MAX_BYTES', 64 * 1024 * 1024, cast=int)
+
+    ##
+    #: The `CACHE_LOCAL_TTL` is the maximum number of seconds for which values
+    #: are kept in the in-process tier of the `TieredCache` backend. Writes do
+    #: not reach the in-process tiers of other workers, so this bounds how long
+    #: they may read a value that was changed or deleted.
+    #:
+    #: Default: `5`
+    #:
+    CACHE_LOCAL_TTL: int = config('CACHE_LOCAL_TTL', 5, cast=int)
+
     ##
     #: The `CACHE_KEY_PREFIX` is used to prevent collisions with other users of
     #: the configured cache. The value of `CACHE_KEY_PREFIX` will be prepended
@@ -159,6 +461,94 @@ class Config(object):
     #:
     CACHE_KEY_PREFIX: str = config('CACHE_KEY_PREFIX', 'sayan_service.')
 
+    ##
+    #: The `RESPONSE_CACHE_ENABLED` flag enables the caching of the responses
+    #: of read endpoints decorated with `response_cache.cached`. When disabled,
+    #: those endpoints still answer conditional requests with a `304`, but
+    #: always call their handler. See :mod:`sayan_service.response_cache`.
+    #:
+    #: It requires a `CACHE_TYPE` shared by the workers (or a `TieredCache` in
+    #: front of one), as a write only invalidates the cached responses of the
+    #: workers that can see it. The app refuses to start with it enabled and a
+    #: per-process backend such as `simple`.
+    #:
+    #: Default: `False`
+    #:
+    RESPONSE_CACHE_ENABLED: bool = config('RESPONSE_CACHE_ENABLED', False, cast=bool)
+
+    ##
+    #: The `RESPONSE_CACHE_TTL` is the default number of seconds for which a
+    #: response is cached. Writes through the base model invalidate cached
+    #: responses when they commit, so this bounds the staleness of responses to
+    #: data changed by other means. How soon the workers see an invalidation
+    #: depends on the `CACHE_TYPE`:
+    #:
+    #:   - a shared backend (e.g. `RedisCache`): as soon as the write commits,
+    #:     in every worker
+    #:   - `TieredCache`: at once in the worker that made the write, and within
+    #:     `CACHE_LOCAL_TTL` seconds in the others, as the invalidations are
+    #:     read through the in-process tier
+    #:
+    #: Default: `60`
+    #:
+    RESPONSE_CACHE_TTL: int = config('RESPONSE_CACHE_TTL', 60, cast=int)
+
+    ##
+    #: The `READINESS_CHECK_TIMEOUT` is the deadline, in seconds, for the
+    #: readiness checks of the service's dependencies, which run concurrently.
+    #: A dependency whose check has not passed by the deadline is reported as
+    #: unavailable.
+    #:
+    #: Default: `2`
+    #:
+    READINESS_CHECK_TIMEOUT: float = config('READINESS_CHECK_TIMEOUT', 2, cast=float)
+
+    ##
+    #: The `READINESS_CACHE_TTL` is the number of seconds that the results of
+    #: the readiness checks are reused for, so that frequent readiness probes
+    #: do not hammer the service's dependencies.
+    #:
+    #: Default: `2`
+    #:
+    READINESS_CACHE_TTL: float = config('READINESS_CACHE_TTL', 2, cast=float)
+
+    ##
+    #: The `METRICS_LATENCY_BUCKETS` are the bucket boundaries, in seconds, of
+    #: the per-operation request, handler, database and serialization time
+    #: histograms, as a comma-separated list.
+    #:
+    #: Default: `0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10`
+    #:
+    METRICS_LATENCY_BUCKETS: List[float] = config(
+        'METRICS_LATENCY_BUCKETS', '0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10', cast=Csv(float))
+
+    ##
+    #: The `METRICS_QUERY_COUNT_BUCKETS` are the bucket boundaries of the
+    #: per-operation histogram of database queries per request, as a
+    #: comma-separated list. A shift towards the upper buckets for an operation
+    #: usually means an N+1 query pattern has been introduced.
+    #:
+    #: Default: `0,1,2,3,5,10,20,50,100`
+    #:
+    METRICS_QUERY_COUNT_BUCKETS: List[float] = config(
+        'METRICS_QUERY_COUNT_BUCKETS', '0,1,2,3,5,10,20,50,100', cast=Csv(float))
+
+    ##
+    #: The `JSON_PROVIDER` selects the library used to encode JSON responses.
+    #:
+    #: Possible values are:
+    #:
+    #:   - `auto`: `orjson` if it is installed, otherwise `stdlib`
+    #:   - `orjson`: the C-accelerated `orjson` package (must be installed)
+    #:   - `stdlib`: the standard library `json` module
+    #:
+    #: Both providers encode `UUID`, `datetime`, `Decimal` and `Enum` values. `Decimal` values are
+    #: encoded as strings (e.g. `"19.99"`), so that they keep their precision.
+    #:
+    #: Default: `auto`
+    #:
+    JSON_PROVIDER: str = config('JSON_PROVIDER', 'auto')
+
     ##
     #: The `CORS_ORIGINS` specifies the origins to allow CORS requests from
     #: when configuring the `Flask-CORS` extension.
@@ -209,3 +599,41 @@ class Config(object):
     #: Default: `False`
     #:
     SWAGGER_UI_ENABLED: bool = config('SWAGGER_UI_ENABLED', False, cast=bool)
+
+    ##
+    #: The `PROFILING_ENABLED` flag registers the admin-only profiling endpoint,
+    #: `GET /admin/profile?seconds=N`, which samples the stacks of the worker
+    #: that serves it, and the per-request `X-Profile` header, which returns a
+    #: deterministic profile of the request instead of its response. Neither is
+    #: part of the public API spec. When disabled, nothing is registered and
+    #: requests are not inspected.
+    #:
+    #: See :mod:`sayan_service.profiling`.
+    #:
+    #: Default: `False`
+    #:
+    PROFILING_ENABLED: bool = config('PROFILING_ENABLED', False, cast=bool)
+
+    ##
+    #: The `PROFILING_TOKEN` is the bearer token required (in the
+    #: `Authorization` header) to use the profiler. It must be set when
+    #: `PROFILING_ENABLED` is set, and should be randomly generated and
+    #: appropriately secured.
+    #:
+    PROFILING_TOKEN: str = config('PROFILING_TOKEN', '')
+
+    ##
+    #: The `PROFILING_MAX_SECONDS` is the longest a sampling profile may run.
+    #:
+    #: Default: `60`
+    #:
+    PROFILING_MAX_SECONDS: float = config('PROFILING_MAX_SECONDS', 60, cast=float)
+
+    ##
+    #: The `PROFILING_SAMPLE_INTERVAL` is the number of seconds between samples
+    #: of the worker's stacks. Shorter intervals give finer profiles at a
+    #: higher cost to the worker while a profile runs.
+    #:
+    #: Default: `0.01`
+    #:
+    PROFILING_SAMPLE_INTERVAL: float = config('PROFILING_SAMPLE_INTERVAL', 0.01, cast=float)
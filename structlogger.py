@@ -1,71 +1,33 @@
 # -*- coding: utf-8 -*-
 """ Utilities for infrastructure components. """
 
-import logging
-import sys
+import os
+import random
 
 import structlog
 
+from sayan_service.extensions.flask_structlog import (  # noqa
+    ROUTE_ENVIRON_KEY,
+    STRUCTLOG_PROCESSORS,
+    configure_structlog,
+)
 from sayan_service.settings import Config
 
-##
-#: We attempt to import the structlog[dev] package (for pretty logging) and set
-#: a flag if it's not available.
-#:
-try:
-    from structlog import dev
-    HAS_STRUCTLOG_DEV = True
-except ImportError:
-    HAS_STRUCTLOG_DEV = False
-
-
-##
-#: The `STRUCTLOG_PROCESSORS` specify the logging middleware used to structure
-#: and format log messages before they're emitted.
-#:
-#: More information on structlog processors can be found at:
-#:   http://www.structlog.org/en/latest/processors.html
-#:
-STRUCTLOG_PROCESSORS = [
-    structlog.stdlib.filter_by_level,
-    structlog.stdlib.add_logger_name,
-    structlog.stdlib.add_log_level,
-    structlog.stdlib.PositionalArgumentsFormatter(),
-    structlog.processors.TimeStamper(fmt='iso'),
-    structlog.processors.StackInfoRenderer(),
-    structlog.processors.format_exc_info,
-    structlog.processors.UnicodeDecoder(),
-]
-
 
 def initialize_structlog():
     """initialize_structlog
 
-    Initializes structlog. Configures pretty logging if enabled.
-
-    :param log_pretty:
-        A flag to control emission of messages as human-readable or machine-parseable.
+    Initializes structlog with the application's logging configuration. Configures pretty logging
+    if enabled.
     """
-    processors = STRUCTLOG_PROCESSORS
-    renderer = structlog.processors.JSONRenderer()
-
-    if Config.LOG_PRETTY:
-        if not HAS_STRUCTLOG_DEV:
-            raise ImportError('The structlog[dev] module is required when LOG_PRETTY=True.')
-        renderer = structlog.dev.ConsoleRenderer()
-
-    processors.append(renderer)
-
-    # Configure the logging module to the most basic implementation possible.
-    logging.basicConfig(level=Config.LOG_LEVEL, stream=sys.stdout, format='%(message)s')
-
-    structlog.configure_once(
-        processors=processors,
-        context_class=structlog.threadlocal.wrap_dict(dict),
-        logger_factory=structlog.stdlib.LoggerFactory(),
-        wrapper_class=structlog.stdlib.BoundLogger,
-        cache_logger_on_first_use=True,
-    )
+    configure_structlog(
+        Config.LOG_LEVEL,
+        pretty=Config.LOG_PRETTY,
+        queued=Config.LOG_ASYNC,
+        queue_size=Config.LOG_QUEUE_SIZE,
+        queue_policy=Config.LOG_QUEUE_POLICY,
+        batch_size=Config.LOG_BATCH_SIZE,
+        skip_metadata=Config.LOG_SKIP_RECORD_METADATA)
 
 
 class GunicornLogger:
@@ -87,10 +49,49 @@ class GunicornLogger:
         initialize_structlog()
 
         self._logger = structlog.get_logger('gunicorn')
+        self._access_logger = structlog.get_logger('gunicorn.access')
+        self._sample_rate = Config.ACCESS_LOG_SAMPLE_RATE
+        self._slow_threshold = Config.ACCESS_LOG_SLOW_THRESHOLD
         self.cfg = cfg
 
     def access(self, resp, req, environ, request_time) -> None:
-        """ A noop implementation of access logging. """
+        """access
+
+        Records a structured access log entry for a request. Every request that fails with a 5xx
+        status or is slower than `ACCESS_LOG_SLOW_THRESHOLD` is recorded, along with a random
+        `ACCESS_LOG_SAMPLE_RATE` fraction of the others.
+
+        :param resp:
+            The gunicorn response.
+        :param req:
+            The gunicorn request.
+        :param environ:
+            The WSGI environ of the request.
+        :param request_time:
+            The duration of the request, as a `timedelta`.
+        """
+        status = getattr(resp, 'status_code', None)
+        if status is None and resp.status:
+            status = int(str(resp.status).split(None, 1)[0])
+        duration = request_time.total_seconds()
+
+        if (status or 0) >= 500 or duration >= self._slow_threshold:
+            sample_rate = 1
+        elif self._sample_rate > 0 and random.random() < self._sample_rate:
+            sample_rate = self._sample_rate
+        else:
+            return
+
+        self._access_logger.info(
+            'request',
+            method=environ.get('REQUEST_METHOD'),
+            route=environ.get(ROUTE_ENVIRON_KEY),
+            status=status,
+            bytes=getattr(resp, 'sent', None),
+            duration=duration,
+            pid=os.getpid(),
+            sample_rate=sample_rate,
+        )
 
     def reopen_files(self) -> None:
         """ A noop implementation of file logging. """
@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks for the application.
+
+Benchmarks are not collected by pytest. Each module is run directly against a disposable database,
+e.g. ``python -m tests.benchmarks.bench_bulk``.
+"""
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+""" Common benchmark implementation. """
+
+import time
+
+from contextlib import contextmanager
+from typing import Iterator
+
+from decouple import config
+from flask import Flask
+
+from sayan_service.app import create_app
+from sayan_service.database import Column, Model, db
+from sayan_service.serializer import ModelSerializer
+from sayan_service.settings import Config
+
+
+class BenchmarkConfig(Config):
+    """BenchmarkConfig
+
+    A configuration object specific to the benchmarking context.
+    """
+
+    # Database connection parameters
+    SQLALCHEMY_DATABASE_URI = config('BENCHMARK_DATABASE_URI', 'postgresql://postgres@postgres:5432/test_sayan_service')  # noqa
+
+
+class BenchmarkRecord(Model):
+    """BenchmarkRecord
+
+    A minimal concrete model used as the subject of benchmarks. Its table is created when a
+    benchmark starts and dropped when it finishes.
+    """
+
+    __tablename__ = 'benchmark_records'
+    __table_args__ = (
+        db.Index('ix_benchmark_records_created_at_id', 'created_at', 'id'),
+        dict(extend_existing=True),
+    )
+
+    name = Column(db.String(64), nullable=False, unique=True)
+    value = Column(db.Integer)
+
+
+class BenchmarkRecordSerializer(ModelSerializer):
+    """ A serializer for the benchmark model. """
+
+    class Meta(ModelSerializer.Meta):
+        model = BenchmarkRecord
+
+
+@contextmanager
+def benchmark_app() -> Iterator[Flask]:
+    """benchmark_app
+
+    Creates the app with the benchmark configuration, pushes an app context and creates the
+    `benchmark_records` table for the duration of the block.
+    """
+    app = create_app(config_object=BenchmarkConfig)
+    with app.app_context():
+        BenchmarkRecord.__table__.drop(db.engine, checkfirst=True)
+        BenchmarkRecord.__table__.create(db.engine)
+        try:
+            yield app
+        finally:
+            db.session.remove()
+            BenchmarkRecord.__table__.drop(db.engine, checkfirst=True)
+
+
+def load(count: int) -> None:
+    """load
+
+    Inserts `count` rows into the `benchmark_records` table with a single statement.
+
+    :param count:
+        The number of rows to insert.
+    """
+    db.session.execute(
+        f"INSERT INTO {BenchmarkRecord.__tablename__} (name, value) "
+        f"SELECT 'record-' || n, n FROM generate_series(1, {count}) AS n;")
+    db.session.commit()
+
+
+def truncate():
+    """truncate
+
+    Removes all rows from the `benchmark_records` table.
+    """
+    db.session.execute(f'TRUNCATE TABLE {BenchmarkRecord.__tablename__} RESTART IDENTITY;')
+    db.session.commit()
+
+
+@contextmanager
+def timed(label: str, count: int, unit: str='rows') -> Iterator[None]:
+    """timed
+
+    Times the enclosed block and prints its total duration and throughput.
+
+    :param label:
+        A label for the measurement.
+    :param count:
+        The number of operations performed in the block.
+    :param unit:
+        The name of the unit of work, used in the output.
+    """
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(f'{label:<40} {count:>10} {unit} in {elapsed:8.3f}s ({count / elapsed:12.1f} {unit}/s)')
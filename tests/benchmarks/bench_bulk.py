@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks per-record `Model.create` against the bulk helpers.
+
+Usage::
+
+    python -m tests.benchmarks.bench_bulk --rows 100000 --batch-size 1000
+"""
+
+import argparse
+
+from .base import BenchmarkRecord, benchmark_app, timed, truncate
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000, help='The number of rows to write.')
+    parser.add_argument('--create-rows', type=int, default=None,
+                        help='The number of rows to write with per-record `create` (defaults to --rows).')
+    parser.add_argument('--batch-size', type=int, default=BenchmarkRecord.__bulk_batch_size__)
+    args = parser.parse_args()
+
+    rows = [{'name': f'record-{i}', 'value': i} for i in range(args.rows)]
+    create_rows = rows[:args.create_rows or args.rows]
+
+    with benchmark_app():
+        with timed('Model.create (per record)', len(create_rows)):
+            for row in create_rows:
+                BenchmarkRecord.create(**row)
+        truncate()
+
+        with timed(f'Model.bulk_create (batch={args.batch_size})', len(rows)):
+            created = BenchmarkRecord.bulk_create(rows, batch_size=args.batch_size)
+
+        updates = [{'uuid': record.uuid, 'value': record.value + 1} for record in created]
+        with timed(f'Model.bulk_update (batch={args.batch_size})', len(updates)):
+            BenchmarkRecord.bulk_update(updates, key='uuid', batch_size=args.batch_size)
+
+        upserts = [{'name': row['name'], 'value': -row['value']} for row in rows]
+        with timed(f'Model.upsert (batch={args.batch_size})', len(upserts)):
+            BenchmarkRecord.upsert(upserts, conflict_on=('name',), batch_size=args.batch_size)
+
+
+if __name__ == '__main__':
+    main()
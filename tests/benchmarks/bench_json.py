@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks the JSON providers on a list-endpoint-shaped payload.
+
+Usage::
+
+    python -m tests.benchmarks.bench_json --items 10000
+"""
+
+import argparse
+
+from datetime import datetime
+from uuid import uuid4
+
+from sayan_service.extensions.flask_json import _HAS_ORJSON, OrjsonJSONProvider, StdlibJSONProvider
+
+from .base import timed
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=10000, help='The number of items in the payload.')
+    parser.add_argument('--repeat', type=int, default=20, help='The number of times to encode the payload.')
+    args = parser.parse_args()
+
+    now = datetime.now()
+    payload = {
+        'items': [
+            {'uuid': uuid4(), 'created_at': now, 'updated_at': now, 'name': f'record-{i}', 'value': i}
+            for i in range(args.items)
+        ],
+    }
+
+    providers = [StdlibJSONProvider()] + ([OrjsonJSONProvider()] if _HAS_ORJSON else [])
+    for provider in providers:
+        with timed(f'{provider.name}.dumps ({args.items} items)', args.repeat, 'payloads'):
+            for _ in range(args.repeat):
+                provider.dumps(payload)
+
+
+if __name__ == '__main__':
+    main()
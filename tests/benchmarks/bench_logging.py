@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks request throughput with synchronous and queue-backed logging, at INFO and DEBUG.
+
+Each request logs one INFO and four DEBUG events, and log messages are written to a temporary file.
+Each run is repeated with a delay added to every write, to simulate a slow log sink (e.g. a stdout
+pipe to a log collector that is falling behind).
+
+Usage::
+
+    python -m tests.benchmarks.bench_logging --requests 5000 --write-latency 0.0005
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+
+import structlog
+
+from flask import Flask
+
+from sayan_service import async_logging
+from sayan_service.extensions.flask_structlog import STRUCTLOG_PROCESSORS, LevelFilteringBoundLogger, create_renderer
+
+from .base import timed
+
+
+class SlowStream:
+    """SlowStream
+
+    A stream that waits before each write.
+    """
+
+    def __init__(self, stream, latency: float) -> None:
+        self.stream = stream
+        self.latency = latency
+
+    def write(self, data: str) -> int:
+        time.sleep(self.latency)
+        return self.stream.write(data)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def configure(level: str, queued: bool, stream) -> None:
+    """configure
+
+    Configures structlog and the root logger as the `FlaskStructlog` extension does.
+
+    :param level:
+        The log level.
+    :param queued:
+        If True, uses queue-backed logging.
+    :param stream:
+        The stream to write log messages to.
+    """
+    renderer = create_renderer()
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.setLevel(level)
+
+    if queued:
+        processors = [*STRUCTLOG_PROCESSORS, structlog.stdlib.ProcessorFormatter.wrap_for_formatter]
+        root.addHandler(async_logging.start(renderer, stream=stream))
+    else:
+        processors = [*STRUCTLOG_PROCESSORS, renderer]
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        root.addHandler(handler)
+
+    structlog.reset_defaults()
+    structlog.configure(
+        processors=processors,
+        context_class=structlog.threadlocal.wrap_dict(dict),
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=LevelFilteringBoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+
+def create_app() -> Flask:
+    """create_app
+
+    Returns an app with a single endpoint that logs as a typical handler does.
+    """
+    app = Flask(__name__)
+    logger = structlog.get_logger('bench')
+
+    @app.route('/widgets/<int:widget_id>')
+    def get_widget(widget_id):
+        logger.debug('loading widget', widget_id=widget_id)
+        logger.debug('cache miss', key=f'widget.{widget_id}')
+        logger.debug('query executed', statement='SELECT ...', duration=0.0012)
+        logger.debug('serialized widget', fields=['uuid', 'name', 'size'])
+        logger.info('widget fetched', widget_id=widget_id, status=200)
+        return {'id': widget_id}
+
+    return app
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=5000, help='The number of requests per run.')
+    parser.add_argument('--write-latency', type=float, default=0.0005, help='The delay added to each write.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryFile('w') as file:
+        for latency in (0, args.write_latency):
+            stream = SlowStream(file, latency) if latency else file
+            for level in ('INFO', 'DEBUG'):
+                for queued in (False, True):
+                    configure(level, queued, stream)
+                    client = create_app().test_client()
+                    client.get('/widgets/0')
+
+                    label = f'{"queued" if queued else "sync"} logging at {level}, +{latency * 1000:g}ms/write'
+                    with timed(label, args.requests, 'requests'):
+                        for index in range(args.requests):
+                            client.get(f'/widgets/{index}')
+                    async_logging.stop()
+
+
+if __name__ == '__main__':
+    main()
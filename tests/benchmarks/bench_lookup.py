@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks the CPU cost of `Model.get_by_uuid`, against the ORM query it replaced, and with
+server-side prepared statements.
+
+Usage::
+
+    python -m tests.benchmarks.bench_lookup --calls 100000
+"""
+
+import argparse
+import time
+
+from contextlib import contextmanager
+from itertools import cycle, islice
+from typing import Iterator
+
+from sayan_service import prepared_statements
+from sayan_service.database import db
+
+from .base import BenchmarkRecord, benchmark_app, load, timed
+
+
+def query_by_uuid(record_uuid: str) -> BenchmarkRecord:
+    """ Fetches a record by its `uuid` with a new ORM query, as `get_by_uuid` did before it used a cached statement. """
+    return BenchmarkRecord.query.filter(BenchmarkRecord.uuid == record_uuid).one_or_none()
+
+
+@contextmanager
+def cpu_timed(label: str, calls: int) -> Iterator[None]:
+    """cpu_timed
+
+    Times the enclosed block, and prints the CPU time of the process per call in addition to its
+    duration and throughput.
+
+    :param label:
+        A label for the measurement.
+    :param calls:
+        The number of calls made in the block.
+    """
+    start = time.process_time()
+    with timed(label, calls, 'calls'):
+        yield
+    print(f'{"":<40} {(time.process_time() - start) / calls * 1000000:10.1f} us CPU per call')
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--calls', type=int, default=100000, help='The number of lookups per variant.')
+    parser.add_argument('--rows', type=int, default=1000, help='The number of rows in the table.')
+    args = parser.parse_args()
+
+    with benchmark_app() as app:
+        load(args.rows)
+        uuids = [str(record_uuid) for (record_uuid,) in db.session.query(BenchmarkRecord.uuid)]
+
+        variants = (
+            ('query.filter().one_or_none()', query_by_uuid),
+            ('get_by_uuid', BenchmarkRecord.get_by_uuid),
+            ('get_by_uuid (prepared statements)', BenchmarkRecord.get_by_uuid),
+        )
+        for label, lookup in variants:
+            if 'prepared' in label:
+                app.config['SQLALCHEMY_PREPARED_STATEMENTS'] = True
+                prepared_statements.init_app(app)
+            for record_uuid in uuids:
+                lookup(record_uuid)  # Warm up the compiled cache.
+
+            with cpu_timed(label, args.calls):
+                for record_uuid in islice(cycle(uuids), args.calls):
+                    lookup(record_uuid)
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks `Model.paginate_keyset` against `OFFSET` pagination at increasing depths.
+
+Usage::
+
+    python -m tests.benchmarks.bench_pagination --rows 1000000
+"""
+
+import argparse
+
+from sayan_service.database import db
+
+from .base import BenchmarkRecord, benchmark_app, timed
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000, help='The number of rows in the table.')
+    parser.add_argument('--limit', type=int, default=25, help='The page size.')
+    parser.add_argument('--repeat', type=int, default=20, help='The number of page fetches per depth.')
+    args = parser.parse_args()
+
+    order_by = (BenchmarkRecord.created_at, BenchmarkRecord.id)
+
+    with benchmark_app():
+        with timed('Loading rows', args.rows):
+            BenchmarkRecord.bulk_create(
+                ({'name': f'record-{i}', 'value': i} for i in range(args.rows)), batch_size=10000)
+        db.session.execute(f'ANALYZE {BenchmarkRecord.__tablename__};')
+
+        depth = args.limit
+        while depth < args.rows:
+            # Find the record at the requested depth once (untimed) to produce its cursor.
+            record = BenchmarkRecord.query.order_by(*order_by).offset(depth - 1).first()
+            cursor = BenchmarkRecord._encode_cursor(record, order_by)
+
+            with timed(f'OFFSET {depth}', args.repeat, 'pages'):
+                for _ in range(args.repeat):
+                    BenchmarkRecord.query.order_by(*order_by).offset(depth).limit(args.limit).all()
+            with timed(f'paginate_keyset at {depth}', args.repeat, 'pages'):
+                for _ in range(args.repeat):
+                    BenchmarkRecord.paginate_keyset(after=cursor, limit=args.limit, order_by=order_by)
+            db.session.expunge_all()
+            depth *= 10
+
+
+if __name__ == '__main__':
+    main()
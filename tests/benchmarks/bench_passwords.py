@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+""" Load tests the latency of an unrelated endpoint during a burst of logins, with bcrypt called in
+the request's greenlet and in the `passwords` thread pool, under gevent.
+
+The standard library is monkeypatched first, as the gevent worker of gunicorn does. Each run sends
+`--logins` login requests, `--concurrency` at a time, which verify a password hashed with
+`--rounds`, while another greenlet requests a `/ping` endpoint every 10 milliseconds and records
+how late each response is relative to when it was due, including any time the event loop was
+blocked.
+
+Usage::
+
+    python -m tests.benchmarks.bench_passwords --logins 40 --rounds 12
+"""
+
+import argparse
+import statistics
+import time
+
+import gevent
+
+from gevent import monkey
+from gevent.pool import Pool
+
+from flask import Flask, request
+
+from sayan_service.extensions import bcrypt
+from sayan_service.passwords import passwords
+
+from .base import timed
+
+
+def create_app(rounds: int, pool_size: int) -> Flask:
+    """create_app
+
+    Returns an app with a `/login` endpoint for each mode, and a `/ping` endpoint.
+
+    :param rounds:
+        The bcrypt cost of the password hash.
+    :param pool_size:
+        The number of threads of the `passwords` pool.
+    """
+    app = Flask(__name__)
+    app.config.update(BCRYPT_LOG_ROUNDS=rounds, BCRYPT_POOL_SIZE=pool_size)
+    bcrypt.init_app(app)
+    passwords.init_app(app)
+    pw_hash = bcrypt.generate_password_hash('hunter2').decode('utf-8')
+
+    @app.route('/login/inline', methods=['POST'])
+    def login_inline():
+        return {'valid': bcrypt.check_password_hash(pw_hash, request.json['password'])}
+
+    @app.route('/login/pool', methods=['POST'])
+    def login_pool():
+        return {'valid': passwords.verify(pw_hash, request.json['password'])}
+
+    @app.route('/ping')
+    def ping():
+        return {'pong': True}
+
+    return app
+
+
+def ping(app: Flask, latencies: list) -> None:
+    """ Requests `/ping` every 10 milliseconds until killed, recording how late after it was due each one returned. """
+    client = app.test_client()
+    while True:
+        due = time.perf_counter() + 0.01
+        gevent.sleep(0.01)
+        client.get('/ping')
+        latencies.append(time.perf_counter() - due)
+
+
+def login(app: Flask, mode: str) -> None:
+    """ Sends a login request. """
+    assert app.test_client().post(f'/login/{mode}', json={'password': 'hunter2'}).json['valid']
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=40, help='The number of login requests per run.')
+    parser.add_argument('--concurrency', type=int, default=10, help='The number of concurrent logins.')
+    parser.add_argument('--rounds', type=int, default=12, help='The bcrypt cost.')
+    parser.add_argument('--pool-size', type=int, default=2, help='The number of threads of the bcrypt pool.')
+    args = parser.parse_args()
+
+    # The benchmark makes no TLS connections, and ssl has already been imported by dependencies.
+    monkey.patch_all(ssl=False)
+    app = create_app(args.rounds, args.pool_size)
+
+    for mode in ('inline', 'pool'):
+        latencies: list = []
+        pinger = gevent.spawn(ping, app, latencies)
+        pool = Pool(args.concurrency)
+        with timed(f'{mode} logins', args.logins, 'logins'):
+            for _ in range(args.logins):
+                pool.spawn(login, app, mode)
+            pool.join(raise_error=True)
+        # Let a ping that was due while the event loop was blocked return before stopping.
+        gevent.sleep(0.05)
+        pinger.kill()
+
+        latencies.sort()
+        print(f'{"":<40} /ping p50 {statistics.median(latencies) * 1000:8.1f} ms, '
+              f'p99 {latencies[int(len(latencies) * 0.99)] * 1000:8.1f} ms, '
+              f'max {latencies[-1] * 1000:8.1f} ms over {len(latencies)} requests')
+
+
+if __name__ == '__main__':
+    main()
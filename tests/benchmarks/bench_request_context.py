@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks binding request fields to log messages with `structlog.threadlocal` and with context
+variables, under gevent.
+
+The standard library is monkeypatched first, as the gevent worker of gunicorn does, so thread locals
+are greenlet locals. Each simulated request binds the request id, method, route and client, logs
+`--events` messages at INFO (yielding to other greenlets between them) and clears its context.
+Requests are handled by a pool of `--concurrency` greenlets, and messages are written to
+`/dev/null`.
+
+Usage::
+
+    python -m tests.benchmarks.bench_request_context --requests 20000 --events 5
+"""
+
+import argparse
+import logging
+import os
+
+import gevent
+import structlog
+
+from gevent import monkey
+from gevent.pool import Pool
+
+from sayan_service.extensions.flask_structlog import (
+    STRUCTLOG_PROCESSORS,
+    LevelFilteringBoundLogger,
+    bind_request_context,
+    clear_request_context,
+    create_renderer,
+    merge_request_context,
+    skip_record_metadata,
+)
+
+from .base import timed
+
+logger = structlog.get_logger('bench')
+
+
+def configure(mode: str) -> None:
+    """configure
+
+    Configures structlog as the `FlaskStructlog` extension does, with the context of bound loggers
+    stored in a thread local or in a context variable.
+
+    :param mode:
+        Either `threadlocal` or `contextvars`.
+    """
+    processors = [processor for processor in STRUCTLOG_PROCESSORS
+                  if mode == 'contextvars' or processor is not merge_request_context]
+    structlog.reset_defaults()
+    structlog.configure(
+        processors=[*processors, create_renderer()],
+        context_class=structlog.threadlocal.wrap_dict(dict) if mode == 'threadlocal' else dict,
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=LevelFilteringBoundLogger,
+        cache_logger_on_first_use=True,
+    )
+
+
+def handle_threadlocal(index: int, events: int) -> None:
+    """handle_threadlocal
+
+    Simulates a request that binds its fields to the thread local context.
+
+    :param index:
+        The index of the request.
+    :param events:
+        The number of messages logged by the request.
+    """
+    logger.new(request_id=f'request-{index}', method='GET', route='/v1/widgets/<uuid>',
+               remote_addr='10.0.0.1', user_agent='bench')
+    for _ in range(events):
+        logger.info('widget fetched', widget_id=index)
+        gevent.sleep(0)
+    logger.new()
+
+
+def handle_contextvars(index: int, events: int) -> None:
+    """handle_contextvars
+
+    Simulates a request that binds its fields to the request context.
+
+    :param index:
+        The index of the request.
+    :param events:
+        The number of messages logged by the request.
+    """
+    bind_request_context(request_id=f'request-{index}', method='GET', route='/v1/widgets/<uuid>',
+                         remote_addr='10.0.0.1', user_agent='bench')
+    for _ in range(events):
+        logger.info('widget fetched', widget_id=index)
+        gevent.sleep(0)
+    clear_request_context()
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20000, help='The number of requests per run.')
+    parser.add_argument('--events', type=int, default=5, help='The number of messages logged per request.')
+    parser.add_argument('--concurrency', type=int, default=100, help='The number of concurrent greenlets.')
+    args = parser.parse_args()
+
+    # The benchmark makes no TLS connections, and ssl has already been imported by dependencies.
+    monkey.patch_all(ssl=False)
+    skip_record_metadata()
+
+    with open(os.devnull, 'w') as stream:
+        logging.basicConfig(level=logging.INFO, stream=stream, format='%(message)s', force=True)
+
+        for mode, handle in (('threadlocal', handle_threadlocal), ('contextvars', handle_contextvars)):
+            configure(mode)
+            pool = Pool(args.concurrency)
+            with timed(f'{mode} request context', args.requests, 'requests'):
+                for index in range(args.requests):
+                    pool.spawn(handle, index, args.events)
+                pool.join(raise_error=True)
+
+
+if __name__ == '__main__':
+    main()
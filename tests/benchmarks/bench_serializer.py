@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks `ModelSerializer.dump(many=True)` against `Model.to_dict` and the compiled
+`ModelDumper`, for model instances and for rows from a column-only query.
+
+Usage::
+
+    python -m tests.benchmarks.bench_serializer --rows 100000
+"""
+
+import argparse
+
+from sayan_service.database import db
+
+from .base import BenchmarkRecord, BenchmarkRecordSerializer, benchmark_app, load, timed
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000, help='The number of rows to serialize.')
+    args = parser.parse_args()
+
+    with benchmark_app():
+        load(args.rows)
+        records = BenchmarkRecord.query.all()
+        columns = [getattr(BenchmarkRecord, key) for key in BenchmarkRecord.dumper().fields]
+        rows = db.session.query(*columns).all()
+        serializer = BenchmarkRecordSerializer()
+
+        with timed('ModelSerializer.dump(many=True)', len(records)):
+            serializer.dump(records, many=True)
+        with timed('Model.to_dict', len(records)):
+            [record.to_dict() for record in records]
+        with timed('Model.dump', len(records)):
+            [record.dump() for record in records]
+        with timed('Model.dump_many (instances)', len(records)):
+            BenchmarkRecord.dump_many(records)
+        with timed('Model.dump_many (rows)', len(rows)):
+            BenchmarkRecord.dump_many(rows)
+
+
+if __name__ == '__main__':
+    main()
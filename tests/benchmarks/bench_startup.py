@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+""" Benchmarks the time a worker takes to create the app, including imports, and fails if it exceeds
+a budget.
+
+Each run creates the app in a new interpreter, as a gunicorn worker boots, and the median of the
+runs is compared against `--budget`. The benchmark exits with a non-zero status if it is over
+budget, listing the modules that took the longest to import, so that it can gate CI.
+
+Usage::
+
+    python -m tests.benchmarks.bench_startup --runs 5 --budget 2.0
+"""
+
+import argparse
+import statistics
+import sys
+
+from sayan_service.commands.imports import profile_startup
+
+from .base import timed
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5, help='The number of times the app is created.')
+    parser.add_argument('--budget', type=float, default=2.0, help='The maximum median startup time, in seconds.')
+    args = parser.parse_args()
+
+    results = []
+    with timed('create_app in a new interpreter', args.runs, 'runs'):
+        for _ in range(args.runs):
+            results.append(profile_startup())
+    seconds = statistics.median(result[0] for result in results)
+    print(f'{"":<40} {seconds:10.3f}s median startup, budget {args.budget:.3f}s')
+
+    if seconds > args.budget:
+        slowest = sorted(results[-1][1], key=lambda import_time: import_time.self_us, reverse=True)[:10]
+        for import_time in slowest:
+            print(f'{"":<40} {import_time.self_us / 1000:10.1f}ms {import_time.module}')
+        sys.exit(f'The app took {seconds:.3f}s to start, over the budget of {args.budget:.3f}s.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+""" Measures peak worker RSS while streaming increasingly large result sets with
+`streaming_response`, compared with building the full response in memory.
+
+Usage::
+
+    python -m tests.benchmarks.bench_streaming --rows 1000000
+"""
+
+import argparse
+import resource
+
+from flask import json
+
+from sayan_service.database import db
+from sayan_service.http import streaming_response
+
+from .base import BenchmarkRecord, BenchmarkRecordSerializer, benchmark_app, load, timed
+
+
+def peak_rss_mb() -> float:
+    """ Returns the peak resident set size of the process, in megabytes. """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1000000, help='The number of rows in the table.')
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    with benchmark_app() as app:
+        load(args.rows)
+        serializer = BenchmarkRecordSerializer()
+
+        count = 1000
+        while count <= args.rows:
+            with app.test_request_context():
+                query = BenchmarkRecord.query.order_by(BenchmarkRecord.id).limit(count)
+                response = streaming_response(query, serializer, chunk_size=args.chunk_size)
+                with timed(f'streaming_response ({count} rows)', count):
+                    size = sum(len(chunk) for chunk in response.response)
+            db.session.remove()
+            print(f'    {size / 2 ** 20:.1f} MB streamed, peak RSS {peak_rss_mb():.1f} MB')
+            count *= 10
+
+        # Materializing the full result set is measured last, since peak RSS never decreases.
+        with app.test_request_context():
+            with timed(f'Materialized response ({args.rows} rows)', args.rows):
+                records = BenchmarkRecord.query.order_by(BenchmarkRecord.id).all()
+                size = len(json.dumps(serializer.dump(records, many=True)))
+        print(f'    {size / 2 ** 20:.1f} MB built, peak RSS {peak_rss_mb():.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+""" Micro-benchmarks the cost of a log call, in ns/event, for each level and renderer.
+
+Compares the previous processor chain (with `filter_by_level`, separate name/level/timestamp
+processors and `UnicodeDecoder`) against the consolidated `STRUCTLOG_PROCESSORS` with the
+`LevelFilteringBoundLogger`, and without collecting the caller of each log record. The root logger
+is set to INFO, so `debug` calls measure the cost of a disabled level. Messages are written to
+`/dev/null`.
+
+Usage::
+
+    python -m tests.benchmarks.bench_structlog --events 200000
+"""
+
+import argparse
+import logging
+import os
+import time
+
+import structlog
+
+from sayan_service.extensions.flask_json import _HAS_ORJSON
+from sayan_service.extensions.flask_structlog import (
+    _HAS_STRUCTLOG_DEV,
+    STRUCTLOG_PROCESSORS,
+    LevelFilteringBoundLogger,
+    _orjson_dumps,
+    skip_record_metadata,
+)
+
+##
+#: The `LEGACY_PROCESSORS` are the processor chain before consolidation.
+#:
+LEGACY_PROCESSORS = [
+    structlog.stdlib.filter_by_level,
+    structlog.stdlib.add_logger_name,
+    structlog.stdlib.add_log_level,
+    structlog.stdlib.PositionalArgumentsFormatter(),
+    structlog.processors.TimeStamper(fmt='iso'),
+    structlog.processors.StackInfoRenderer(),
+    structlog.processors.format_exc_info,
+    structlog.processors.UnicodeDecoder(),
+]
+
+
+def renderers() -> dict:
+    """renderers
+
+    Returns the renderers to benchmark, by name.
+    """
+    result = {'json': structlog.processors.JSONRenderer()}
+    if _HAS_ORJSON:
+        result['orjson'] = structlog.processors.JSONRenderer(serializer=_orjson_dumps)
+    if _HAS_STRUCTLOG_DEV:
+        result['console'] = structlog.dev.ConsoleRenderer(colors=False)
+    return result
+
+
+def measure(chain: str, renderer, level: str, events: int) -> float:
+    """measure
+
+    Returns the mean cost of a log call, in nanoseconds.
+
+    :param chain:
+        Either `legacy` or `consolidated`.
+    :param renderer:
+        The renderer at the end of the chain.
+    :param level:
+        The method called on the logger (`debug`, `info` or `error`).
+    :param events:
+        The number of log calls to time.
+    """
+    skip_record_metadata(chain != 'legacy')
+    structlog.reset_defaults()
+    structlog.configure(
+        processors=[*(LEGACY_PROCESSORS if chain == 'legacy' else STRUCTLOG_PROCESSORS), renderer],
+        context_class=structlog.threadlocal.wrap_dict(dict),
+        logger_factory=structlog.stdlib.LoggerFactory(),
+        wrapper_class=structlog.stdlib.BoundLogger if chain == 'legacy' else LevelFilteringBoundLogger,
+        cache_logger_on_first_use=True,
+    )
+    log = getattr(structlog.get_logger('bench'), level)
+
+    start = time.perf_counter_ns()
+    for index in range(events):
+        log('widget fetched', widget_id=index, status=200, duration=0.0123)
+    return (time.perf_counter_ns() - start) / events
+
+
+def main():
+    """ Runs the benchmark. """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=200000, help='The number of log calls per measurement.')
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as stream:
+        logging.basicConfig(level=logging.INFO, stream=stream, format='%(message)s', force=True)
+
+        print(f'{"renderer":<10} {"level":<8} {"legacy ns/event":>16} {"consolidated ns/event":>22} {"speedup":>8}')
+        for name, renderer in renderers().items():
+            for level in ('debug', 'info', 'error'):
+                legacy = measure('legacy', renderer, level, args.events)
+                consolidated = measure('consolidated', renderer, level, args.events)
+                print(f'{name:<10} {level:<8} {legacy:>16.0f} {consolidated:>22.0f} {legacy / consolidated:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
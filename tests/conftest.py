@@ -27,6 +27,10 @@ class TestConfig(Config):
     # "Popped wrong request context" assertion errors when running tests.
     PRESERVE_CONTEXT_ON_EXCEPTION = False
 
+    # Fail requests with N+1 queries rather than only logging them.
+    SQLALCHEMY_LAZY_LOAD_THRESHOLD = 10
+    SQLALCHEMY_LAZY_LOAD_ACTION = 'raise'
+
 
 @pytest.fixture(scope="session")
 def app(request):
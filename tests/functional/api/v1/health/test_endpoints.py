@@ -33,7 +33,7 @@ def test_v1_health_ready(session, client):
         An HTTP client for issuing requests.
     """
     expected_mimetype = 'application/json'
-    expected_json = {'postgres': True}
+    expected_json = {'postgres': True, 'cache': True}
     expected_status_code = 200
 
     response = client.get('/v1/health/ready')
@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """ Tests for health API endpoints in the v1 API. """
 
-from sayan_service.api.v1.health.endpoints import get_alive, get_ready, _postgres_ready
+from sayan_service.api.v1.health.endpoints import get_alive, get_ready
 
 
 def test_get_alive():
@@ -23,7 +23,7 @@ def test_get_ready(session):
     Tests that the ``get_ready`` endpoint function returns a dict with statuses for its upstream
     dependencies. Assumes that postgres is healthy.
     """
-    expected_response = {'postgres': True}, 200
+    expected_response = {'postgres': True, 'cache': True}, 200
 
     actual_response = get_ready()
 
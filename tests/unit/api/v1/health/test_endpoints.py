@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 """ Tests for health API endpoints in the v1 API. """
 
-from sayan_service.api.v1.health.endpoints import get_alive, get_ready, _postgres_ready
+from sayan_service.api.v1.health.endpoints import get_alive, get_ready
 
 
 def test_get_alive(mocker):
@@ -31,13 +31,13 @@ def test_get_ready_success(mocker):
     :param mocker:
         A pytest-mock fixture
     """
-    expected_response = {'postgres': True}, 200
-    _postgres_ready = mocker.patch('sayan_service.api.v1.health.endpoints._postgres_ready')
-    _postgres_ready.return_value = True
+    expected_response = {'postgres': True, 'cache': True}, 200
+    readiness = mocker.patch('sayan_service.api.v1.health.endpoints.readiness')
+    readiness.run.return_value = {'postgres': True, 'cache': True}, True
 
     actual_response = get_ready()
 
-    _postgres_ready.assert_called_once_with()
+    readiness.run.assert_called_once_with()
     assert actual_response == expected_response
 
 
@@ -50,72 +50,11 @@ def test_get_ready_failure(mocker):
     :param mocker:
         A pytest-mock fixture
     """
-    expected_response = {'postgres': False}, 500
-    _postgres_ready = mocker.patch('sayan_service.api.v1.health.endpoints._postgres_ready')
-    _postgres_ready.return_value = False
+    expected_response = {'postgres': False, 'cache': True}, 500
+    readiness = mocker.patch('sayan_service.api.v1.health.endpoints.readiness')
+    readiness.run.return_value = {'postgres': False, 'cache': True}, False
 
     actual_response = get_ready()
 
-    _postgres_ready.assert_called_once_with()
-    assert actual_response == expected_response
-
-
-def test__postgres_ready_success(mocker):
-    """test__postgres_ready_success
-
-    Tests that the _postgres_ready() function returns True when the database behaves as expected.
-
-    :param mocker:
-        A pytest-mock fixture
-    """
-    expected_response = True
-    db = mocker.patch('sayan_service.api.v1.health.endpoints.db')
-    db.session.execute().fetchone.return_value = [1]
-
-    actual_response = _postgres_ready()
-
-    db.session.execute.assert_has_calls([mocker.call('SELECT 1;')])
-    db.session.execute().fetchone.assert_called_once_with()
-    assert actual_response == expected_response
-
-
-def test__postgres_ready_failure_unexpected_result(mocker):
-    """test__postgres_ready_failure_unexpected_result
-
-    Tests that the _postgres_ready() function returns False when the database is not behaving as
-    expected (successfully executing a query, but not returning the expected value).
-
-    :param mocker:
-        A pytest-mock fixture
-    """
-    expected_response = False
-    db = mocker.patch('sayan_service.api.v1.health.endpoints.db')
-    db.session.execute().fetchone.return_value = [0]
-
-    actual_response = _postgres_ready()
-
-    db.session.execute.assert_has_calls([mocker.call('SELECT 1;')])
-    db.session.execute().fetchone.assert_called_once_with()
-    assert actual_response == expected_response
-
-
-def test__postgres_ready_failure_exception(mocker):
-    """test__postgres_ready_failure_exception
-
-    Tests that the _postgres_ready() function returns False when the database is not behaving as
-    expected (raises an exception).
-
-    :param mocker:
-        A pytest-mock fixture
-    """
-    expected_response = False
-    app = mocker.patch('sayan_service.api.v1.health.endpoints.app')
-    db = mocker.patch('sayan_service.api.v1.health.endpoints.db')
-    db.session.execute().fetchone.side_effect = RuntimeError('Test Error')
-
-    actual_response = _postgres_ready()
-
-    db.session.execute.assert_has_calls([mocker.call('SELECT 1;')])
-    db.session.execute().fetchone.assert_called_once_with()
-    app.logger.error.assert_called_once()
+    readiness.run.assert_called_once_with()
     assert actual_response == expected_response
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+""" Tests for import time profiling. """
+
+from click.testing import CliRunner
+
+from sayan_service.commands import imports
+from sayan_service.commands.imports import ImportTime, parse_import_times, profile_imports
+
+##
+#: The `OUTPUT` is an excerpt of the `-X importtime` output of the interpreter.
+#:
+OUTPUT = '''import time: self [us] | cumulative | imported package
+import time:       256 |     129575 |           alembic
+import time:      1267 |     976064 | sayan_service.app
+import time:       499 |     136896 |         flask_migrate
+some other output
+'''
+
+
+def test_parse_import_times():
+    """test_parse_import_times
+
+    Tests that the import times of modules are parsed from the interpreter's output.
+    """
+    assert parse_import_times(OUTPUT) == [
+        ImportTime('alembic', 256, 129575),
+        ImportTime('sayan_service.app', 1267, 976064),
+        ImportTime('flask_migrate', 499, 136896),
+    ]
+
+
+def test_profile_imports(mocker):
+    """test_profile_imports
+
+    Tests that the command lists the slowest modules, or packages.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(imports, 'profile_startup', return_value=(1.5, parse_import_times(OUTPUT)))
+    runner = CliRunner()
+
+    result = runner.invoke(profile_imports, ['--limit', '2'])
+    assert result.exit_code == 0
+    assert 'Created the app in 1.500s' in result.output
+    assert result.output.splitlines()[2:] == [
+        '     976.1        1.3  sayan_service.app',
+        '     136.9        0.5  flask_migrate',
+    ]
+
+    result = runner.invoke(profile_imports, ['--packages', '--limit', '1'])
+    assert result.output.splitlines()[2:] == ['       1.3  sayan_service']
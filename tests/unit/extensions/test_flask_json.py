@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+""" Tests for the FlaskJSON extension. """
+
+import enum
+
+from datetime import datetime
+from decimal import Decimal
+from uuid import UUID
+
+import pytest
+
+from sayan_service.extensions.flask_json import FlaskJSON, OrjsonJSONProvider, StdlibJSONProvider
+
+
+class Color(enum.Enum):
+    """ An enum used to test encoding. """
+
+    RED = 'red'
+
+
+VALUE = {
+    'uuid': UUID('8c7e6f2a-4b8f-4d6e-9a1c-3f2e5d4c6b7a'),
+    'created_at': datetime(2021, 6, 1, 12, 30),
+    'price': Decimal('1.5'),
+    'color': Color.RED,
+}
+
+EXPECTED_JSON = (
+    '{"uuid":"8c7e6f2a-4b8f-4d6e-9a1c-3f2e5d4c6b7a","created_at":"2021-06-01T12:30:00",'
+    '"price":"1.5","color":"red"}'
+)
+
+
+@pytest.mark.parametrize('provider', [StdlibJSONProvider(), OrjsonJSONProvider()], ids=lambda p: p.name)
+def test_provider_dumps(provider):
+    """test_provider_dumps
+
+    Tests that each provider encodes UUIDs, datetimes, decimals and enums identically.
+
+    :param provider:
+        The JSON provider under test.
+    """
+    assert provider.dumps(VALUE) == EXPECTED_JSON
+
+
+@pytest.mark.parametrize('provider', [StdlibJSONProvider(), OrjsonJSONProvider()], ids=lambda p: p.name)
+def test_provider_dumps_decimal(provider):
+    """test_provider_dumps_decimal
+
+    Tests that each provider encodes decimals as strings, without losing their precision.
+
+    :param provider:
+        The JSON provider under test.
+    """
+    price = Decimal('12345678901234567.89')
+
+    assert provider.dumps({'price': price}) == '{"price":"12345678901234567.89"}'
+    assert Decimal(provider.loads(provider.dumps({'price': price}))['price']) == price
+
+
+@pytest.mark.parametrize('name, expected_provider', [
+    ('stdlib', StdlibJSONProvider),
+    ('orjson', OrjsonJSONProvider),
+    ('AUTO', OrjsonJSONProvider),
+])
+def test__create_provider(name, expected_provider):
+    """test__create_provider
+
+    Tests that the ``JSON_PROVIDER`` setting selects the expected provider.
+
+    :param name:
+        The value of the setting.
+    :param expected_provider:
+        The expected provider class.
+    """
+    assert isinstance(FlaskJSON._create_provider(name), expected_provider)
+
+
+def test__create_provider_orjson_missing(mocker):
+    """test__create_provider_orjson_missing
+
+    Tests that ``auto`` falls back to the standard library when orjson is not installed, and that
+    requiring orjson explicitly raises an ``ImportError``.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.extensions.flask_json._HAS_ORJSON', False)
+
+    assert isinstance(FlaskJSON._create_provider('auto'), StdlibJSONProvider)
+    with pytest.raises(ImportError):
+        FlaskJSON._create_provider('orjson')
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+""" Tests for the read replica routing extension. """
+
+import pytest
+
+from flask import Flask
+from sqlalchemy import Column, Integer, MetaData, Table, delete, select, text
+
+from sayan_service.extensions.flask_replicas import Replica, ReplicaSet, RoutingSQLAlchemy
+
+widgets = Table('widgets', MetaData(), Column('id', Integer, primary_key=True))
+
+
+@pytest.fixture
+def replica_app():
+    """replica_app
+
+    Returns an app (and its routing extension) configured with two replicas, using in-memory
+    SQLite databases that are never connected to.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        SQLALCHEMY_DATABASE_URI='sqlite://',
+        SQLALCHEMY_TRACK_MODIFICATIONS=False,
+        SQLALCHEMY_REPLICA_URIS=['sqlite://', 'sqlite://'])
+    db = RoutingSQLAlchemy(app)
+
+    with app.app_context():
+        yield app, db
+
+
+def _replica(mocker, name, checkedout=0):
+    """_replica
+
+    Returns a replica with a mock engine.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param name:
+        The name of the replica.
+    :param checkedout:
+        The number of connections checked out of the replica's pool.
+    """
+    engine = mocker.MagicMock()
+    engine.pool.checkedout.return_value = checkedout
+    mocker.patch('sayan_service.extensions.flask_replicas.event.listen')
+    replica = Replica(name, engine)
+    replica.healthy = True
+    return replica
+
+
+def test_replica_set_round_robin(mocker):
+    """test_replica_set_round_robin
+
+    Tests that the round robin strategy selects each healthy replica in turn.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    replicas = [_replica(mocker, 'replica0'), _replica(mocker, 'replica1'), _replica(mocker, 'replica2')]
+    replicas[1].healthy = False
+    replica_set = ReplicaSet(replicas)
+    mocker.patch.object(replica_set, '_start_checks')
+    replica_set._checked_at = 0
+
+    assert [replica_set.choose().name for _ in range(4)] == ['replica0', 'replica2', 'replica0', 'replica2']
+
+
+def test_replica_set_least_connections(mocker):
+    """test_replica_set_least_connections
+
+    Tests that the least connections strategy selects the replica with the fewest connections
+    checked out.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    replicas = [_replica(mocker, 'replica0', checkedout=3), _replica(mocker, 'replica1', checkedout=1)]
+    replica_set = ReplicaSet(replicas, strategy='least_connections')
+    mocker.patch.object(replica_set, '_start_checks')
+    replica_set._checked_at = 0
+
+    assert replica_set.choose().name == 'replica1'
+
+
+def test_replica_set_no_healthy_replicas(mocker):
+    """test_replica_set_no_healthy_replicas
+
+    Tests that no replica is selected when none are healthy.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    replica = _replica(mocker, 'replica0')
+    replica.healthy = False
+    replica_set = ReplicaSet([replica])
+    mocker.patch.object(replica_set, '_start_checks')
+    replica_set._checked_at = 0
+
+    assert replica_set.choose() is None
+
+
+def test_replica_set_unknown_strategy():
+    """test_replica_set_unknown_strategy
+
+    Tests that an unknown strategy is rejected.
+    """
+    with pytest.raises(ValueError):
+        ReplicaSet([], strategy='random')
+
+
+def test_replica_set_check(mocker):
+    """test_replica_set_check
+
+    Tests that a replica is unhealthy if it is unreachable or lagging by more than the maximum.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    current, lagging, down = _replica(mocker, 'current'), _replica(mocker, 'lagging'), _replica(mocker, 'down')
+    current.engine.connect.return_value.__enter__.return_value.execute.return_value.scalar.return_value = 0.5
+    lagging.engine.connect.return_value.__enter__.return_value.execute.return_value.scalar.return_value = 30
+    down.engine.connect.side_effect = Exception('connection refused')
+
+    result = ReplicaSet([current, lagging, down], max_lag=10).check()
+
+    assert result == {'current': True, 'lagging': False, 'down': False}
+    assert (current.lag, lagging.lag, down.lag) == (0.5, 30, None)
+
+
+def test_replica_set_checks_in_background(mocker):
+    """test_replica_set_checks_in_background
+
+    Tests that replicas are checked by a background thread started on first use, once per process,
+    and that reads are routed to the primary until the first check has completed.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    thread = mocker.patch('sayan_service.extensions.flask_replicas.threading.Thread')
+    replica_set = ReplicaSet([_replica(mocker, 'replica0')], check_interval=5)
+
+    assert replica_set.choose() is None
+    assert replica_set.choose() is None
+    thread.assert_called_once_with(target=replica_set._check_periodically, name='replica-checks', daemon=True)
+    thread.return_value.start.assert_called_once_with()
+
+    replica_set._checked_at = 100
+    assert replica_set.choose().name == 'replica0'
+
+    mocker.patch('sayan_service.extensions.flask_replicas.os.getpid', return_value=-1)
+    replica_set.choose()
+    assert thread.call_count == 2
+
+
+def test_replica_set_check_periodically(mocker):
+    """test_replica_set_check_periodically
+
+    Tests that the background thread checks the replicas every check interval until the replica
+    set is disposed.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    replica_set = ReplicaSet([_replica(mocker, 'replica0')], check_interval=5)
+    check = mocker.patch.object(replica_set, 'check')
+    waits = iter([lambda: None, replica_set.dispose])
+    wait = mocker.patch.object(replica_set._disposed, 'wait', side_effect=lambda timeout: next(waits)())
+
+    replica_set._check_periodically()
+
+    assert check.call_count == 2
+    wait.assert_called_with(5)
+
+
+def test_replica_set_disconnect(mocker):
+    """test_replica_set_disconnect
+
+    Tests that a replica is taken out of rotation when its connection is lost.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    replica = _replica(mocker, 'replica0')
+    ReplicaSet._on_error(replica)(mocker.Mock(is_disconnect=True))
+
+    assert replica.healthy is False
+
+
+def test_routing_session_reads_from_replica(mocker, replica_app):
+    """test_routing_session_reads_from_replica
+
+    Tests that a session reads from a single replica until it writes, and then sticks to the
+    primary.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param replica_app:
+        The app with replicas
+    """
+    app, db = replica_app
+    replica = _replica(mocker, 'replica0')
+    replica_set = mocker.patch.object(db, 'get_replicas').return_value
+    replica_set.choose.return_value = replica
+    session = db.session()
+
+    assert session.get_bind(clause=select(widgets)) is replica.engine
+    assert session.get_bind(clause=select(widgets)) is replica.engine
+    replica_set.choose.assert_called_once_with()
+
+    assert session.get_bind(clause=delete(widgets)) is db.engine
+    assert session.get_bind(clause=select(widgets)) is db.engine
+
+
+@pytest.mark.parametrize('clause', [
+    select(widgets).with_for_update(),
+    text('SELECT 1'),
+])
+def test_routing_session_uses_primary(mocker, replica_app, clause):
+    """test_routing_session_uses_primary
+
+    Tests that statements which may write are routed to the primary, and stick the session to it.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param replica_app:
+        The app with replicas
+    :param clause:
+        The statement to route
+    """
+    app, db = replica_app
+    mocker.patch.object(db, 'get_replicas').return_value.choose.return_value = _replica(mocker, 'replica0')
+    session = db.session()
+
+    assert session.get_bind(clause=clause) is db.engine
+    assert session.get_bind(clause=select(widgets)) is db.engine
+
+
+def test_routing_session_use_primary(mocker, replica_app):
+    """test_routing_session_use_primary
+
+    Tests that ``use_primary`` routes reads to the primary.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param replica_app:
+        The app with replicas
+    """
+    app, db = replica_app
+    mocker.patch.object(db, 'get_replicas').return_value.choose.return_value = _replica(mocker, 'replica0')
+
+    db.use_primary()
+
+    assert db.session().get_bind(clause=select(widgets)) is db.engine
+
+
+def test_routing_session_falls_back_to_primary(mocker, replica_app):
+    """test_routing_session_falls_back_to_primary
+
+    Tests that reads are routed to the primary when no replica is healthy.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param replica_app:
+        The app with replicas
+    """
+    app, db = replica_app
+    mocker.patch.object(db, 'get_replicas').return_value.choose.return_value = None
+
+    assert db.session().get_bind(clause=select(widgets)) is db.engine
+
+
+def test_routing_session_without_replicas(mocker, replica_app):
+    """test_routing_session_without_replicas
+
+    Tests that reads are routed to the primary when no replicas are configured.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param replica_app:
+        The app with replicas
+    """
+    app, db = replica_app
+    app.config['SQLALCHEMY_REPLICA_URIS'] = []
+    get_replicas = mocker.patch.object(db, 'get_replicas')
+
+    assert db.session().get_bind(clause=select(widgets)) is db.engine
+    get_replicas.assert_not_called()
+
+
+def test_get_replicas(replica_app):
+    """test_get_replicas
+
+    Tests that the replica set is created once per app from its configuration, with named pools.
+
+    :param replica_app:
+        The app with replicas
+    """
+    app, db = replica_app
+
+    replica_set = db.get_replicas()
+
+    assert db.get_replicas() is replica_set
+    assert [replica.name for replica in replica_set.replicas] == ['replica0', 'replica1']
+    assert [replica.engine.pool.logging_name for replica in replica_set.replicas] == ['replica0', 'replica1']
+    replica_set.dispose()
+
+
+def test_get_replicas_connect_timeout(mocker, replica_app):
+    """test_get_replicas_connect_timeout
+
+    Tests that connections to PostgreSQL replicas give up after the configured connect timeout.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param replica_app:
+        The app with replicas
+    """
+    app, db = replica_app
+    app.config.update(SQLALCHEMY_REPLICA_URIS=['postgresql://replica/db'], SQLALCHEMY_REPLICA_CONNECT_TIMEOUT=3)
+    create_engine = mocker.patch.object(db, 'create_engine')
+    mocker.patch('sayan_service.extensions.flask_replicas.event.listen')
+
+    db.get_replicas()
+
+    assert create_engine.call_args.args[1]['connect_args'] == {'connect_timeout': 3}
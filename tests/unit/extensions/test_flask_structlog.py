@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+""" Tests for the structured logging extension. """
+
+import json
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from uuid import UUID
+
+import gevent
+import pytest
+import structlog
+
+from flask import Flask
+
+from sayan_service.extensions.flask_structlog import (
+    STRUCTLOG_PROCESSORS,
+    CachedTimeStamper,
+    ContextThreadPoolExecutor,
+    FlaskStructlog,
+    LevelFilteringBoundLogger,
+    add_standard_fields,
+    bind_request_context,
+    clear_request_context,
+    configure_structlog,
+    copy_request_context,
+    create_renderer,
+    get_request_context,
+    merge_request_context,
+    spawn,
+)
+
+
+@pytest.fixture
+def app(mocker):
+    """app
+
+    Returns an app with the structured logging extension, and a widget endpoint that returns the
+    request context seen by the handler, by a log message, by a greenlet spawned with the request
+    context and by a greenlet spawned without it. The handler yields to other greenlets before
+    reading the context.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(FlaskStructlog, '_initialize_structlog')
+    mocker.patch.object(FlaskStructlog, '_patch_flask_logger')
+    app = Flask(__name__)
+    FlaskStructlog(app)
+
+    @app.route('/widgets/<int:widget_id>')
+    def get_widget(widget_id):
+        copied = spawn(get_request_context)
+        isolated = gevent.spawn(get_request_context)
+        gevent.sleep(0.001)
+        return {
+            'context': dict(get_request_context()),
+            'event': merge_request_context(None, 'info', {'event': 'widget fetched'}),
+            'copied': dict(copied.get()),
+            'isolated': dict(isolated.get()),
+        }
+
+    yield app
+    clear_request_context()
+
+
+def test_cached_time_stamper(mocker):
+    """test_cached_time_stamper
+
+    Tests that timestamps match the ISO 8601 format of ``TimeStamper(fmt='iso')``, and that the
+    date and time are only formatted once per second.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.extensions.flask_structlog.time.time', side_effect=[0.5, 0.25, 1.000001])
+    patched_datetime = mocker.patch('sayan_service.extensions.flask_structlog.datetime', wraps=datetime)
+    timestamper = CachedTimeStamper()
+
+    timestamps = [timestamper({}, 'info', {})['timestamp'] for _ in range(3)]
+
+    assert timestamps == [
+        '1970-01-01T00:00:00.500000Z',
+        '1970-01-01T00:00:00.250000Z',
+        '1970-01-01T00:00:01.000001Z',
+    ]
+    assert patched_datetime.utcfromtimestamp.call_count == 2
+
+
+def test_add_standard_fields(mocker):
+    """test_add_standard_fields
+
+    Tests that the logger name, level and timestamp are added to the event dict.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    timestamper = mocker.Mock()
+    timestamper.now.return_value = '2021-01-01T00:00:00.000000Z'
+    processor = add_standard_fields(timestamper)
+
+    event_dict = processor(logging.getLogger('tests'), 'warn', {'event': 'message'})
+
+    assert event_dict == {
+        'event': 'message',
+        'logger': 'tests',
+        'level': 'warning',
+        'timestamp': '2021-01-01T00:00:00.000000Z',
+    }
+
+
+def test_level_filtering_bound_logger(mocker):
+    """test_level_filtering_bound_logger
+
+    Tests that events below the level of the wrapped logger are discarded before any processor
+    runs, and that other events are processed.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    wrapped = logging.getLogger('tests.level_filtering')
+    wrapped.setLevel(logging.INFO)
+    mocker.patch.object(wrapped, 'info')
+    processor = mocker.Mock(side_effect=lambda logger, method_name, event_dict: event_dict)
+    logger = LevelFilteringBoundLogger(wrapped, [processor], {})
+
+    logger.debug('hidden')
+    processor.assert_not_called()
+
+    logger.info('shown')
+    processor.assert_called_once()
+    wrapped.info.assert_called_once()
+
+
+def test_create_renderer():
+    """test_create_renderer
+
+    Tests that the JSON renderer handles UUIDs, datetimes and bytes, and falls back to the ``repr``
+    of other values.
+    """
+    renderer = create_renderer()
+    value = object()
+
+    rendered = json.loads(renderer(None, 'info', {
+        'event': 'message',
+        'uuid': UUID('1b5ba1c4-8be4-4b1a-8a07-8d3d8f4e3a10'),
+        'at': datetime(2021, 1, 1),
+        'body': b'bytes',
+        'value': value,
+    }))
+
+    assert rendered == {
+        'event': 'message',
+        'uuid': '1b5ba1c4-8be4-4b1a-8a07-8d3d8f4e3a10',
+        'at': '2021-01-01T00:00:00',
+        'body': 'bytes',
+        'value': repr(value),
+    }
+
+
+def test_configure_structlog_once(mocker):
+    """test_configure_structlog_once
+
+    Tests that structlog is only configured once, and that the shared processor chain is never
+    modified.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    processors = tuple(STRUCTLOG_PROCESSORS)
+    mocker.patch('sayan_service.extensions.flask_structlog.structlog.is_configured', side_effect=[False, True])
+    configure_once = mocker.patch('sayan_service.extensions.flask_structlog.structlog.configure_once')
+    mocker.patch('sayan_service.extensions.flask_structlog.logging.basicConfig')
+    skip_record_metadata = mocker.patch('sayan_service.extensions.flask_structlog.skip_record_metadata')
+
+    configure_structlog('INFO')
+    configure_structlog('INFO')
+
+    configure_once.assert_called_once()
+    skip_record_metadata.assert_not_called()
+    assert configure_once.call_args[1]['processors'][:-1] == list(processors)
+    assert configure_once.call_args[1]['wrapper_class'] is LevelFilteringBoundLogger
+    assert STRUCTLOG_PROCESSORS == processors
+    assert isinstance(configure_once.call_args[1]['processors'][-1], structlog.processors.JSONRenderer)
+
+
+def test_configure_structlog_skip_metadata(mocker):
+    """test_configure_structlog_skip_metadata
+
+    Tests that the logging module only stops collecting the metadata of log records when asked to.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.extensions.flask_structlog.structlog.is_configured', return_value=False)
+    mocker.patch('sayan_service.extensions.flask_structlog.structlog.configure_once')
+    mocker.patch('sayan_service.extensions.flask_structlog.logging.basicConfig')
+    skip_record_metadata = mocker.patch('sayan_service.extensions.flask_structlog.skip_record_metadata')
+
+    configure_structlog('INFO', skip_metadata=True)
+
+    skip_record_metadata.assert_called_once_with()
+
+
+def test_merge_request_context():
+    """test_merge_request_context
+
+    Tests that bound fields are added to the event dict, and that fields passed to the log call take
+    precedence.
+    """
+    bind_request_context(request_id='abc', route='/v1/widgets')
+    bind_request_context(route='/v1/widgets/<uuid>')
+
+    try:
+        event_dict = merge_request_context(None, 'info', {'event': 'message', 'request_id': 'override'})
+    finally:
+        clear_request_context()
+
+    assert event_dict == {'event': 'message', 'request_id': 'override', 'route': '/v1/widgets/<uuid>'}
+    assert merge_request_context(None, 'info', {'event': 'message'}) == {'event': 'message'}
+
+
+def test_copy_request_context():
+    """test_copy_request_context
+
+    Tests that a function submitted to a thread pool sees the request context it was wrapped in, and
+    that an unwrapped function does not.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        bind_request_context(request_id='abc')
+        try:
+            wrapped = executor.submit(copy_request_context(get_request_context)).result()
+            unwrapped = executor.submit(get_request_context).result()
+        finally:
+            clear_request_context()
+
+    assert wrapped == {'request_id': 'abc'}
+    assert unwrapped == {}
+
+
+def test_context_thread_pool_executor():
+    """test_context_thread_pool_executor
+
+    Tests that functions submitted to a ``ContextThreadPoolExecutor``, or mapped with it, see the
+    request context of the caller, and that the context of one request does not leak into the
+    functions submitted by the next.
+    """
+    with ContextThreadPoolExecutor(max_workers=1) as executor:
+        bind_request_context(request_id='abc')
+        try:
+            submitted = executor.submit(get_request_context).result()
+            mapped = list(executor.map(lambda _: get_request_context(), range(2)))
+        finally:
+            clear_request_context()
+        after = executor.submit(get_request_context).result()
+
+    assert submitted == {'request_id': 'abc'}
+    assert mapped == [{'request_id': 'abc'}] * 2
+    assert after == {}
+
+
+def test_spawn():
+    """test_spawn
+
+    Tests that a greenlet spawned with ``spawn`` sees the request context it was spawned in.
+    """
+    bind_request_context(request_id='abc')
+    try:
+        greenlet = spawn(get_request_context)
+    finally:
+        clear_request_context()
+
+    assert greenlet.get() == {'request_id': 'abc'}
+
+
+def test_request_context(app):
+    """test_request_context
+
+    Tests that the request id, route and client are bound while handling a request, that the
+    request id is returned, and that the context is cleared after the request.
+
+    :param app:
+        An app with the structured logging extension
+    """
+    response = app.test_client().get('/widgets/1', headers={'User-Agent': 'tests'})
+
+    request_id = response.headers['X-Request-ID']
+    assert len(request_id) == 32
+    assert response.json['context'] == {
+        'request_id': request_id,
+        'method': 'GET',
+        'route': '/widgets/<int:widget_id>',
+        'remote_addr': '127.0.0.1',
+        'user_agent': 'tests',
+    }
+    assert get_request_context() == {}
+
+
+def test_request_context_greenlets(app):
+    """test_request_context_greenlets
+
+    Tests that hundreds of requests handled by concurrent greenlets only see their own request
+    context, and that greenlets spawned by a request only see it if it is copied.
+
+    :param app:
+        An app with the structured logging extension
+    """
+    client = app.test_client()
+    greenlets = [
+        gevent.spawn(client.get, f'/widgets/{index}', headers={'X-Request-ID': f'request-{index}'})
+        for index in range(500)
+    ]
+    gevent.joinall(greenlets, raise_error=True)
+
+    for index, greenlet in enumerate(greenlets):
+        response = greenlet.value
+        assert response.headers['X-Request-ID'] == f'request-{index}'
+        assert response.json['context']['request_id'] == f'request-{index}'
+        assert response.json['event']['request_id'] == f'request-{index}'
+        assert response.json['copied']['request_id'] == f'request-{index}'
+        assert response.json['isolated'] == {}
+    assert get_request_context() == {}
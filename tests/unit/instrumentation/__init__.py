@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+""" Unit tests for the ``instrumentation`` module. """
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+""" Tests for compiled statement cache instrumentation. """
+
+import sqlalchemy
+
+from flask import Flask
+
+from sayan_service.instrumentation import compiled_cache
+from sayan_service.instrumentation.compiled_cache import init_app
+
+
+def test_compiled_cache_lookups(mocker):
+    """test_compiled_cache_lookups
+
+    Tests that the first execution of a statement is counted as a miss, later executions of the
+    same statement as hits, and raw SQL as uncacheable.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    lookups = mocker.patch('sayan_service.instrumentation.compiled_cache.DB_COMPILED_CACHE_LOOKUPS')
+    init_app(Flask(__name__))
+    engine = sqlalchemy.create_engine('sqlite://')
+    statement = sqlalchemy.select(sqlalchemy.literal_column('1')).where(sqlalchemy.bindparam('value') > 0)
+
+    try:
+        with engine.connect() as connection:
+            for value in range(1, 4):
+                connection.execute(statement, {'value': value})
+            connection.exec_driver_sql('SELECT 1')
+    finally:
+        sqlalchemy.event.remove(
+            sqlalchemy.engine.Engine, 'before_cursor_execute', compiled_cache._before_cursor_execute)
+
+    assert [call[0][0] for call in lookups.labels.call_args_list] == ['miss', 'hit', 'hit', 'uncacheable']
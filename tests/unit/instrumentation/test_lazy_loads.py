@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+""" Tests for lazy load detection. """
+
+import pytest
+import sqlalchemy as sa
+
+from flask import Flask
+from sqlalchemy.orm import Session, declarative_base, relationship
+
+from sayan_service.instrumentation import lazy_loads
+from sayan_service.instrumentation.lazy_loads import LazyLoadDetector, LazyLoadError
+
+Base = declarative_base()
+
+
+class Owner(Base):
+    """ A model whose records are lazily loaded by `Pet`. """
+
+    __tablename__ = 'owners'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+
+
+class Pet(Base):
+    """ A model with a lazily loaded relationship. """
+
+    __tablename__ = 'pets'
+
+    id = sa.Column(sa.Integer, primary_key=True)
+    owner_id = sa.Column(sa.Integer, sa.ForeignKey('owners.id'))
+    owner = relationship(Owner)
+
+
+@pytest.fixture
+def app(mocker):
+    """app
+
+    Returns an app that counts lazy loads, with an endpoint that lazily loads the owner of each of
+    three pets, and a mock logger.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.instrumentation.lazy_loads.logger')
+    engine = sa.create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all([Pet(id=index, owner=Owner(id=index)) for index in range(3)])
+        session.commit()
+
+    app = Flask(__name__)
+    app.config.update(TESTING=True, SQLALCHEMY_LAZY_LOAD_THRESHOLD=2)
+    app.extensions['detector'] = detector = LazyLoadDetector()
+
+    @app.route('/pets')
+    def get_pets():
+        with Session(engine) as session:
+            return {'owners': [pet.owner.id for pet in session.query(Pet).order_by(Pet.id)]}
+
+    yield app
+    if sa.event.contains(Session, 'do_orm_execute', detector._do_orm_execute):
+        sa.event.remove(Session, 'do_orm_execute', detector._do_orm_execute)
+
+
+def test_warn(app):
+    """test_warn
+
+    Tests that a request that exceeds the threshold is logged with its lazy loads by relationship.
+
+    :param app:
+        An app that lazily loads three relationships per request
+    """
+    app.extensions['detector'].init_app(app)
+
+    response = app.test_client().get('/pets')
+
+    assert response.json == {'owners': [0, 1, 2]}
+    lazy_loads.logger.warning.assert_called_once()
+    assert lazy_loads.logger.warning.call_args[1]['relationships'] == {'Pet.owner': 3}
+    assert app.extensions['detector']._lazy_loads.get() is None
+
+
+def test_raise(app):
+    """test_raise
+
+    Tests that the lazy load that exceeds the threshold raises when the action is `raise`.
+
+    :param app:
+        An app that lazily loads three relationships per request
+    """
+    app.config.update(SQLALCHEMY_LAZY_LOAD_ACTION='raise')
+    app.extensions['detector'].init_app(app)
+
+    with pytest.raises(LazyLoadError, match=r'more than 2 times: Pet.owner \(3\)'):
+        app.test_client().get('/pets')
+
+
+def test_disabled(app):
+    """test_disabled
+
+    Tests that lazy loads are not counted when the threshold is 0, and that unknown actions are
+    rejected.
+
+    :param app:
+        An app that lazily loads three relationships per request
+    """
+    app.config.update(SQLALCHEMY_LAZY_LOAD_THRESHOLD=0)
+    app.extensions['detector'].init_app(app)
+
+    app.test_client().get('/pets')
+
+    lazy_loads.logger.warning.assert_not_called()
+    app.config.update(SQLALCHEMY_LAZY_LOAD_ACTION='ignore')
+    with pytest.raises(ValueError):
+        app.extensions['detector'].init_app(app)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+""" Tests for connection pool instrumentation. """
+
+from sqlalchemy.pool import NullPool
+
+from sayan_service.instrumentation.pool import InstrumentedQueuePool, init_app
+
+
+def test_init_app(mocker):
+    """test_init_app
+
+    Tests that ``init_app`` configures the instrumented pool class without modifying the other
+    engine options.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    options = {'pool_size': 3}
+    app = mocker.Mock(config={'SQLALCHEMY_ENGINE_OPTIONS': options})
+
+    init_app(app)
+
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {'pool_size': 3, 'poolclass': InstrumentedQueuePool}
+    assert options == {'pool_size': 3}
+
+
+def test_init_app_custom_poolclass(mocker):
+    """test_init_app_custom_poolclass
+
+    Tests that ``init_app`` does not replace an explicitly configured pool class.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    app = mocker.Mock(config={'SQLALCHEMY_ENGINE_OPTIONS': {'poolclass': NullPool}})
+
+    init_app(app)
+
+    assert app.config['SQLALCHEMY_ENGINE_OPTIONS'] == {'poolclass': NullPool}
+
+
+def test_instrumented_queue_pool_checkout(mocker):
+    """test_instrumented_queue_pool_checkout
+
+    Tests that checking connections out of and back into an ``InstrumentedQueuePool`` keeps the
+    checked-out gauge up to date.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    pool = InstrumentedQueuePool(mocker.Mock, pool_size=2, logging_name='test')
+    gauge = mocker.patch('sayan_service.instrumentation.pool.DB_POOL_CHECKED_OUT')
+
+    connection = pool.connect()
+    gauge.labels('test').set.assert_called_with(1)
+
+    connection.close()
+    gauge.labels('test').set.assert_called_with(0)
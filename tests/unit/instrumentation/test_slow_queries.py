@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+""" Tests for the slow query log. """
+
+import pytest
+import sqlalchemy
+
+from flask import Flask
+from sqlalchemy.engine import Engine
+
+from sayan_service.instrumentation import slow_queries
+from sayan_service.instrumentation.slow_queries import SKIP_OPTION, SlowQueryLog, normalize, parameter_shape
+
+
+@pytest.fixture
+def slow_query_log(mocker):
+    """slow_query_log
+
+    Returns a slow query log that logs each statement at most once a minute, with a mock logger.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.instrumentation.slow_queries.logger')
+    mocker.patch('sayan_service.instrumentation.slow_queries.DB_SLOW_QUERIES')
+    log = SlowQueryLog()
+    log.threshold = 0.5
+    log.interval = 60
+    return log
+
+
+@pytest.mark.parametrize('statement, normalized', [
+    ('SELECT * FROM widgets WHERE id = %(id_1)s', 'SELECT * FROM widgets WHERE id = ?'),
+    ("SELECT * FROM widgets\n  WHERE name = 'it''s' AND size > 10.5",
+     'SELECT * FROM widgets WHERE name = ? AND size > ?'),
+    ('SELECT * FROM widgets WHERE id IN (%(id_1_1)s, %(id_1_2)s, %(id_1_3)s)', 'SELECT * FROM widgets WHERE id IN (?)'),
+    ('INSERT INTO widgets (name, size) VALUES (%s, %s), (%s, %s)', 'INSERT INTO widgets (name, size) VALUES (?)'),
+    ('SELECT * FROM replica1 WHERE id = $1', 'SELECT * FROM replica1 WHERE id = ?'),
+])
+def test_normalize(statement, normalized):
+    """test_normalize
+
+    Tests that parameters and literals are replaced, and that lists of them are collapsed.
+
+    :param statement:
+        A SQL statement
+    :param normalized:
+        The expected normalized statement
+    """
+    assert normalize(statement) == normalized
+
+
+def test_parameter_shape():
+    """test_parameter_shape
+
+    Tests that the types of parameters are returned without their values.
+    """
+    assert parameter_shape({'id_1': 1, 'name': 'widget'}) == {'id_1': 'int', 'name': 'str'}
+    assert parameter_shape((1, None)) == ['int', 'NoneType']
+    assert parameter_shape([{'id': 1}, {'id': 2}], executemany=True) == {'rows': 2, 'row': {'id': 'int'}}
+
+
+def test_record_aggregates(mocker, slow_query_log):
+    """test_record_aggregates
+
+    Tests that the first slow execution of a statement is logged, that later ones within the
+    interval are counted but not logged, and that the next message includes them.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param slow_query_log:
+        A slow query log
+    """
+    mocker.patch('sayan_service.instrumentation.slow_queries.time.monotonic', side_effect=[0, 30, 45, 61])
+    engine = mocker.Mock()
+    engine.dialect.name = 'sqlite'
+
+    for duration in (0.5, 2.0, 1.0, 0.75):
+        slow_query_log.record(engine, 'SELECT * FROM widgets WHERE id = %(id_1)s', {'id_1': 1}, False, duration)
+
+    assert slow_queries.logger.warning.call_count == 2
+    first, second = [call[1] for call in slow_queries.logger.warning.call_args_list]
+    assert first['occurrences'] == 1
+    assert (second['occurrences'], second['max_duration'], second['duration']) == (3, 2.0, 0.75)
+    assert first['fingerprint'] == second['fingerprint']
+    assert first['statement'] == 'SELECT * FROM widgets WHERE id = ?'
+    assert first['parameters'] == {'id_1': 'int'}
+    assert slow_queries.DB_SLOW_QUERIES.labels().inc.call_count == 4
+
+
+def test_listener(mocker, slow_query_log):
+    """test_listener
+
+    Tests that statements above the threshold are recorded, unless their connection skips the log.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param slow_query_log:
+        A slow query log
+    """
+    app = Flask(__name__)
+    app.config.update(SLOW_QUERY_THRESHOLD=1e-9, SLOW_QUERY_EXPLAIN_SAMPLE_RATE=0)
+    record = mocker.patch.object(slow_query_log, 'record')
+    slow_query_log.init_app(app)
+    engine = sqlalchemy.create_engine('sqlite://')
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(sqlalchemy.text('SELECT :value'), {'value': 1})
+            connection.execution_options(**{SKIP_OPTION: True}).execute(sqlalchemy.text('SELECT 2'))
+    finally:
+        sqlalchemy.event.remove(Engine, 'before_cursor_execute', slow_query_log._before_cursor_execute)
+        sqlalchemy.event.remove(Engine, 'after_cursor_execute', slow_query_log._after_cursor_execute)
+
+    record.assert_called_once()
+    assert record.call_args[0][1:4] == ('SELECT ?', (1,), False)
+
+
+@pytest.mark.parametrize('dialect, statement, executemany, expected', [
+    ('postgresql', ' select * from widgets', False, True),
+    ('postgresql', 'UPDATE widgets SET size = 1', False, False),
+    ('postgresql', 'SELECT * FROM widgets', True, False),
+    ('sqlite', 'SELECT * FROM widgets', False, False),
+])
+def test_should_explain(mocker, slow_query_log, dialect, statement, executemany, expected):
+    """test_should_explain
+
+    Tests that only single `SELECT` statements on PostgreSQL are explained.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param slow_query_log:
+        A slow query log
+    :param dialect:
+        The name of the engine's dialect
+    :param statement:
+        A SQL statement
+    :param executemany:
+        Whether the statement was executed with many parameter sets
+    :param expected:
+        Whether the statement should be explained
+    """
+    slow_query_log.explain_sample_rate = 1
+    slow_query_log._executor = mocker.Mock()
+    engine = mocker.Mock()
+    engine.dialect.name = dialect
+
+    assert slow_query_log._should_explain(engine, statement, executemany) is expected
+
+
+def test_record_explain_slots(mocker, slow_query_log):
+    """test_record_explain_slots
+
+    Tests that at most two `EXPLAIN`s are in flight, one running and one waiting, and that a slot
+    is freed once an `EXPLAIN` completes.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param slow_query_log:
+        A slow query log
+    """
+    slow_query_log.interval = 0
+    slow_query_log.explain_sample_rate = 1
+    slow_query_log._executor = mocker.Mock()
+    engine = mocker.Mock()
+    engine.dialect.name = 'postgresql'
+
+    for _ in range(3):
+        slow_query_log.record(engine, 'SELECT * FROM widgets', {}, False, 1.0)
+    assert slow_query_log._executor.submit.call_count == 2
+
+    slow_query_log._explain(engine, 'key', 'SELECT * FROM widgets', {})
+    slow_query_log.record(engine, 'SELECT * FROM widgets', {}, False, 1.0)
+    assert slow_query_log._executor.submit.call_count == 3
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+""" Tests for request timing instrumentation. """
+
+import pytest
+import sqlalchemy
+
+from flask import Flask
+
+from sayan_service.instrumentation import timing
+from sayan_service.instrumentation.timing import RequestTiming, init_app, register_api, timed_serialization
+
+
+@pytest.fixture
+def request_timing():
+    """request_timing
+
+    Returns the timing of a request in progress.
+    """
+    value = RequestTiming(0.0)
+    token = timing._request_timing.set(value)
+    yield value
+    timing._request_timing.reset(token)
+
+
+def test_timed_serialization(mocker, request_timing):
+    """test_timed_serialization
+
+    Tests that nested serialization is only counted once, and that database time incurred while
+    serializing is not counted as serialization time.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param request_timing:
+        The timing of a request in progress
+    """
+    mocker.patch('sayan_service.instrumentation.timing.time.perf_counter', side_effect=[1.0, 4.0])
+
+    @timed_serialization
+    def dump_nested():
+        request_timing.db_seconds += 1
+        return 'nested'
+
+    @timed_serialization
+    def dump():
+        return [dump_nested(), dump_nested()]
+
+    assert dump() == ['nested', 'nested']
+    assert request_timing.db_seconds == 2
+    assert request_timing.serialization_seconds == 1
+    assert request_timing.serializing is False
+
+
+def test_timed_serialization_outside_request():
+    """test_timed_serialization_outside_request
+
+    Tests that decorated functions are called as they are outside of a request.
+    """
+    assert timed_serialization(lambda value: value * 2)(21) == 42
+
+
+def test_query_timing(request_timing):
+    """test_query_timing
+
+    Tests that each cursor execution is counted and timed during a request, and not outside of one.
+
+    :param request_timing:
+        The timing of a request in progress
+    """
+    init_app(Flask(__name__))
+    engine = sqlalchemy.create_engine('sqlite://')
+
+    with engine.connect() as connection:
+        for _ in range(3):
+            connection.execute(sqlalchemy.text('SELECT 1'))
+        timing._request_timing.set(None)
+        connection.execute(sqlalchemy.text('SELECT 1'))
+
+    assert request_timing.queries == 3
+    assert request_timing.db_seconds > 0
+
+
+def test_register_api(mocker):
+    """test_register_api
+
+    Tests that the endpoint of each operation of a Connexion API is mapped to its `operationId`.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    app = Flask(__name__)
+    api = mocker.Mock()
+    api.blueprint.name = '/v1'
+    api.specification = {'paths': {
+        '/widgets': {
+            'parameters': [],
+            'get': {'operationId': 'sayan_service.api.v1.widgets.endpoints.get_widgets'},
+        },
+    }}
+
+    register_api(app, api)
+
+    assert app.extensions['request_timing'] == {
+        '/v1.sayan_service_api_v1_widgets_endpoints_get_widgets': 'sayan_service.api.v1.widgets.endpoints.get_widgets',
+    }
+
+
+def test_request_metrics(mocker):
+    """test_request_metrics
+
+    Tests that the wall, database, serialization and handler time and the query count of a request
+    are recorded with its operation, and that requests that did not match a route are not.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.instrumentation.timing.time.perf_counter', side_effect=[10.0, 12.0, 20.0])
+    metrics = {
+        name: mocker.patch(f'sayan_service.instrumentation.timing.{name}')
+        for name in ('REQUEST_SECONDS', 'REQUEST_DB_SECONDS', 'REQUEST_SERIALIZATION_SECONDS',
+                     'REQUEST_HANDLER_SECONDS', 'REQUEST_QUERIES')
+    }
+    app = Flask(__name__)
+    init_app(app)
+    app.extensions['request_timing']['get_widgets'] = 'widgets.get_widgets'
+
+    @app.route('/widgets')
+    def get_widgets():
+        request_timing = timing._request_timing.get()
+        request_timing.db_seconds += 0.5
+        request_timing.serialization_seconds += 0.25
+        request_timing.queries += 2
+        return {'widgets': []}
+
+    client = app.test_client()
+    client.get('/widgets')
+    client.get('/unknown')
+
+    for metric in metrics.values():
+        metric.labels.assert_called_once_with('widgets.get_widgets')
+    metrics['REQUEST_SECONDS'].labels().observe.assert_called_once_with(2.0)
+    metrics['REQUEST_DB_SECONDS'].labels().observe.assert_called_once_with(0.5)
+    metrics['REQUEST_SERIALIZATION_SECONDS'].labels().observe.assert_called_once_with(0.25)
+    metrics['REQUEST_HANDLER_SECONDS'].labels().observe.assert_called_once_with(1.25)
+    metrics['REQUEST_QUERIES'].labels().observe.assert_called_once_with(2)
+    assert timing._request_timing.get() is None
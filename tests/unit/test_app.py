@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+""" Tests for the creation of the app. """
+
+import subprocess
+import sys
+
+import click
+
+from flask import Flask
+
+from sayan_service.app import in_cli, register_commands
+
+
+def test_worker_imports():
+    """test_worker_imports
+
+    Tests that creating the app outside of the command line interface, as a worker does, does not
+    import the modules that only the command line interface uses.
+    """
+    script = (
+        'import sys; from sayan_service.app import create_app; create_app(); '
+        'print(sorted({"alembic", "flask_migrate", "sayan_service.commands"} & set(sys.modules)))'
+    )
+
+    output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+
+    assert output.split('\n')[-2] == '[]'
+
+
+def test_register_commands():
+    """test_register_commands
+
+    Tests that the command line interface is detected, and that it gets its commands and the
+    migrations extension.
+    """
+    app = Flask(__name__)
+    assert not in_cli()
+    with click.Context(click.Command('flask')):
+        assert in_cli()
+
+    register_commands(app)
+
+    assert {'seed', 'profile-imports'} <= set(app.cli.commands)
+    assert 'migrate' in app.extensions
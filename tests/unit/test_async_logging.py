@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+""" Tests for queue-backed logging. """
+
+import io
+import json
+import logging
+import queue
+
+import pytest
+import structlog
+
+from sayan_service import async_logging
+from sayan_service.async_logging import BatchingQueueListener, QueueLogHandler
+
+
+def _record(msg, *args, level=logging.INFO):
+    """_record
+
+    Returns a log record from a stdlib logger.
+
+    :param msg:
+        The message of the record.
+    :param args:
+        The arguments of the message.
+    :param level:
+        The level of the record.
+    """
+    return logging.LogRecord('test', level, __file__, 1, msg, args, None)
+
+
+def test_queue_log_handler_drop():
+    """test_queue_log_handler_drop
+
+    Tests that records are dropped and counted when the queue is full, with the drop policy.
+    """
+    log_queue = queue.Queue(maxsize=2)
+    handler = QueueLogHandler(log_queue, policy='drop')
+
+    for index in range(5):
+        handler.handle(_record('message %d', index))
+
+    assert log_queue.qsize() == 2
+    assert handler.dropped == 3
+
+
+def test_queue_log_handler_block(mocker):
+    """test_queue_log_handler_block
+
+    Tests that the caller waits for room on the queue with the block policy.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    log_queue = mocker.Mock()
+    handler = QueueLogHandler(log_queue, policy='block')
+    record = _record('message')
+
+    handler.handle(record)
+
+    log_queue.put.assert_called_once_with(record)
+
+
+def test_queue_log_handler_unknown_policy():
+    """test_queue_log_handler_unknown_policy
+
+    Tests that an unknown policy is rejected.
+    """
+    with pytest.raises(ValueError):
+        QueueLogHandler(queue.Queue(), policy='spill')
+
+
+def test_queue_log_handler_prepare():
+    """test_queue_log_handler_prepare
+
+    Tests that the arguments of stdlib records are merged into the message, and that structlog
+    event dicts are left as they are.
+    """
+    handler = QueueLogHandler(queue.Queue())
+    event_dict = {'event': 'message'}
+
+    stdlib_record = handler.prepare(_record('message %s', 'argument'))
+    structlog_record = handler.prepare(_record(event_dict))
+
+    assert (stdlib_record.msg, stdlib_record.args) == ('message argument', None)
+    assert structlog_record.msg is event_dict
+
+
+def test_batching_queue_listener(mocker):
+    """test_batching_queue_listener
+
+    Tests that the listener writes every queued record in batches, and flushes the queue when
+    stopped.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    log_queue = queue.Queue()
+    stream = io.StringIO()
+    write = mocker.patch.object(stream, 'write', wraps=stream.write)
+    listener = BatchingQueueListener(log_queue, logging.Formatter('%(message)s'), stream, batch_size=4)
+
+    for index in range(10):
+        log_queue.put(_record(f'message {index}'))
+    listener.start()
+    listener.stop()
+
+    assert stream.getvalue().splitlines() == [f'message {index}' for index in range(10)]
+    assert write.call_count == 3
+
+
+def test_start():
+    """test_start
+
+    Tests that the handler returned by ``start`` renders structlog events and stdlib records in the
+    listener, and that ``stop`` writes them.
+    """
+    stream = io.StringIO()
+    handler = async_logging.start(structlog.processors.JSONRenderer(), stream=stream)
+    logger = logging.getLogger('tests.async_logging')
+    logger.addHandler(handler)
+    logger.propagate = False
+
+    try:
+        structlog.wrap_logger(
+            logger,
+            processors=[structlog.stdlib.ProcessorFormatter.wrap_for_formatter],
+            wrapper_class=structlog.stdlib.BoundLogger,
+        ).warning('structured', answer=42)
+        logger.warning('stdlib %s', 'message')
+    finally:
+        async_logging.stop()
+        logger.removeHandler(handler)
+
+    structured, stdlib = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert structured == {'answer': 42, 'event': 'structured'}
+    assert stdlib['event'] == 'stdlib message'
+    assert (stdlib['level'], stdlib['logger']) == ('warning', 'tests.async_logging')
+    assert stdlib['timestamp'].endswith('Z')
+
+
+def test_batching_queue_listener_write_error(mocker):
+    """test_batching_queue_listener_write_error
+
+    Tests that records which cannot be written to the stream are counted.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    errors = mocker.patch('sayan_service.async_logging.LOG_WRITE_ERRORS')
+    stream = mocker.Mock()
+    stream.write.side_effect = OSError('Broken pipe')
+    listener = BatchingQueueListener(queue.Queue(), logging.Formatter('%(message)s'), stream)
+
+    listener._write([_record('first'), _record('second')])
+
+    errors.inc.assert_called_once_with(2)
+
+
+def test_restart_after_fork(mocker):
+    """test_restart_after_fork
+
+    Tests that the queue is replaced, without starting the listener, in a forked process, and that
+    ``restart_after_fork`` starts the listener and writes the records logged since the fork.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    stream = io.StringIO()
+    listener = BatchingQueueListener(queue.Queue(maxsize=10), logging.Formatter('%(message)s'), stream)
+    listener._thread = mocker.Mock()
+    handler = QueueLogHandler(listener.queue)
+    mocker.patch.object(async_logging, '_listener', listener)
+    mocker.patch.object(async_logging, '_handler', handler)
+    inherited = listener.queue
+
+    async_logging._reset_after_fork()
+
+    assert handler.queue is listener.queue is not inherited
+    assert not listener.running
+    handler.emit(_record('after fork'))
+
+    async_logging.restart_after_fork()
+    listener.stop()
+
+    assert handler.queue is listener.queue
+    assert listener.queue.maxsize == 10
+    assert stream.getvalue() == 'after fork\n'
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+""" Tests for the cache backends. """
+
+import threading
+import time
+
+import pytest
+
+from flask import Flask
+from flask_caching import Cache
+from flask_caching.backends import SimpleCache
+
+from sayan_service.cache_backends import LRUCache, TieredCache
+
+
+@pytest.fixture
+def tiered():
+    """tiered
+
+    Returns a tiered cache configured from an app, with a simple cache standing in for the shared
+    tier.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        CACHE_TYPE='sayan_service.cache_backends.TieredCache',
+        CACHE_SHARED_TYPE='flask_caching.backends.SimpleCache',
+        CACHE_LOCAL_MAX_BYTES=4096,
+        CACHE_LOCAL_TTL=5)
+    cache = Cache(app)
+    return app.extensions['cache'][cache]
+
+
+def test_lru_evicts_by_size(mocker):
+    """test_lru_evicts_by_size
+
+    Tests that the LRU cache evicts the least recently used values to stay within its size, rejects
+    values larger than it, and expires values.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    monotonic = mocker.patch('sayan_service.cache_backends.time.monotonic', return_value=100.0)
+    cache = LRUCache(max_bytes=300, default_timeout=10)
+
+    cache.set('a', b'x' * 100)
+    cache.set('b', b'x' * 100)
+    assert cache.get('a') == b'x' * 100
+    cache.set('c', b'x' * 100)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == cache.get('c') == b'x' * 100
+    assert cache.size <= 300
+    assert not cache.set('d', b'x' * 400)
+    assert not cache.add('a', b'y')
+
+    monotonic.return_value = 110.0
+    assert cache.get('a') is None
+    assert not cache.has('c')
+
+
+def test_tiers(tiered, mocker):
+    """test_tiers
+
+    Tests that values are read from the local tier when they are in it, and copied into it from the
+    shared tier otherwise.
+
+    :param tiered:
+        A tiered cache
+    :param mocker:
+        A pytest-mock fixture
+    """
+    assert isinstance(tiered, TieredCache)
+    assert isinstance(tiered.shared, SimpleCache)
+    shared_get = mocker.spy(tiered.shared, 'get')
+
+    tiered.set('key', {'value': 1})
+    assert tiered.get('key') == {'value': 1}
+    shared_get.assert_not_called()
+
+    tiered.local.clear()
+    assert tiered.get('key') == {'value': 1}
+    assert tiered.get('key') == {'value': 1}
+    shared_get.assert_called_once_with('key')
+
+    tiered.local.clear()
+    assert tiered.get_many('key', 'missing') == [{'value': 1}, None]
+    assert tiered.local.get('key') == {'value': 1}
+
+    tiered.delete('key')
+    assert tiered.get('key') is None
+    assert tiered.shared.get('key') is None
+
+
+def test_local_ttl(tiered, mocker):
+    """test_local_ttl
+
+    Tests that values are kept in the local tier for at most `CACHE_LOCAL_TTL` seconds, after which
+    they are read from the shared tier again.
+
+    :param tiered:
+        A tiered cache
+    :param mocker:
+        A pytest-mock fixture
+    """
+    monotonic = mocker.patch('sayan_service.cache_backends.time.monotonic', return_value=100.0)
+    tiered.set('key', 'value', timeout=0)
+    tiered.shared.set('key', 'changed', timeout=0)
+
+    assert tiered.get('key') == 'value'
+    monotonic.return_value = 106.0
+    assert tiered.get('key') == 'changed'
+
+
+@pytest.mark.parametrize('result', [False, [True, False], ['a']])
+def test_set_many_rejected(tiered, mocker, result):
+    """test_set_many_rejected
+
+    Tests that only the keys that the shared tier accepted are written to the local tier, and that
+    the local copies of the others are evicted, whichever way the backend reports the result.
+
+    :param tiered:
+        A tiered cache
+    :param mocker:
+        A pytest-mock fixture
+    :param result:
+        The result of the shared tier's `set_many`
+    """
+    tiered.set_many({'a': 1, 'b': 1})
+    mocker.patch.object(tiered.shared, 'set_many', return_value=result)
+
+    assert tiered.set_many({'a': 2, 'b': 2}) == result
+
+    assert tiered.local.get('a') == (None if result is False else 2)
+    assert tiered.local.get('b') is None
+
+
+def test_get_or_set_single_flight(tiered):
+    """test_get_or_set_single_flight
+
+    Tests that concurrent calls for the same missing key load it once, and all return its value.
+
+    :param tiered:
+        A tiered cache
+    """
+    calls = []
+    barrier = threading.Barrier(200)
+    results = []
+
+    def load():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'value'
+
+    def worker():
+        barrier.wait()
+        results.append(tiered.get_or_set('key', load))
+
+    threads = [threading.Thread(target=worker) for _ in range(200)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['value'] * 200
+    assert tiered.shared.get('key') == 'value'
+    assert not tiered._flights
+
+
+def test_get_or_set_error(tiered):
+    """test_get_or_set_error
+
+    Tests that an error loading a value is raised to the waiting calls, and that the next call
+    loads it again.
+
+    :param tiered:
+        A tiered cache
+    """
+    started = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def fail():
+        started.set()
+        release.wait()
+        raise KeyError('key')
+
+    def worker(load):
+        try:
+            tiered.get_or_set('key', load)
+        except KeyError as exc:
+            errors.append(exc)
+
+    leader = threading.Thread(target=worker, args=(fail,))
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=worker, args=(lambda: 'unexpected',))
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert len(errors) == 2
+    assert errors[0] is errors[1]
+    assert tiered.get_or_set('key', lambda: 'value') == 'value'
@@ -0,0 +1,687 @@
+# -*- coding: utf-8 -*-
+""" Tests for the database module. """
+
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pytest
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.orm import Query
+from sqlalchemy.orm.util import identity_key
+
+from sayan_service.database import (
+    _CACHED_NOT_FOUND,
+    Column,
+    InvalidCursorError,
+    InvalidFieldsError,
+    Model,
+    RecordInvalidError,
+    RecordNotFoundError,
+    _after_commit,
+    _after_flush,
+    _after_rollback,
+    _batched,
+    _lookup_statement,
+    db,
+    relationship,
+)
+from sayan_service.prepared_statements import prepare
+
+
+class Widget(Model):
+    """Widget
+
+    A concrete model used as the subject of tests that compile statements. Its table is never
+    created.
+    """
+
+    __tablename__ = 'test_widgets'
+
+    name = Column(db.String(64), nullable=False)
+
+
+class Gadget(Model):
+    """Gadget
+
+    A concrete model with a relationship, used as the subject of tests that compile statements.
+    Its table is never created.
+    """
+
+    __tablename__ = 'test_gadgets'
+
+    widget_id = Column(db.BigInteger, db.ForeignKey('test_widgets.id'))
+    size = Column(db.Integer)
+    widget = db.relationship(Widget)
+
+
+def test__batched():
+    """test__batched
+
+    Tests that the ``_batched`` function splits an iterable into lists of at most ``batch_size``
+    items, preserving order.
+    """
+    expected_batches = [[0, 1, 2], [3, 4, 5], [6]]
+
+    actual_batches = list(_batched(iter(range(7)), 3))
+
+    assert actual_batches == expected_batches
+
+
+def test__batched_empty():
+    """test__batched_empty
+
+    Tests that the ``_batched`` function yields nothing for an empty iterable.
+    """
+    assert list(_batched([], 3)) == []
+
+
+@pytest.fixture
+def bulk_session(mocker):
+    """bulk_session
+
+    Returns a mock session that records the statements executed by the bulk helpers, without
+    executing them.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    session = mocker.patch.object(db, 'session')
+    session.execute.return_value = []
+    return session
+
+
+def _compiled(session):
+    """_compiled
+
+    Returns the SQL and parameters of each statement executed with the session, compiled with the
+    PostgreSQL dialect.
+
+    :param session:
+        The mock session
+    """
+    compiled = [call.args[0].compile(dialect=postgresql.dialect()) for call in session.execute.call_args_list]
+    return [(str(statement), statement.params) for statement in compiled]
+
+
+def test_bulk_create(bulk_session):
+    """test_bulk_create
+
+    Tests that ``Model.bulk_create`` inserts each batch of rows with a multi-row ``INSERT``
+    statement that returns the inserted rows.
+
+    :param bulk_session:
+        The mock session
+    """
+    Widget.bulk_create([{'name': 'a'}, {'name': 'b'}, {'name': 'c'}], batch_size=2, commit=False)
+
+    returning = (
+        'RETURNING test_widgets.id, test_widgets.uuid, test_widgets.created_at, test_widgets.updated_at, '
+        'test_widgets.name')
+    assert _compiled(bulk_session) == [
+        (f'INSERT INTO test_widgets (name) VALUES (%(name_m0)s), (%(name_m1)s) {returning}',
+         {'name_m0': 'a', 'name_m1': 'b'}),
+        (f'INSERT INTO test_widgets (name) VALUES (%(name_m0)s) {returning}', {'name_m0': 'c'}),
+    ]
+    bulk_session.commit.assert_not_called()
+
+
+def test_bulk_create_mismatched_keys(bulk_session):
+    """test_bulk_create_mismatched_keys
+
+    Tests that ``Model.bulk_create`` rolls back and raises a ``RecordInvalidError`` naming the
+    first row whose keys differ from those of the first row, rather than inserting NULLs.
+
+    :param bulk_session:
+        The mock session
+    """
+    rows = [{'name': 'a'}, {'name': 'b'}, {'name': 'c', 'uuid': 'u'}]
+
+    with pytest.raises(RecordInvalidError) as error:
+        Widget.bulk_create(rows, batch_size=2)
+
+    assert str(error.value) == (
+        'Row 2 of Widget records has the keys name, uuid rather than name; all rows must have the same keys.')
+    assert bulk_session.execute.call_count == 1
+    bulk_session.rollback.assert_called_once_with()
+
+
+def test_upsert(bulk_session):
+    """test_upsert
+
+    Tests that ``Model.upsert`` sends each batch as an ``INSERT ... ON CONFLICT DO UPDATE``
+    statement that updates every attribute but the conflict columns, and sends only the last of
+    the rows of a batch with the same conflict values.
+
+    :param bulk_session:
+        The mock session
+    """
+    rows = [{'uuid': 'u1', 'name': 'a'}, {'uuid': None, 'name': 'b'}, {'uuid': 'u1', 'name': 'c'},
+            {'uuid': None, 'name': 'd'}]
+
+    Widget.upsert(rows, commit=False)
+
+    [(sql, params)] = _compiled(bulk_session)
+    assert sql.startswith(
+        'INSERT INTO test_widgets (uuid, name) VALUES (%(uuid_m0)s, %(name_m0)s), (%(uuid_m1)s, %(name_m1)s), '
+        '(%(uuid_m2)s, %(name_m2)s) ON CONFLICT (uuid) DO UPDATE SET updated_at = now(), name = excluded.name '
+        'RETURNING test_widgets.id, ')
+    assert params == {
+        'uuid_m0': 'u1', 'name_m0': 'c', 'uuid_m1': None, 'name_m1': 'b', 'uuid_m2': None, 'name_m2': 'd'}
+
+
+def test_upsert_cardinality_violation(mocker, bulk_session):
+    """test_upsert_cardinality_violation
+
+    Tests that ``Model.upsert`` rolls back and raises a ``RecordInvalidError`` when PostgreSQL
+    rejects a batch that would update the same record twice.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param bulk_session:
+        The mock session
+    """
+    bulk_session.execute.side_effect = ProgrammingError('INSERT ...', {}, mocker.Mock(pgcode='21000'))
+
+    with pytest.raises(RecordInvalidError):
+        Widget.upsert([{'uuid': 'u1', 'name': 'a'}])
+
+    bulk_session.rollback.assert_called_once_with()
+
+
+def test_bulk_update(bulk_session):
+    """test_bulk_update
+
+    Tests that ``Model.bulk_update`` sends each batch as an ``UPDATE ... FROM (VALUES ...)``
+    statement that matches the rows to records by their key, and casts the values to the types of
+    the columns.
+
+    :param bulk_session:
+        The mock session
+    """
+    Widget.bulk_update([{'uuid': 'u1', 'name': 'a'}, {'uuid': 'u2', 'name': 'b'}], commit=False)
+
+    [(sql, params)] = _compiled(bulk_session)
+    assert sql.startswith(
+        'UPDATE test_widgets SET updated_at=now(), name=CAST(bulk_rows.name AS VARCHAR(64)) '
+        'FROM (VALUES (%(param_1)s, %(param_2)s), (%(param_3)s, %(param_4)s)) AS bulk_rows (uuid, name) '
+        'WHERE test_widgets.uuid = CAST(bulk_rows.uuid AS UUID) RETURNING test_widgets.id, ')
+    assert params == {'param_1': 'u1', 'param_2': 'a', 'param_3': 'u2', 'param_4': 'b'}
+
+
+def test__ordered_or_raise():
+    """test__ordered_or_raise
+
+    Tests that the ``Model._ordered_or_raise`` method returns records in the order of the given
+    keys, including duplicates.
+    """
+    found = {1: 'one', 2: 'two'}
+    keys = {'2': 2, 1: 1}
+
+    actual_records = Model._ordered_or_raise(['2', 1, '2'], keys, found, 'IDs')
+
+    assert actual_records == ['two', 'one', 'two']
+
+
+def test__ordered_or_raise_missing():
+    """test__ordered_or_raise_missing
+
+    Tests that the ``Model._ordered_or_raise`` method raises a single ``RecordNotFoundError`` that
+    names every invalid or missing key.
+    """
+    found = {1: 'one'}
+    keys = {1: 1, 3: 3}
+
+    with pytest.raises(RecordNotFoundError) as error:
+        Model._ordered_or_raise([1, 'abc', 3], keys, found, 'IDs')
+
+    assert str(error.value) == 'Model with IDs abc, 3 does not exist.'
+
+
+def test_get_many_by_id_identity_map(mocker):
+    """test_get_many_by_id_identity_map
+
+    Tests that the ``Model.get_many_by_id`` method returns records loaded into the session without
+    a query, and fetches only the others.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    loaded, fetched = Widget(id=1), Widget(id=2)
+    mocker.patch.object(db, 'session', identity_map={identity_key(Widget, 1): loaded})
+    mocker.patch.object(Widget, '_is_loaded', return_value=True)
+    lookup_many = mocker.patch.object(Widget, '_lookup_many', return_value=[fetched])
+
+    actual_records = Widget.get_many_by_id([2, '1', 2])
+
+    assert actual_records == [fetched, loaded, fetched]
+    lookup_many.assert_called_once_with('id', [2])
+
+
+def test_get_many_by_id_all_loaded(mocker):
+    """test_get_many_by_id_all_loaded
+
+    Tests that the ``Model.get_many_by_id`` method does not query when every record is loaded.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    loaded = Widget(id=1)
+    mocker.patch.object(db, 'session', identity_map={identity_key(Widget, 1): loaded})
+    mocker.patch.object(Widget, '_is_loaded', return_value=True)
+    lookup_many = mocker.patch.object(Widget, '_lookup_many')
+
+    assert Widget.get_many_by_id([1]) == [loaded]
+    lookup_many.assert_not_called()
+
+
+def test_get_many_by_uuid_missing(mocker):
+    """test_get_many_by_uuid_missing
+
+    Tests that the ``Model.get_many_by_uuid`` method fetches every record with a single query, and
+    raises a ``RecordNotFoundError`` naming the invalid and missing UUIDs.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    found_uuid, missing_uuid = '6d3c6e36-4a3b-4d0c-9e1e-0a1a2b3c4d5e', '0f0e0d0c-0b0a-4090-8070-605040302010'
+    lookup_many = mocker.patch.object(Widget, '_lookup_many', return_value=[Widget(uuid=found_uuid)])
+
+    with pytest.raises(RecordNotFoundError) as error:
+        Widget.get_many_by_uuid([found_uuid, 'abc', missing_uuid])
+
+    assert str(error.value) == f'Widget with UUIDs abc, {missing_uuid} does not exist.'
+    assert lookup_many.call_count == 1
+    assert lookup_many.call_args[0][0] == 'uuid'
+    assert sorted(lookup_many.call_args[0][1]) == sorted([found_uuid, missing_uuid])
+
+
+@pytest.mark.parametrize('key_name, many, criterion', [
+    ('id', False, 'test_widgets.id = $1'),
+    ('uuid', False, 'test_widgets.uuid = $1'),
+    ('id', True, 'test_widgets.id = ANY (CAST($1::BIGINT[] AS BIGINT[]))'),
+    ('uuid', True, 'test_widgets.uuid = ANY (CAST($1::VARCHAR[] AS UUID[]))'),
+])
+def test__lookup_statement_prepare(mocker, key_name, many, criterion):
+    """test__lookup_statement_prepare
+
+    Tests that each lookup statement, compiled with the PostgreSQL dialect, is prepared with its
+    parameter declared with the type that psycopg2 sends it as, which for an array of UUIDs is an
+    array of strings, and executed with that parameter.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param key_name:
+        The name of the identifying column
+    :param many:
+        Whether the statement looks up an array of values
+    :param criterion:
+        The expected criterion of the prepared statement
+    """
+    mocker.patch('sayan_service.prepared_statements.DB_STATEMENTS_PREPARED')
+    cursor = mocker.Mock()
+    statement = str(_lookup_statement(Widget, key_name, many).compile(dialect=postgresql.dialect()))
+
+    execute = prepare(cursor, statement)
+
+    assert cursor.execute.call_args.args[0].endswith(f'WHERE {criterion}')
+    assert execute.endswith(f' (%({key_name})s)')
+
+
+def test__cached_get_disabled(mocker):
+    """test__cached_get_disabled
+
+    Tests that the ``Model._cached_get`` method loads from the database without consulting the
+    cache when ``__cache_ttl__`` is not set.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    cache = mocker.patch('sayan_service.database.cache')
+    load = mocker.Mock(return_value='record')
+
+    actual_result = Model._cached_get('id', 1, load)
+
+    load.assert_called_once_with()
+    cache.get.assert_not_called()
+    assert actual_result == 'record'
+
+
+def test__cached_get_hit(mocker):
+    """test__cached_get_hit
+
+    Tests that the ``Model._cached_get`` method returns a cached record without loading from the
+    database.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(Model, '__cache_ttl__', 60)
+    mocker.patch.object(Model, '_cache_key', return_value='key')
+    _from_cache = mocker.patch.object(Model, '_from_cache', return_value='record')
+    cache = mocker.patch('sayan_service.database.cache')
+    cache.get.return_value = {'id': 1}
+    load = mocker.Mock()
+
+    actual_result = Model._cached_get('id', 1, load)
+
+    cache.get.assert_called_once_with('key')
+    _from_cache.assert_called_once_with({'id': 1})
+    load.assert_not_called()
+    assert actual_result == 'record'
+
+
+def test__cached_get_negative(mocker):
+    """test__cached_get_negative
+
+    Tests that the ``Model._cached_get`` method caches a missing record for
+    ``__cache_negative_ttl__`` seconds, and serves that result from the cache afterwards.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(Model, '__cache_ttl__', 60)
+    mocker.patch.object(Model, '_cache_key', return_value='key')
+    cache = mocker.patch('sayan_service.database.cache')
+    cache.get.return_value = None
+    load = mocker.Mock(return_value=None)
+
+    assert Model._cached_get('id', 1, load) is None
+
+    cache.set.assert_called_once_with('key', _CACHED_NOT_FOUND, timeout=Model.__cache_negative_ttl__)
+    cache.get.return_value = _CACHED_NOT_FOUND
+    assert Model._cached_get('id', 1, load) is None
+    load.assert_called_once_with()
+
+
+def test_save_evicts_on_commit(mocker):
+    """test_save_evicts_on_commit
+
+    Tests that ``Model.save`` with ``commit=False`` evicts the record from the entity cache only
+    when a later commit of the transaction succeeds, including the ``id`` assigned by the flush.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    session = mocker.patch('sayan_service.database.db').session
+    session.info = {}
+    cache = mocker.patch('sayan_service.database.cache')
+    mocker.patch('sayan_service.database.response_cache')
+    record = mocker.Mock(__cache_ttl__=60)
+    record._response_tags.return_value = []
+    record._evict_on_commit = lambda: Model._evict_on_commit(record)
+    record._cache_keys.return_value = ['model.pets.uuid.u']
+
+    Model.save(record, commit=False)
+    record._cache_keys.return_value = ['model.pets.id.1', 'model.pets.uuid.u']
+    _after_flush(session, None)
+
+    session.commit.assert_not_called()
+    cache.delete_many.assert_not_called()
+
+    _after_commit(session)
+
+    cache.delete_many.assert_called_once()
+    assert set(cache.delete_many.call_args.args) == {'model.pets.id.1', 'model.pets.uuid.u'}
+    assert session.info == {}
+
+
+def test_save_rollback_keeps_cache(mocker):
+    """test_save_rollback_keeps_cache
+
+    Tests that the entity cache keys queued by ``Model.save`` are dropped, and nothing is evicted,
+    when the transaction is rolled back.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    session = mocker.patch('sayan_service.database.db').session
+    session.info = {}
+    cache = mocker.patch('sayan_service.database.cache')
+    record = mocker.Mock(__cache_ttl__=60)
+    record._cache_keys.return_value = ['model.pets.id.1']
+
+    Model._evict_on_commit(record)
+    _after_rollback(session)
+    _after_commit(session)
+
+    cache.delete_many.assert_not_called()
+    assert session.info == {}
+
+
+def test_field_options_all():
+    """test_field_options_all
+
+    Tests that the ``Model.field_options`` method returns no loader options when no fieldset is
+    requested.
+    """
+    assert Model.field_options(None) == []
+
+
+def test_field_options_unknown(mocker):
+    """test_field_options_unknown
+
+    Tests that the ``Model.field_options`` method raises an ``InvalidFieldsError`` that names every
+    field the model does not expose, including the internal ``id``.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(Model, '_attribute_keys', return_value=['id', 'uuid', 'name'])
+
+    with pytest.raises(InvalidFieldsError) as error:
+        Model.field_options(['name', 'size', 'id'])
+
+    assert str(error.value) == 'Model has no fields id, size.'
+
+
+def _loaders(query):
+    """_loaders
+
+    Returns the loader strategy of each attribute that a query's options set, by attribute name.
+
+    :param query:
+        The query
+    """
+    attributes = query._compile_context().attributes
+    return {
+        getattr(key[1][1], 'key', key[1][1]): loader.strategy
+        for key, loader in attributes.items() if isinstance(key, tuple) and key[0] == 'loader'
+    }
+
+
+def test_field_options_columns():
+    """test_field_options_columns
+
+    Tests that the ``Model.field_options`` method loads only the requested columns, the primary key
+    and the columns in ``include``, and leaves relationships to load lazily.
+    """
+    query = Query(Gadget).options(*Gadget.field_options(['size'], include=[Gadget.uuid]))
+
+    assert str(query.statement.compile(dialect=postgresql.dialect())) == (
+        'SELECT test_gadgets.id, test_gadgets.uuid, test_gadgets.size \nFROM test_gadgets')
+    assert 'widget' not in _loaders(query)
+
+
+def test_field_options_relationships():
+    """test_field_options_relationships
+
+    Tests that the ``Model.field_options`` method loads a requested relationship with a
+    ``selectinload``, along with the columns that join to it.
+    """
+    query = Query(Gadget).options(*Gadget.field_options(['size', 'widget']))
+
+    assert str(query.statement.compile(dialect=postgresql.dialect())) == (
+        'SELECT test_gadgets.id, test_gadgets.widget_id, test_gadgets.size \nFROM test_gadgets')
+    assert _loaders(query)['widget'] == (('lazy', 'selectin'),)
+
+
+def test_field_options_only_relationships():
+    """test_field_options_only_relationships
+
+    Tests that the ``Model.field_options`` method loads the join columns, and no other, when only
+    relationships are requested.
+    """
+    query = Query(Gadget).options(*Gadget.field_options(['widget']))
+
+    assert str(query.statement.compile(dialect=postgresql.dialect())) == (
+        'SELECT test_gadgets.id, test_gadgets.widget_id \nFROM test_gadgets')
+
+
+def test_to_dict_fields():
+    """test_to_dict_fields
+
+    Tests that the ``Model.to_dict`` method includes only the requested fields, and raises an
+    ``InvalidFieldsError`` that names every field the model does not have.
+    """
+    gadget = Gadget(id=1, size=3, widget_id=2)
+
+    assert gadget.to_dict(['size', 'id']) == {'id': 1, 'size': 3}
+    with pytest.raises(InvalidFieldsError) as error:
+        gadget.to_dict(['size', 'colour', 'weight'])
+    assert str(error.value) == 'Gadget has no fields colour, weight.'
+
+
+def test_loader_strategies():
+    """test_loader_strategies
+
+    Tests that a model's relationships are created again with the loader strategies it declares,
+    keeping their other arguments.
+    """
+    part = type('Part', (Model,), {
+        '__tablename__': 'test_parts',
+        '__loader_strategies__': {'widget': 'joined'},
+        'widget_id': Column(db.BigInteger, db.ForeignKey('test_widgets.id')),
+        'widget': relationship(Widget, innerjoin=True),
+    })
+
+    prop = part.__mapper__.relationships['widget']
+    assert (prop.lazy, prop.innerjoin) == ('joined', True)
+    assert part.widget.property is prop
+    assert 'JOIN test_widgets AS test_widgets_1' in str(Query(part).statement.compile(dialect=postgresql.dialect()))
+
+
+@pytest.mark.parametrize('strategies, owner', [
+    ({'name': 'selectin'}, relationship('Owner')),
+    ({'owner': 'eager'}, relationship('Owner')),
+    ({'owner': 'selectin'}, db.relationship('Owner')),
+])
+def test_loader_strategies_invalid(strategies, owner):
+    """test_loader_strategies_invalid
+
+    Tests that a model cannot declare a loader strategy for an attribute that is not one of its
+    relationships, an unknown loader strategy, or a strategy for a relationship that was not
+    declared with ``relationship`` from the database module.
+
+    :param strategies:
+        The `__loader_strategies__` of the model
+    :param owner:
+        The relationship of the model
+    """
+    with pytest.raises(ValueError):
+        type('Pet', (Model,), {
+            '__tablename__': 'pets',
+            '__loader_strategies__': strategies,
+            'name': db.Column(db.String),
+            'owner': owner,
+        })
+
+
+def test__encode_cursor_round_trip(app, mocker):
+    """test__encode_cursor_round_trip
+
+    Tests that a cursor created by ``Model._encode_cursor`` decodes to the position of the given
+    record, including datetime values.
+
+    :param app:
+        The application fixture.
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(Model, '__tablename__', 'models', create=True)
+    created_at = datetime(2021, 6, 1, 12, 30)
+    record = mocker.Mock(created_at=created_at, id=42)
+    order_by = (db.column('created_at', db.DateTime), db.column('id', db.BigInteger))
+
+    cursor = Model._encode_cursor(record, order_by)
+
+    assert Model._decode_cursor(cursor, order_by) == [created_at, 42]
+
+
+@pytest.mark.parametrize('column_type, value', [
+    (db.Date, date(2021, 6, 1)),
+    (db.Time, time(12, 30, 15, 500)),
+    (db.Numeric(12, 2), Decimal('19.99')),
+    (db.Float, 1.5),
+    (db.String, 'widget'),
+    (db.Date, None),
+])
+def test__encode_cursor_round_trip_types(app, mocker, column_type, value):
+    """test__encode_cursor_round_trip_types
+
+    Tests that cursors for orderings by date, time, numeric and other columns decode to the values
+    of the given record, with their types.
+
+    :param app:
+        The application fixture.
+    :param mocker:
+        A pytest-mock fixture
+    :param column_type:
+        The type of the ordering column
+    :param value:
+        The value of the ordering column
+    """
+    mocker.patch.object(Model, '__tablename__', 'models', create=True)
+    record = mocker.Mock(value=value, id=42)
+    order_by = (db.column('value', column_type), db.column('id', db.BigInteger))
+
+    position = Model._decode_cursor(Model._encode_cursor(record, order_by), order_by)
+
+    assert position == [value, 42]
+    assert type(position[0]) is type(value)
+
+
+def test__decode_cursor_tampered(app, mocker):
+    """test__decode_cursor_tampered
+
+    Tests that ``Model._decode_cursor`` raises an ``InvalidCursorError`` for a cursor that has been
+    modified or was issued for a different ordering.
+
+    :param app:
+        The application fixture.
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(Model, '__tablename__', 'models', create=True)
+    record = mocker.Mock(created_at=datetime(2021, 6, 1, 12, 30), id=42)
+    order_by = (db.column('created_at', db.DateTime), db.column('id', db.BigInteger))
+    cursor = Model._encode_cursor(record, order_by)
+
+    with pytest.raises(InvalidCursorError):
+        Model._decode_cursor(cursor[:-1], order_by)
+    with pytest.raises(InvalidCursorError):
+        Model._decode_cursor(cursor, order_by[1:])
+
+
+def test__decode_cursor_other_direction(app, mocker):
+    """test__decode_cursor_other_direction
+
+    Tests that ``Model._decode_cursor`` raises an ``InvalidCursorError`` for a cursor that was
+    issued for the same ordering in the other direction.
+
+    :param app:
+        The application fixture.
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch.object(Model, '__tablename__', 'models', create=True)
+    record = mocker.Mock(created_at=datetime(2021, 6, 1, 12, 30), id=42)
+    order_by = (db.column('created_at', db.DateTime), db.column('id', db.BigInteger))
+    ascending, descending = Model._encode_cursor(record, order_by), Model._encode_cursor(record, order_by, True)
+
+    assert Model._decode_cursor(descending, order_by, True) == [record.created_at, 42]
+    with pytest.raises(InvalidCursorError):
+        Model._decode_cursor(ascending, order_by, True)
+    with pytest.raises(InvalidCursorError):
+        Model._decode_cursor(descending, order_by)
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+""" Tests for HTTP-related helpers. """
+
+import json
+
+from sayan_service.http import http_response, streaming_response
+
+
+class _Serializer:
+    """ A minimal serializer that dumps integers into dicts. """
+
+    def dump(self, items, many=False):
+        return [{'value': item} for item in items]
+
+
+def test_http_response():
+    """test_http_response
+
+    Tests that the ``http_response`` function returns the default Werkzeug message for a status.
+    """
+    assert http_response(404) == ({'message': 'Not Found'}, 404)
+
+
+def test_streaming_response_array(app):
+    """test_streaming_response_array
+
+    Tests that the ``streaming_response`` function streams a valid JSON array, chunk by chunk.
+
+    :param app:
+        The application fixture.
+    """
+    with app.test_request_context():
+        response = streaming_response(iter(range(5)), _Serializer(), chunk_size=2)
+        chunks = list(response.response)
+
+    assert response.mimetype == 'application/json'
+    assert len(chunks) == 4
+    assert json.loads(''.join(chunks)) == [{'value': i} for i in range(5)]
+
+
+def test_streaming_response_empty(app):
+    """test_streaming_response_empty
+
+    Tests that the ``streaming_response`` function streams an empty JSON array when there are no
+    items.
+
+    :param app:
+        The application fixture.
+    """
+    with app.test_request_context():
+        response = streaming_response([], _Serializer())
+        body = ''.join(response.response)
+
+    assert body == '[]'
+
+
+def test_streaming_response_ndjson(app):
+    """test_streaming_response_ndjson
+
+    Tests that the ``streaming_response`` function streams one JSON document per line when
+    ``ndjson`` is set.
+
+    :param app:
+        The application fixture.
+    """
+    with app.test_request_context():
+        response = streaming_response(range(3), _Serializer(), ndjson=True, chunk_size=2)
+        body = ''.join(response.response)
+
+    assert response.mimetype == 'application/x-ndjson'
+    assert body == '{"value":0}\n{"value":1}\n{"value":2}\n'
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+""" Tests for memoization with stampede protection. """
+
+import threading
+import time
+
+import pytest
+
+from flask import Flask
+
+from sayan_service.extensions import cache
+from sayan_service.memoize import memoize
+
+
+@pytest.fixture
+def app():
+    """app
+
+    Returns an app whose cache is an in-process LRU cache, which, unlike the simple cache, adds
+    keys atomically.
+    """
+    app = Flask(__name__)
+    app.config.update(CACHE_TYPE='sayan_service.cache_backends.LRUCache')
+    cache.init_app(app)
+    with app.app_context():
+        yield app
+
+
+def run_concurrently(target, count=200):
+    """run_concurrently
+
+    Calls a function from many threads at once, and returns the values it returned.
+
+    :param target:
+        The function to call.
+    :param count:
+        The number of threads.
+    """
+    barrier = threading.Barrier(count)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(target())
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_hit(app):
+    """test_hit
+
+    Tests that values are cached by the arguments of the function, and can be invalidated.
+
+    :param app:
+        An app with a cache
+    """
+    calls = []
+
+    @memoize(soft_ttl=60, hard_ttl=120)
+    def square(number):
+        calls.append(number)
+        return number * number
+
+    assert [square(2), square(2), square(3), square(number=2)] == [4, 4, 9, 4]
+    assert calls == [2, 3, 2]
+
+    square.invalidate(2)
+    assert square(2) == 4
+    assert calls == [2, 3, 2, 2]
+
+
+def test_concurrent_misses(app):
+    """test_concurrent_misses
+
+    Tests that hundreds of concurrent calls for a missing value compute it once, and that the
+    others wait for it.
+
+    :param app:
+        An app with a cache
+    """
+    calls = []
+
+    @memoize(soft_ttl=60, hard_ttl=120)
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'value'
+
+    assert run_concurrently(compute) == ['value'] * 200
+    assert len(calls) == 1
+
+
+def test_stale_while_revalidate(app):
+    """test_stale_while_revalidate
+
+    Tests that hundreds of concurrent calls for a stale value are all served the stale value at
+    once, while it is recomputed once in the background.
+
+    :param app:
+        An app with a cache
+    """
+    values = iter(['first', 'second'])
+    release = threading.Event()
+    release.set()
+
+    @memoize(soft_ttl=0.05, hard_ttl=120, beta=0)
+    def compute():
+        release.wait()
+        return next(values)
+
+    assert compute() == 'first'
+    time.sleep(0.1)
+    release.clear()
+
+    assert run_concurrently(compute) == ['first'] * 200
+    release.set()
+    deadline = time.monotonic() + 5
+    while compute() != 'second' and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert compute() == 'second'
+
+
+def test_revalidate_in_caller(app):
+    """test_revalidate_in_caller
+
+    Tests that without `stale_while_revalidate`, a stale value is recomputed by one caller while
+    the others are served the stale value.
+
+    :param app:
+        An app with a cache
+    """
+    values = iter(['first', 'second'])
+
+    @memoize(soft_ttl=0.05, hard_ttl=120, beta=0, stale_while_revalidate=False)
+    def compute():
+        time.sleep(0.1)
+        return next(values)
+
+    assert compute() == 'first'
+    time.sleep(0.1)
+    results = run_concurrently(compute)
+
+    assert sorted(set(results)) == ['first', 'second']
+    assert results.count('second') == 1
+    assert compute() == 'second'
+
+
+def test_early_expiration(app, mocker):
+    """test_early_expiration
+
+    Tests that a value is recomputed before its soft TTL when the random draw says so.
+
+    :param app:
+        An app with a cache
+    :param mocker:
+        A pytest-mock fixture
+    """
+    values = iter(['first', 'second'])
+    draw = mocker.patch('sayan_service.memoize.random.random', return_value=0.0)
+
+    @memoize(soft_ttl=60, hard_ttl=120, beta=100, stale_while_revalidate=False)
+    def compute():
+        time.sleep(0.05)
+        return next(values)
+
+    assert compute() == 'first'
+    assert compute() == 'first'
+    draw.return_value = 1 - 1e-12
+    assert compute() == 'second'
+
+
+def test_invalid_ttls():
+    """test_invalid_ttls
+
+    Tests that the soft TTL must be positive and at most the hard TTL.
+    """
+    with pytest.raises(ValueError):
+        memoize(soft_ttl=60, hard_ttl=30)
+    with pytest.raises(ValueError):
+        memoize(soft_ttl=0, hard_ttl=30)
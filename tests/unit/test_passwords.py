@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+""" Tests for password hashing. """
+
+import threading
+
+import pytest
+
+from flask import Flask
+
+from sayan_service.extensions import bcrypt
+from sayan_service.passwords import PasswordHasher
+
+
+@pytest.fixture
+def passwords():
+    """passwords
+
+    Returns a password hasher configured with the minimum bcrypt cost.
+    """
+    app = Flask(__name__)
+    app.config.update(BCRYPT_LOG_ROUNDS=4, BCRYPT_POOL_SIZE=1)
+    bcrypt.init_app(app)
+    hasher = PasswordHasher()
+    hasher.init_app(app)
+    return hasher
+
+
+def test_hash_and_verify(passwords):
+    """test_hash_and_verify
+
+    Tests that passwords are hashed with the configured cost, and verified, in the pool's threads.
+
+    :param passwords:
+        A password hasher
+    """
+    pw_hash = passwords.hash('hunter2')
+
+    assert pw_hash.startswith('$2b$04$')
+    assert passwords.verify(pw_hash, 'hunter2')
+    assert not passwords.verify(pw_hash, 'hunter3')
+    assert passwords._run('verify', lambda: threading.current_thread().name).startswith('bcrypt')
+
+
+def test_verify_and_update(passwords):
+    """test_verify_and_update
+
+    Tests that a verified password is hashed again when the configured cost has changed.
+
+    :param passwords:
+        A password hasher
+    """
+    pw_hash = passwords.hash('hunter2')
+    assert passwords.verify_and_update(pw_hash, 'hunter2') == (True, None)
+
+    passwords.rounds = 5
+    valid, new_hash = passwords.verify_and_update(pw_hash, 'hunter2')
+
+    assert valid
+    assert new_hash.startswith('$2b$05$')
+    assert passwords.verify(new_hash, 'hunter2')
+    assert passwords.verify_and_update(pw_hash, 'hunter3') == (False, None)
+
+
+def test_pool_per_process(passwords, mocker):
+    """test_pool_per_process
+
+    Tests that the pool is created again in a forked worker.
+
+    :param passwords:
+        A password hasher
+    :param mocker:
+        A pytest-mock fixture
+    """
+    pool = passwords._get_pool()
+    assert passwords._get_pool() is pool
+
+    mocker.patch('sayan_service.passwords.os.getpid', return_value=-1)
+    assert passwords._get_pool() is not pool
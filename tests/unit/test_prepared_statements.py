@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+""" Tests for server-side prepared statements. """
+
+import re
+
+import sqlalchemy
+
+from sayan_service import prepared_statements
+from sayan_service.prepared_statements import PREPARE_OPTION, _before_cursor_execute, prepare
+
+
+def test_prepare(mocker):
+    """test_prepare
+
+    Tests that a statement is prepared with positional parameters, each named parameter numbered
+    once, and escaped percent signs unescaped, and that its `EXECUTE` passes the named parameters.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.prepared_statements.DB_STATEMENTS_PREPARED')
+    cursor = mocker.Mock()
+    statement = (
+        "SELECT * FROM widgets WHERE name LIKE 'a%%' AND (id = %(id)s OR parent_id = %(id)s) AND size > %(size)s")
+
+    execute = prepare(cursor, statement)
+
+    name = execute.split()[1]
+    assert name.startswith('sayan_service_')
+    assert execute == f'EXECUTE {name} (%(id)s, %(size)s)'
+    cursor.execute.assert_called_once_with(
+        f"PREPARE {name} AS SELECT * FROM widgets WHERE name LIKE 'a%' AND (id = $1 OR parent_id = $1) AND size > $2")
+    assert re.fullmatch(r'EXECUTE sayan_service_\w+', prepare(cursor, 'SELECT 1'))
+
+
+def test_before_cursor_execute(mocker):
+    """test_before_cursor_execute
+
+    Tests that only statements marked with the option on psycopg2 connections are prepared, and
+    that each is prepared once per connection.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    prepare = mocker.patch('sayan_service.prepared_statements.prepare', return_value='EXECUTE prepared (%(id)s)')
+    conn = mocker.Mock(info={})
+    conn.dialect.driver = 'psycopg2'
+    context = mocker.Mock(execution_options={PREPARE_OPTION: True})
+    unmarked = mocker.Mock(execution_options={})
+    statement, parameters = 'SELECT * FROM widgets WHERE id = %(id)s', {'id': 1}
+
+    for _ in range(2):
+        assert _before_cursor_execute(conn, 'cursor', statement, parameters, context, False) == (
+            'EXECUTE prepared (%(id)s)', parameters)
+    assert _before_cursor_execute(conn, 'cursor', statement, parameters, unmarked, False) == (statement, parameters)
+    assert _before_cursor_execute(conn, 'cursor', statement, [parameters], context, True) == (statement, [parameters])
+    conn.dialect.driver = 'pysqlite'
+    assert _before_cursor_execute(conn, 'cursor', statement, parameters, context, False) == (statement, parameters)
+
+    prepare.assert_called_once_with('cursor', statement)
+
+
+def test_init_app_disabled(mocker):
+    """test_init_app_disabled
+
+    Tests that statements are not prepared unless prepared statements are enabled.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    app = mocker.Mock(config={'SQLALCHEMY_PREPARED_STATEMENTS': False})
+
+    prepared_statements.init_app(app)
+
+    assert not sqlalchemy.event.contains(sqlalchemy.engine.Engine, 'before_cursor_execute', _before_cursor_execute)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+""" Tests for on-demand profiling. """
+
+import threading
+
+import pytest
+
+from flask import Flask
+
+from sayan_service import profiling
+from sayan_service.profiling import StackSampler, init_app
+
+##
+#: The `AUTHORIZATION` header carries the profiling token of the test app.
+#:
+AUTHORIZATION = {'Authorization': 'Bearer secret'}
+
+
+@pytest.fixture
+def app():
+    """app
+
+    Returns an app with profiling enabled, and an endpoint that returns its argument.
+    """
+    app = Flask(__name__)
+    app.config.update(
+        PROFILING_ENABLED=True,
+        PROFILING_TOKEN='secret',
+        PROFILING_MAX_SECONDS=1,
+        PROFILING_SAMPLE_INTERVAL=0.001)
+    init_app(app)
+
+    @app.route('/echo/<value>')
+    def echo(value):
+        return {'value': value}, 201
+
+    return app
+
+
+def test_init_app_disabled():
+    """test_init_app_disabled
+
+    Tests that nothing is registered when profiling is disabled.
+    """
+    app = Flask(__name__)
+    app.config.update(PROFILING_ENABLED=False)
+
+    init_app(app)
+
+    assert 'admin' not in app.blueprints
+    assert app.before_request_funcs == {}
+    assert app.after_request_funcs == {}
+
+
+def test_init_app_requires_token():
+    """test_init_app_requires_token
+
+    Tests that profiling cannot be enabled without a token.
+    """
+    app = Flask(__name__)
+    app.config.update(PROFILING_ENABLED=True, PROFILING_TOKEN='')
+
+    with pytest.raises(ValueError):
+        init_app(app)
+
+
+def test_stack_sampler():
+    """test_stack_sampler
+
+    Tests that the sampler records the stacks of other threads in the collapsed stack format, with
+    the thread name and the outermost frame first.
+    """
+    stop = threading.Event()
+
+    def busy_function():
+        while not stop.is_set():
+            pass
+
+    thread = threading.Thread(target=busy_function, name='busy')
+    thread.start()
+    sampler = StackSampler(interval=0.001)
+    try:
+        sampler.run(0.05)
+    finally:
+        stop.set()
+        thread.join()
+
+    stacks = dict(line.rsplit(' ', 1) for line in sampler.collapsed().splitlines())
+    busy = [stack.split(';') for stack in stacks if stack.startswith('busy;')]
+    assert sampler.sample_count > 0
+    assert busy
+    assert all(frames[1].startswith('_bootstrap (') for frames in busy)
+    assert any(frame.startswith('busy_function (') for frames in busy for frame in frames)
+    assert all(count.isdigit() for count in stacks.values())
+
+
+def test_get_profile(app):
+    """test_get_profile
+
+    Tests that the profiling endpoint returns collapsed stacks to requests with the token, and
+    rejects other requests and durations above the maximum.
+
+    :param app:
+        An app with profiling enabled
+    """
+    client = app.test_client()
+
+    assert client.get('/admin/profile?seconds=0.01').status_code == 403
+    assert client.get('/admin/profile?seconds=0.01', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/admin/profile?seconds=5', headers=AUTHORIZATION).status_code == 400
+
+    response = client.get('/admin/profile?seconds=0.01', headers=AUTHORIZATION)
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in response.get_data(as_text=True).splitlines())
+
+
+def test_get_profile_busy(app):
+    """test_get_profile_busy
+
+    Tests that only one profile runs at a time.
+
+    :param app:
+        An app with profiling enabled
+    """
+    with profiling._lock:
+        response = app.test_client().get('/admin/profile?seconds=0.01', headers=AUTHORIZATION)
+
+    assert response.status_code == 409
+
+
+def test_request_profile(app):
+    """test_request_profile
+
+    Tests that a request with the `X-Profile` header and the token returns its profile and original
+    status, that requests without the header are unaffected, and that requests without the token
+    are rejected.
+
+    :param app:
+        An app with profiling enabled
+    """
+    client = app.test_client()
+
+    profiled = client.get('/echo/1', headers={'X-Profile': 'tottime', **AUTHORIZATION})
+    unprofiled = client.get('/echo/2')
+    unauthorized = client.get('/echo/3', headers={'X-Profile': ''})
+
+    assert profiled.status_code == 200
+    assert profiled.headers['X-Profile-Status'] == '201'
+    assert 'function calls' in profiled.get_data(as_text=True)
+    assert (unprofiled.status_code, unprofiled.json) == (201, {'value': '2'})
+    assert unauthorized.status_code == 403
+    assert not profiling._lock.locked()
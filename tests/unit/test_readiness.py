@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+""" Tests for the readiness checks. """
+
+import threading
+import time
+
+import pytest
+
+from flask import Flask
+
+from sayan_service.readiness import ReadinessRegistry, cache_ready, postgres_ready
+
+
+@pytest.fixture
+def readiness_app():
+    """readiness_app
+
+    Returns an app context for running readiness checks, with a short deadline.
+    """
+    app = Flask(__name__)
+    app.config.update(READINESS_CHECK_TIMEOUT=0.2, READINESS_CACHE_TTL=60)
+
+    with app.app_context():
+        yield app
+
+
+def test_run(readiness_app):
+    """test_run
+
+    Tests that the results of every check are reported, and that only critical checks affect
+    readiness.
+
+    :param readiness_app:
+        The app to run the checks for
+    """
+    registry = ReadinessRegistry()
+    registry.register('available')(lambda timeout: True)
+    registry.register('optional', critical=False)(lambda timeout: False)
+
+    assert registry.run() == ({'available': True, 'optional': False}, True)
+
+
+def test_run_failure(readiness_app):
+    """test_run_failure
+
+    Tests that a check fails when its probe returns a falsy value or raises an exception.
+
+    :param readiness_app:
+        The app to run the checks for
+    """
+    registry = ReadinessRegistry()
+    registry.register('unavailable')(lambda timeout: None)
+
+    @registry.register('broken')
+    def broken(timeout):
+        raise RuntimeError('Test Error')
+
+    assert registry.run() == ({'unavailable': False, 'broken': False}, False)
+
+
+def test_run_concurrent_with_deadline(readiness_app):
+    """test_run_concurrent_with_deadline
+
+    Tests that probes run concurrently, and that a probe which exceeds the deadline fails without
+    delaying the results past the deadline.
+
+    :param readiness_app:
+        The app to run the checks for
+    """
+    registry = ReadinessRegistry()
+    released = threading.Event()
+    registry.register('hung')(lambda timeout: released.wait(5))
+    registry.register('slow1')(lambda timeout: time.sleep(0.1) or True)
+    registry.register('slow2')(lambda timeout: time.sleep(0.1) or True)
+
+    start = time.perf_counter()
+    results = registry.run()
+    elapsed = time.perf_counter() - start
+    released.set()
+
+    assert results == ({'hung': False, 'slow1': True, 'slow2': True}, False)
+    assert elapsed < 0.3
+
+
+def test_run_still_running(mocker, readiness_app):
+    """test_run_still_running
+
+    Tests that a probe is given the deadline, and that a check whose probe is still running from a
+    previous run fails without the probe being run again.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param readiness_app:
+        The app to run the checks for
+    """
+    monotonic = mocker.patch('sayan_service.readiness.time.monotonic', return_value=100)
+    registry = ReadinessRegistry()
+    released = threading.Event()
+    probe = mocker.Mock(side_effect=lambda timeout: released.wait(5))
+    registry.register('hung')(probe)
+
+    assert registry.run() == ({'hung': False}, False)
+    monotonic.return_value = 200
+    assert registry.run() == ({'hung': False}, False)
+    probe.assert_called_once_with(0.2)
+
+    released.set()
+    registry._running[(id(readiness_app), 'hung')].result()
+    monotonic.return_value = 300
+    assert registry.run() == ({'hung': True}, True)
+    assert probe.call_count == 2
+
+
+def test_run_cached(mocker, readiness_app):
+    """test_run_cached
+
+    Tests that the results are reused until the cache TTL expires.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param readiness_app:
+        The app to run the checks for
+    """
+    monotonic = mocker.patch('sayan_service.readiness.time.monotonic', return_value=100)
+    registry = ReadinessRegistry()
+    probe = mocker.Mock(return_value=True)
+    registry.register('postgres')(probe)
+
+    registry.run()
+    monotonic.return_value = 159
+    registry.run()
+    assert probe.call_count == 1
+
+    monotonic.return_value = 160
+    registry.run()
+    assert probe.call_count == 2
+
+
+def test_run_enabled(readiness_app):
+    """test_run_enabled
+
+    Tests that checks which do not apply to the app are skipped.
+
+    :param readiness_app:
+        The app to run the checks for
+    """
+    registry = ReadinessRegistry()
+    registry.register('postgres')(lambda timeout: True)
+    registry.register('replicas', enabled=lambda app: False)(lambda timeout: False)
+
+    assert registry.run() == ({'postgres': True}, True)
+
+
+def test_postgres_ready(mocker):
+    """test_postgres_ready
+
+    Tests that the ``postgres_ready`` probe returns True when the database behaves as expected, and
+    bounds connecting and the query with the deadline.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    db = mocker.patch('sayan_service.readiness.db')
+    _probe_engine = mocker.patch('sayan_service.readiness._probe_engine')
+    connection = _probe_engine.return_value.begin.return_value.__enter__.return_value
+    connection.execute.return_value.scalar.return_value = 1
+
+    assert postgres_ready(2.5) is True
+    _probe_engine.assert_called_once_with(db.engine.url, 3)
+    assert str(connection.execute.call_args_list[0].args[0]) == 'SET LOCAL statement_timeout = 2500'
+
+
+def test_postgres_ready_unexpected_result(mocker):
+    """test_postgres_ready_unexpected_result
+
+    Tests that the ``postgres_ready`` probe returns False when the database successfully executes
+    the query, but does not return the expected value.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('sayan_service.readiness.db')
+    _probe_engine = mocker.patch('sayan_service.readiness._probe_engine')
+    connection = _probe_engine.return_value.begin.return_value.__enter__.return_value
+    connection.execute.return_value.scalar.return_value = 0
+
+    assert postgres_ready(2) is False
+
+
+def test_cache_ready(mocker):
+    """test_cache_ready
+
+    Tests that the ``cache_ready`` probe round-trips a value through the cache backend.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    cache = mocker.patch('sayan_service.readiness.cache')
+    cache.get.return_value = 1
+
+    assert cache_ready(2) is True
+    cache.set.assert_called_once_with('readiness.probe', 1, timeout=60)
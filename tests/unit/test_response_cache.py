@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+""" Tests for the response cache. """
+
+import pytest
+import sqlalchemy as sa
+
+from flask import Flask
+from sqlalchemy.orm import Session
+
+from sayan_service.extensions import cache, json
+from sayan_service.response_cache import ResponseCache
+
+
+@pytest.fixture
+def app(mocker, tmp_path):
+    """app
+
+    Returns an app with a file system cache, and a cached endpoint whose handler is a mock.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param tmp_path:
+        A temporary directory for the cache
+    """
+    app = Flask(__name__)
+    app.config.update(TESTING=True, CACHE_TYPE='flask_caching.backends.FileSystemCache', CACHE_DIR=str(tmp_path),
+                      RESPONSE_CACHE_ENABLED=True, RESPONSE_CACHE_TTL=30)
+    cache.init_app(app)
+    json.init_app(app)
+    app.extensions['response_cache'] = response_cache = ResponseCache()
+    response_cache.init_app(app)
+    handler = app.extensions['handler'] = mocker.Mock(return_value={'widgets': [1, 2]})
+
+    @app.route('/widgets', methods=['GET', 'POST'])
+    @response_cache.cached(tags=['widgets'])
+    def get_widgets():
+        return handler()
+
+    with app.app_context():
+        yield app
+    sa.event.remove(Session, 'after_commit', response_cache._after_commit)
+    sa.event.remove(Session, 'after_rollback', response_cache._after_rollback)
+
+
+def test_hit(app):
+    """test_hit
+
+    Tests that a cached response is returned without calling the handler, whatever the order of the
+    query string.
+
+    :param app:
+        An app with a cached endpoint
+    """
+    client = app.test_client()
+
+    first = client.get('/widgets?a=1&b=2')
+    second = client.get('/widgets?b=2&a=1')
+
+    assert first.json == second.json == {'widgets': [1, 2]}
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert 'no-cache' in second.headers['Cache-Control']
+    assert app.extensions['handler'].call_count == 1
+
+
+def test_not_modified(app):
+    """test_not_modified
+
+    Tests that a request whose `If-None-Match` matches the cached response is answered with a 304
+    without calling the handler again.
+
+    :param app:
+        An app with a cached endpoint
+    """
+    client = app.test_client()
+    etag = client.get('/widgets').headers['ETag']
+
+    response = client.get('/widgets', headers={'If-None-Match': etag})
+
+    assert response.status_code == 304
+    assert response.data == b''
+    assert app.extensions['handler'].call_count == 1
+
+
+def test_invalidate(app):
+    """test_invalidate
+
+    Tests that invalidating a tag of a cached response makes the next request call the handler.
+
+    :param app:
+        An app with a cached endpoint
+    """
+    client = app.test_client()
+    etag = client.get('/widgets').headers['ETag']
+    app.extensions['handler'].return_value = {'widgets': [1, 2, 3]}
+
+    app.extensions['response_cache'].invalidate('widgets')
+    response = client.get('/widgets', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.json == {'widgets': [1, 2, 3]}
+    assert app.extensions['handler'].call_count == 2
+
+
+def test_invalidate_on_commit(app):
+    """test_invalidate_on_commit
+
+    Tests that tags are invalidated when the session's transaction commits, and forgotten when it is
+    rolled back.
+
+    :param app:
+        An app with a cached endpoint
+    """
+    client = app.test_client()
+    response_cache = app.extensions['response_cache']
+    client.get('/widgets')
+
+    with Session(sa.create_engine('sqlite://')) as session:
+        session.execute(sa.text('SELECT 1'))
+        response_cache.invalidate_on_commit(session, 'widgets')
+        session.rollback()
+        client.get('/widgets')
+        assert app.extensions['handler'].call_count == 1
+
+        session.execute(sa.text('SELECT 1'))
+        response_cache.invalidate_on_commit(session, 'widgets')
+        client.get('/widgets')
+        assert app.extensions['handler'].call_count == 1
+        session.commit()
+
+    client.get('/widgets')
+    assert app.extensions['handler'].call_count == 2
+
+
+def test_bypass(app):
+    """test_bypass
+
+    Tests that non-GET requests and error responses are not cached, and that requests with different
+    `Authorization` headers do not share responses.
+
+    :param app:
+        An app with a cached endpoint
+    """
+    client = app.test_client()
+    handler = app.extensions['handler']
+
+    client.post('/widgets')
+    client.post('/widgets')
+    assert handler.call_count == 2
+
+    handler.return_value = ({'message': 'unavailable'}, 503)
+    assert client.get('/widgets').status_code == 503
+    assert client.get('/widgets').status_code == 503
+    assert handler.call_count == 4
+
+    handler.return_value = {'widgets': [1, 2]}
+    client.get('/widgets', headers={'Authorization': 'Bearer a'})
+    client.get('/widgets', headers={'Authorization': 'Bearer b'})
+    client.get('/widgets', headers={'Authorization': 'Bearer a'})
+    assert handler.call_count == 6
+
+
+@pytest.mark.parametrize('result, status, headers', [
+    (({'a': 1}, {'X-Foo': 'bar'}), 200, {'X-Foo': 'bar'}),
+    (({'a': 1}, [('X-Foo', 'bar')]), 200, {'X-Foo': 'bar'}),
+    (({'a': 1}, 201), 201, {}),
+    (({'a': 1}, 201, {'X-Foo': 'bar'}), 201, {'X-Foo': 'bar'}),
+])
+def test__to_response(app, result, status, headers):
+    """test__to_response
+
+    Tests that a handler may return a body with a status, headers, or both, as Flask accepts.
+
+    :param app:
+        An app with a cached endpoint
+    :param result:
+        The value returned by the handler
+    :param status:
+        The expected status code
+    :param headers:
+        The expected headers, besides the default ones
+    """
+    response = ResponseCache()._to_response(result)
+
+    assert response.status_code == status
+    assert response.json == {'a': 1}
+    assert {key: response.headers[key] for key in headers} == headers
+
+
+@pytest.mark.parametrize('config', [
+    {'CACHE_TYPE': 'simple'},
+    {'CACHE_TYPE': 'flask_caching.backends.SimpleCache'},
+    {'CACHE_TYPE': 'sayan_service.cache_backends.TieredCache', 'CACHE_SHARED_TYPE': 'simple'},
+])
+def test_init_app_per_process(config):
+    """test_init_app_per_process
+
+    Tests that the response cache cannot be enabled with a backend whose entries other workers do
+    not see, as their cached responses would not be invalidated.
+
+    :param config:
+        The cache settings of the app
+    """
+    app = Flask(__name__)
+    app.config.update(RESPONSE_CACHE_ENABLED=True, **config)
+
+    with pytest.raises(ValueError):
+        ResponseCache().init_app(app)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+""" Tests for the serializer module. """
+
+from collections import namedtuple
+from datetime import datetime
+from uuid import UUID
+
+import sqlalchemy as sa
+
+from sqlalchemy.dialects import postgresql as pg
+from sqlalchemy.orm import declarative_base, relationship
+
+from sayan_service.serializer import ModelDumper
+
+Base = declarative_base()
+
+
+class Thing(Base):
+    """ A model used to compile dumpers, bound to its own metadata. """
+
+    __tablename__ = 'things'
+
+    id = sa.Column(sa.BigInteger, primary_key=True)
+    uuid = sa.Column(pg.UUID(as_uuid=True))
+    created_at = sa.Column(sa.DateTime)
+    name = sa.Column(sa.String)
+    parts = relationship('Part', back_populates='thing')
+
+
+class Part(Base):
+    """ A model related to `Thing`, used to compile dumpers that emit relationships. """
+
+    __tablename__ = 'parts'
+
+    id = sa.Column(sa.BigInteger, primary_key=True)
+    name = sa.Column(sa.String)
+    thing_id = sa.Column(sa.BigInteger, sa.ForeignKey('things.id'))
+    thing = relationship(Thing, back_populates='parts')
+
+
+def _thing():
+    return Thing(id=1, uuid=UUID('8c7e6f2a-4b8f-4d6e-9a1c-3f2e5d4c6b7a'), created_at=datetime(2021, 6, 1), name='a')
+
+
+def test_model_dumper_dump():
+    """test_model_dumper_dump
+
+    Tests that the ``ModelDumper.dump`` method emits JSON-ready values for every column except the
+    internal ``id``.
+    """
+    expected_result = {
+        'uuid': '8c7e6f2a-4b8f-4d6e-9a1c-3f2e5d4c6b7a',
+        'created_at': '2021-06-01T00:00:00',
+        'name': 'a',
+    }
+
+    actual_result = ModelDumper(Thing).dump(_thing())
+
+    assert actual_result == expected_result
+
+
+def test_model_dumper_dump_many_fields():
+    """test_model_dumper_dump_many_fields
+
+    Tests that the ``ModelDumper.dump_many`` method emits only the requested fields, and handles
+    ``None`` values.
+    """
+    thing = _thing()
+    thing.created_at = None
+
+    actual_result = ModelDumper(Thing, fields=['created_at']).dump([thing, _thing()], many=True)
+
+    assert actual_result == [{'created_at': None}, {'created_at': '2021-06-01T00:00:00'}]
+
+
+def test_model_dumper_dump_many_rows(mocker):
+    """test_model_dumper_dump_many_rows
+
+    Tests that the ``ModelDumper.dump_many`` method emits the fields present in ``Row`` tuples from a
+    column-only query.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    Row = namedtuple('Row', ['name', 'created_at'])
+    mocker.patch('sayan_service.serializer.Row', Row)
+    rows = [Row('a', datetime(2021, 6, 1)), Row('b', None)]
+
+    actual_result = ModelDumper(Thing).dump_many(rows)
+
+    assert actual_result == [
+        {'created_at': '2021-06-01T00:00:00', 'name': 'a'},
+        {'created_at': None, 'name': 'b'},
+    ]
+
+
+def test_model_dumper_relationships():
+    """test_model_dumper_relationships
+
+    Tests that relationships are only emitted when requested, as related records dumped with every
+    column of their model, or as lists of them.
+    """
+    thing = _thing()
+    part = Part(id=2, name='b', thing_id=1, thing=thing)
+
+    assert 'parts' not in ModelDumper(Thing).fields
+    assert ModelDumper(Thing, fields=['name', 'parts']).dump(thing) == {
+        'name': 'a',
+        'parts': [{'name': 'b', 'thing_id': 1}],
+    }
+    assert ModelDumper(Part, fields=['thing']).dump_many([part, Part(name='c')]) == [
+        {'thing': ModelDumper(Thing).dump(thing)},
+        {'thing': None},
+    ]
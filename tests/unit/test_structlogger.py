@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+""" Tests for the gunicorn logger. """
+
+from datetime import timedelta
+
+import pytest
+
+from structlogger import GunicornLogger
+
+
+@pytest.fixture
+def logger(mocker):
+    """logger
+
+    Returns a gunicorn logger that records every request with a 5% sample rate and a 1 second
+    slow request threshold, with a mock access logger.
+
+    :param mocker:
+        A pytest-mock fixture
+    """
+    mocker.patch('structlogger.initialize_structlog')
+    mocker.patch('structlogger.Config.ACCESS_LOG_SAMPLE_RATE', 0.05)
+    mocker.patch('structlogger.Config.ACCESS_LOG_SLOW_THRESHOLD', 1)
+    logger = GunicornLogger(cfg=None)
+    logger._access_logger = mocker.Mock()
+    return logger
+
+
+def _access(logger, status_code=200, duration=0.01):
+    """_access
+
+    Records an access log entry for a request to the widget endpoint.
+
+    :param logger:
+        The gunicorn logger.
+    :param status_code:
+        The status code of the response.
+    :param duration:
+        The duration of the request, in seconds.
+    """
+    response = type('Response', (), {'status_code': status_code, 'status': f'{status_code} OK', 'sent': 123})
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': '/v1/widgets/1b5ba1c4-8be4-4b1a-8a07-8d3d8f4e3a10',
+        'sayan_service.route': '/v1/widgets/<uuid>',
+    }
+    logger.access(response, None, environ, timedelta(seconds=duration))
+
+
+def test_access(mocker, logger):
+    """test_access
+
+    Tests that a sampled request is recorded with its route template rather than its path.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param logger:
+        The gunicorn logger
+    """
+    mocker.patch('structlogger.random.random', return_value=0.01)
+    mocker.patch('structlogger.os.getpid', return_value=42)
+
+    _access(logger)
+
+    logger._access_logger.info.assert_called_once_with(
+        'request',
+        method='GET',
+        route='/v1/widgets/<uuid>',
+        status=200,
+        bytes=123,
+        duration=0.01,
+        pid=42,
+        sample_rate=0.05,
+    )
+
+
+def test_access_not_sampled(mocker, logger):
+    """test_access_not_sampled
+
+    Tests that a request outside of the sample is not recorded.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param logger:
+        The gunicorn logger
+    """
+    mocker.patch('structlogger.random.random', return_value=0.5)
+
+    _access(logger, status_code=404)
+
+    logger._access_logger.info.assert_not_called()
+
+
+@pytest.mark.parametrize('status_code, duration', [(503, 0.01), (200, 1.5)])
+def test_access_always_recorded(mocker, logger, status_code, duration):
+    """test_access_always_recorded
+
+    Tests that failed and slow requests are recorded regardless of the sample.
+
+    :param mocker:
+        A pytest-mock fixture
+    :param logger:
+        The gunicorn logger
+    :param status_code:
+        The status code of the response
+    :param duration:
+        The duration of the request
+    """
+    mocker.patch('structlogger.random.random', return_value=0.99)
+
+    _access(logger, status_code=status_code, duration=duration)
+
+    assert logger._access_logger.info.call_args[1]['sample_rate'] == 1